@@ -0,0 +1,142 @@
+"""
+复权因子存储与复权行情
+
+stock_daily 存的是 Tushare 不复权价格，东方财富实时K线（fqt=1）是前复权价格，
+除权除息日之后两者直接比较会出错。复权因子由 download_by_date 每天写入 stock_adj_factor，
+这里按需把不复权长表乘上因子得到复权长表，不需要逐只股票重新拉取复权历史：
+    • 前复权 qfq：价格 × 当日因子 / 基准日因子（基准日默认取区间最后一天，与实时行情口径一致）
+    • 后复权 hfq：价格 × 当日因子
+成交量、成交额不做调整。
+"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from clients import get_engine
+from data_source import read_daily
+
+from utils.logger import logger
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "pre_close"]
+
+
+def load_adj_factors(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    ts_codes: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """读取复权因子（ts_code, trade_date, adj_factor），按 ts_code、trade_date 升序"""
+    conditions = []
+    params = {}
+    if start_date:
+        conditions.append("trade_date >= %(start_date)s")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("trade_date <= %(end_date)s")
+        params["end_date"] = end_date
+    if ts_codes is not None:
+        if not ts_codes:
+            return pd.DataFrame(columns=["ts_code", "trade_date", "adj_factor"])
+        placeholders = ",".join([f"%(ts_code_{i})s" for i in range(len(ts_codes))])
+        conditions.append(f"ts_code IN ({placeholders})")
+        for i, code in enumerate(ts_codes):
+            params[f"ts_code_{i}"] = code
+
+    sql = "SELECT ts_code, trade_date, adj_factor FROM stock_adj_factor"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ts_code, trade_date"
+
+    df = pd.read_sql(sql, get_engine(), params=params)
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    return df
+
+
+def align_factors(df: pd.DataFrame, factors: pd.DataFrame) -> np.ndarray:
+    """
+    取 df 每行（ts_code, trade_date）对应的复权因子
+    当天缺因子时沿用该股之前最近一天的因子；早于该股第一条因子的行（因子只补录了部分历史）取最早的因子，
+    不能当作 1——Tushare 的因子是累计值，前复权时会被基准日因子整体缩放；完全没有因子的股票视为 1
+    """
+    # merge_asof 要求两边日期单位一致，统一成纳秒
+    rows = pd.DataFrame(
+        {
+            "row": np.arange(len(df)),
+            "ts_code": df["ts_code"].to_numpy(),
+            "trade_date": pd.to_datetime(df["trade_date"]).astype("datetime64[ns]"),
+        }
+    ).sort_values("trade_date")
+    known = factors[["ts_code", "trade_date", "adj_factor"]]
+    known = known.assign(trade_date=pd.to_datetime(known["trade_date"]).astype("datetime64[ns]"))
+    known = known.sort_values("trade_date")
+    merged = pd.merge_asof(rows, known, on="trade_date", by="ts_code", direction="backward")
+    missing = merged["adj_factor"].isna().to_numpy()
+    if missing.any():
+        before_first = merged.loc[missing, rows.columns]
+        earliest = pd.merge_asof(before_first, known, on="trade_date", by="ts_code", direction="forward")
+        merged.loc[missing, "adj_factor"] = earliest["adj_factor"].to_numpy()
+    result = np.ones(len(df))
+    result[merged["row"].to_numpy()] = merged["adj_factor"].fillna(1.0).to_numpy()
+    return result
+
+
+def base_factors(factors: pd.DataFrame, base_date: Optional[str] = None) -> pd.Series:
+    """每只股票在基准日（含）之前最近一天的因子，作为前复权的锚点（基准日当天的因子收盘后才入库）"""
+    if base_date is not None:
+        factors = factors[factors["trade_date"] <= pd.to_datetime(base_date)]
+    return factors.sort_values("trade_date").groupby("ts_code")["adj_factor"].last()
+
+
+def adjust_prices(
+    df: pd.DataFrame,
+    factors: pd.DataFrame,
+    how: str = "qfq",
+    base_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    返回复权后的副本
+
+    Args:
+        df: 不复权日线长表
+        factors: load_adj_factors 的结果，需覆盖 df 的日期范围（前复权还需覆盖基准日）
+        how: "qfq" 前复权 / "hfq" 后复权
+        base_date: 前复权基准日，默认取 factors 中每只股票的最后一天
+        columns: 需要复权的价格列，默认开高低收和昨收
+    """
+    if how not in ("qfq", "hfq"):
+        raise ValueError(f"不支持的复权方式: {how}")
+
+    df = df.copy()
+    ratio = align_factors(df, factors)
+    if how == "qfq":
+        base = df["ts_code"].map(base_factors(factors, base_date)).fillna(pd.Series(ratio, index=df.index))
+        ratio = ratio / base.to_numpy(dtype=np.float64)
+
+    for col in columns or PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].to_numpy(dtype=np.float64) * ratio
+    return df
+
+
+def get_adjusted_daily(
+    start_date: str,
+    end_date: str,
+    ts_codes: Optional[List[str]] = None,
+    how: str = "qfq",
+    base_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    读取一段区间的复权日线长表
+
+    前复权的基准日默认是 end_date，所以 end_date 取当天时结果与东方财富 fqt=1 的口径一致
+    """
+    df = read_daily(start_date, end_date, ts_codes=ts_codes, columns=columns)
+    # 往前多取一段，保证区间首日停牌的股票也能沿用之前的因子
+    factors_start = (pd.to_datetime(start_date) - pd.Timedelta(days=30)).strftime("%Y%m%d")
+    factors = load_adj_factors(factors_start, base_date or end_date, ts_codes=ts_codes)
+    if factors.empty:
+        logger.warning("stock_adj_factor 中没有复权因子，返回不复权数据")
+        return df
+    return adjust_prices(df, factors, how=how, base_date=base_date or end_date)
@@ -0,0 +1,329 @@
+"""
+向量化 T+1 回测
+
+把策略在一段区间内的命中（batch_screen.screen_range 的长表）展开成（交易日 × 股票）的信号矩阵，
+对全部信号一次性模拟：
+    • 信号日之后第 entry_offset 个交易日开盘买入；当天停牌视为没有买入机会，一字涨停（最低价即涨停价）买不进
+    • 买入后第 hold 个交易日卖出（A股 T+1，hold 至少为 1），按收盘价或开盘价成交；
+      卖出日停牌或一字跌停时顺延到下一个能卖出的交易日
+    • 收益按昨收链接计算：买入日 close/open × 持有期内逐日 close/pre_close，除权除息由 pre_close 自动处理，
+      不需要复权因子；扣除 cost（双边手续费加印花税）
+    • 数据还没覆盖到卖出日的信号记为 pending，不计入统计
+
+汇总指标：胜率、平均/中位收益、平均盈亏、最大回撤和累计收益。
+资金曲线按买入日分组：每天把 1/hold 的资金等权买入当天成交的信号，hold=1 时就是逐日复利。
+
+用法：
+    python backtest.py --strategy strategy_limit_up_continuation_prediction --start 20230101 --end 20250630 --hold 1
+    python backtest.py --strategy all --start 20240101 --end 20250630 --hold 3 --exit-at open
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from data_source import query_history, query_trade_dates
+from limit_price import PRICE_EPS, add_limit_columns, load_st_periods
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+
+from utils.logger import logger
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "pre_close"]
+
+# 双边佣金约万三加卖出印花税万五，按收益率直接扣除
+DEFAULT_COST = 0.0011
+
+STATUS_FILLED = "filled"
+STATUS_UNFILLABLE = "unfillable"  # 买入日一字涨停
+STATUS_NO_ENTRY = "no_entry"  # 买入日停牌
+STATUS_PENDING = "pending"  # 买入日或卖出日还没有数据
+
+TRADE_COLUMNS = ["signal_date", "ts_code", "entry_date", "exit_date", "entry_price", "exit_price", "return", "status"]
+
+
+def load_prices(ts_codes: Optional[List[str]], start_date: str, end_date: Optional[str] = None) -> pd.DataFrame:
+    """读取回测需要的价格长表，end_date 为 None 时读到最新"""
+    return query_history(ts_codes, end_date or datetime.now().strftime("%Y%m%d"), start_date, columns=PRICE_COLUMNS)
+
+
+def price_matrices(
+    panel: pd.DataFrame, st_periods: Optional[pd.DataFrame] = None, calendar: Optional[pd.DatetimeIndex] = None
+) -> dict:
+    """
+    把价格长表展开成（交易日 × 股票）的矩阵，停牌日为 NaN
+
+    Args:
+        calendar: 交易日历（data_source.query_trade_dates）。panel 只含部分股票时必须给出，
+                  否则这些股票都停牌的交易日会从日历里消失，买入日和持有天数随之错位；
+                  为 None 时用 panel 中出现过的日期（panel 为全市场时两者相同）
+
+    Returns:
+        dict：dates、codes、open/high/low/close/pre_close、growth（逐日 log(close/pre_close) 的累加，
+        停牌日沿用前值）、buyable（有成交且非一字涨停）、sellable（有成交且非一字跌停）
+    """
+    panel = panel.sort_values(["ts_code", "trade_date"], kind="stable").reset_index(drop=True)
+    if "is_one_word_board" not in panel.columns:
+        add_limit_columns(panel, load_st_periods() if st_periods is None else st_periods)
+
+    dates = np.sort(panel["trade_date"].unique())
+    if calendar is not None:
+        dates = np.union1d(dates, calendar.to_numpy().astype(dates.dtype))
+    codes, code_idx = np.unique(panel["ts_code"].to_numpy(), return_inverse=True)
+    date_idx = np.searchsorted(dates, panel["trade_date"].to_numpy())
+    shape = (len(dates), len(codes))
+
+    def to_matrix(values, fill=np.nan, dtype=np.float64):
+        out = np.full(shape, fill, dtype=dtype)
+        out[date_idx, code_idx] = values
+        return out
+
+    matrices = {"dates": dates, "codes": codes}
+    for col in PRICE_COLUMNS:
+        matrices[col] = to_matrix(panel[col].to_numpy(dtype=np.float64))
+
+    has_bar = to_matrix(True, fill=False, dtype=bool)
+    one_word_up = to_matrix(panel["is_one_word_board"].to_numpy(), fill=False, dtype=bool)
+    one_word_down = to_matrix((panel["high"] <= panel["down_limit"] + PRICE_EPS).to_numpy(), fill=False, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_return = np.log(matrices["close"] / matrices["pre_close"])
+    matrices["log_return"] = np.where(has_bar, log_return, 0.0)
+    matrices["growth"] = np.cumsum(matrices["log_return"], axis=0)
+    matrices["buyable"] = has_bar & ~one_word_up
+    matrices["has_bar"] = has_bar
+    matrices["sellable"] = has_bar & ~one_word_down
+    matrices["next_sellable"] = _next_true(matrices["sellable"])
+    return matrices
+
+
+def _next_true(mask: np.ndarray) -> np.ndarray:
+    """每个位置起（含）该列下一个为 True 的行号，没有时为行数"""
+    n_rows = mask.shape[0]
+    index = np.where(mask, np.arange(n_rows)[:, None], n_rows)
+    return np.minimum.accumulate(index[::-1], axis=0)[::-1]
+
+
+def signal_matrix(signals: pd.DataFrame, matrices: dict) -> np.ndarray:
+    """命中长表（trade_date、ts_code）转成布尔信号矩阵，不在价格矩阵中的日期或股票被忽略"""
+    signal = np.zeros((len(matrices["dates"]), len(matrices["codes"])), dtype=bool)
+    t, j, valid = _locate(signals, matrices)
+    signal[t[valid], j[valid]] = True
+    return signal
+
+
+def _locate(signals: pd.DataFrame, matrices: dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    dates, codes = matrices["dates"], matrices["codes"]
+    signal_dates = pd.to_datetime(signals["trade_date"]).to_numpy().astype(dates.dtype)
+    t = np.searchsorted(dates, signal_dates)
+    j = np.searchsorted(codes, signals["ts_code"].to_numpy())
+    t_ok = np.minimum(t, len(dates) - 1)
+    j_ok = np.minimum(j, len(codes) - 1)
+    valid = (
+        (t < len(dates))
+        & (j < len(codes))
+        & (dates[t_ok] == signal_dates)
+        & (codes[j_ok] == signals["ts_code"].to_numpy())
+    )
+    return t_ok, j_ok, valid
+
+
+def simulate_trades(
+    signal: np.ndarray,
+    matrices: dict,
+    entry_offset: int = 1,
+    hold: int = 1,
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+) -> pd.DataFrame:
+    """
+    对信号矩阵中的每个 True 模拟一笔交易
+
+    Args:
+        signal: 布尔矩阵（交易日 × 股票），与 matrices 对齐
+        entry_offset: 信号日之后第几个交易日开盘买入（信号用当天收盘数据时为 1）
+        hold: 买入后第几个交易日卖出，至少为 1
+        exit_at: "close" 按收盘价卖出，"open" 按开盘价卖出
+        cost: 每笔交易从收益率中扣除的成本
+    """
+    if hold < 1:
+        raise ValueError("A股 T+1，hold 至少为 1")
+    if exit_at not in ("open", "close"):
+        raise ValueError(f"exit_at 只能是 open 或 close: {exit_at}")
+
+    n_dates = len(matrices["dates"])
+    t, j = np.nonzero(signal)
+    entry = t + entry_offset
+    in_range = entry < n_dates
+    entry_c = np.minimum(entry, n_dates - 1)
+
+    target = np.minimum(entry + hold, n_dates - 1)
+    exit_ = np.where(entry + hold < n_dates, matrices["next_sellable"][target, j], n_dates)
+    exit_c = np.minimum(exit_, n_dates - 1)
+
+    has_bar = matrices["has_bar"][entry_c, j] & in_range
+    filled = has_bar & matrices["buyable"][entry_c, j]
+    done = filled & (exit_ < n_dates)
+
+    open_, close, growth = matrices["open"], matrices["close"], matrices["growth"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = close[entry_c, j] / open_[entry_c, j] * np.exp(growth[exit_c, j] - growth[entry_c, j])
+        if exit_at == "open":
+            # 卖出日只取开盘：去掉卖出日 close/pre_close，换成 open/pre_close
+            exit_open_return = open_[exit_c, j] / matrices["pre_close"][exit_c, j]
+            ratio = ratio * np.exp(-matrices["log_return"][exit_c, j]) * exit_open_return
+        exit_price = matrices[exit_at][exit_c, j]
+
+    status = np.full(len(t), STATUS_FILLED, dtype=object)
+    status[~in_range | (filled & ~done)] = STATUS_PENDING
+    status[in_range & ~has_bar] = STATUS_NO_ENTRY
+    status[has_bar & ~filled] = STATUS_UNFILLABLE
+
+    dates = matrices["dates"]
+    return pd.DataFrame(
+        {
+            "signal_date": dates[t],
+            "ts_code": matrices["codes"][j],
+            "entry_date": np.where(in_range, dates[entry_c], np.datetime64("NaT")),
+            "exit_date": np.where(done, dates[exit_c], np.datetime64("NaT")),
+            "entry_price": np.where(filled, open_[entry_c, j], np.nan),
+            "exit_price": np.where(done, exit_price, np.nan),
+            "return": np.where(done, ratio - 1 - cost, np.nan),
+            "status": status,
+        }
+    )
+
+
+def equity_curve(trades: pd.DataFrame, hold: int = 1) -> pd.Series:
+    """按买入日分组的资金曲线：每天用 1/hold 的资金等权买入当天成交的信号"""
+    done = trades[trades["status"] == STATUS_FILLED]
+    if done.empty:
+        return pd.Series(dtype=np.float64)
+    daily = done.groupby("entry_date")["return"].mean().sort_index()
+    return (1 + daily / hold).cumprod()
+
+
+def max_drawdown(equity: pd.Series) -> float:
+    if equity.empty:
+        return 0.0
+    values = np.concatenate([[1.0], equity.to_numpy()])
+    return float((values / np.maximum.accumulate(values) - 1).min())
+
+
+def summarize(trades: pd.DataFrame, hold: int = 1) -> dict:
+    """胜率、收益和回撤等汇总指标"""
+    counts = trades["status"].value_counts()
+    returns = trades.loc[trades["status"] == STATUS_FILLED, "return"].to_numpy()
+    equity = equity_curve(trades, hold)
+    wins = returns[returns > 0]
+    losses = returns[returns <= 0]
+    return {
+        "signals": int(len(trades)),
+        "filled": int(counts.get(STATUS_FILLED, 0)),
+        "unfillable": int(counts.get(STATUS_UNFILLABLE, 0)),
+        "no_entry": int(counts.get(STATUS_NO_ENTRY, 0)),
+        "pending": int(counts.get(STATUS_PENDING, 0)),
+        "hit_rate": round(float(len(wins) / len(returns)), 4) if len(returns) else None,
+        "avg_return": round(float(returns.mean()), 5) if len(returns) else None,
+        "median_return": round(float(np.median(returns)), 5) if len(returns) else None,
+        "avg_win": round(float(wins.mean()), 5) if len(wins) else None,
+        "avg_loss": round(float(losses.mean()), 5) if len(losses) else None,
+        "total_return": round(float(equity.iloc[-1] - 1), 4) if not equity.empty else 0.0,
+        "max_drawdown": round(max_drawdown(equity), 4),
+        "trading_days": int(len(equity)),
+    }
+
+
+def backtest(
+    signals: pd.DataFrame,
+    entry_offset: int = 1,
+    hold: int = 1,
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+    matrices: Optional[dict] = None,
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    回测一张命中长表（至少含 trade_date、ts_code，其余列原样带到交易明细里）
+
+    Args:
+        matrices: 预先构建的价格矩阵（参数扫描时复用），为 None 时只为命中过的股票读取价格，日历取全市场交易日
+
+    Returns:
+        (交易明细, 汇总指标)
+    """
+    if signals.empty:
+        trades = pd.DataFrame(columns=TRADE_COLUMNS)
+        return trades, summarize(trades, hold)
+
+    if matrices is None:
+        signal_dates = pd.to_datetime(signals["trade_date"])
+        start = signal_dates.min().strftime("%Y%m%d")
+        # 最后一个信号之后还要留出买入和持有的交易日
+        sessions = entry_offset + hold + 5
+        end = signal_dates.max() + timedelta(days=int(sessions * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS)
+        end = end.strftime("%Y%m%d")
+        panel = load_prices(sorted(signals["ts_code"].unique()), start, end)
+        matrices = price_matrices(panel, calendar=query_trade_dates(start, end))
+
+    signal = signal_matrix(signals, matrices)
+    trades = simulate_trades(signal, matrices, entry_offset, hold, exit_at, cost)
+
+    # 带上命中时的其他列（评分等）
+    extra = [c for c in signals.columns if c not in ("trade_date", "ts_code", "strategy")]
+    if extra:
+        keyed = signals.assign(signal_date=pd.to_datetime(signals["trade_date"]))
+        keyed = keyed.drop_duplicates(["signal_date", "ts_code"])[["signal_date", "ts_code"] + extra]
+        trades = trades.merge(keyed, on=["signal_date", "ts_code"], how="left")
+    return trades, summarize(trades, hold)
+
+
+def backtest_strategy(
+    strategy_name: str,
+    start_date: str,
+    end_date: str,
+    hold: int = 1,
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    用批量选股的结果回测一个策略
+
+    screen_range 的 trade_date 是策略运行日：用当天收盘数据的策略（lag=0）次日开盘买入，
+    用 T-1 数据预测 T 日的策略（lag=1）当天开盘买入
+    """
+    from batch_screen import BATCH_EVALUATORS, screen_range
+
+    hits = screen_range(strategy_name, start_date, end_date)
+    entry_offset = 1 - BATCH_EVALUATORS[strategy_name]["lag"]
+    return backtest(hits, entry_offset=entry_offset, hold=hold, exit_at=exit_at, cost=cost)
+
+
+if __name__ == "__main__":
+    from batch_screen import BATCH_EVALUATORS
+
+    parser = argparse.ArgumentParser(description="向量化 T+1 回测")
+    parser.add_argument("--strategy", required=True, choices=["all"] + list(BATCH_EVALUATORS))
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--hold", type=int, default=1, help="持有交易日数，1 即 T+1 卖出")
+    parser.add_argument("--exit-at", default="close", choices=["open", "close"])
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument("--output-dir", default="backtest_results")
+    args = parser.parse_args()
+
+    names = list(BATCH_EVALUATORS) if args.strategy == "all" else [args.strategy]
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name in names:
+        started = time.perf_counter()
+        trades, summary = backtest_strategy(name, args.start, args.end, args.hold, args.exit_at, args.cost)
+        summary.update(strategy=name, start=args.start, end=args.end, hold=args.hold, exit_at=args.exit_at)
+        elapsed = time.perf_counter() - started
+        logger.info(f"📈 【{name}】{json.dumps(summary, ensure_ascii=False)}，耗时 {elapsed:.2f}s")
+        if not trades.empty:
+            path = os.path.join(args.output_dir, f"{name}_{args.start}_{args.end}_hold{args.hold}.csv")
+            trades.to_csv(path, index=False, encoding="utf-8-sig")
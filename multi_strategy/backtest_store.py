@@ -0,0 +1,200 @@
+"""
+增量回测结果存储
+
+每天入库一个交易日后重跑回测，原来要把整段历史重新选股、重新模拟。
+这里把回测结果按 (策略, 参数哈希) 存在 backtest_store/<策略>_<哈希>/ 下：
+    signals.pkl  批量选股的命中长表
+    trades.pkl   交易明细
+    equity.pkl   资金曲线
+    meta.json    策略、回测参数、代码版本、起始日期和已覆盖到的最后交易日
+再次运行时：
+    • 只对 last_date 之后的新交易日批量选股（screen_range 自带回看期，与单日选股一样只依赖回看期内的行情）
+    • 已结算的交易（成交、买不进、停牌）原样保留，仍为 pending 的旧信号和新信号一起重新模拟
+    • 资金曲线由全部交易重新汇总（按买入日分组，开销可以忽略）
+回测参数变化得到新的哈希，即另一份存储；策略相关源码（CODE_MODULES）的内容变化时代码版本不同，整份重建。
+
+用法：
+    python backtest_store.py --strategy strategy_limit_up_continuation_prediction --start 20230101 --hold 1
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from backtest import DEFAULT_COST, STATUS_PENDING, TRADE_COLUMNS, backtest, equity_curve, summarize
+from batch_screen import BATCH_EVALUATORS, screen_range
+from data_source import query_previous_trade_date
+
+from utils.logger import logger
+
+STORE_DIR = "backtest_store"
+
+# 这些模块的源码决定选股和回测结果，任何一个变化都要整份重建
+CODE_MODULES = [
+    "batch_screen", "strategies", "strategy_spec", "scoring", "indicators", "kernels", "limit_price", "universe",
+    "backtest",
+]  # fmt: skip
+
+
+def code_version(modules=CODE_MODULES) -> str:
+    """策略相关源码内容的哈希"""
+    digest = hashlib.sha1()
+    for module in modules:
+        spec = importlib.util.find_spec(module)
+        with open(spec.origin, "rb") as f:
+            digest.update(module.encode("utf-8") + b"\0" + f.read())
+    return digest.hexdigest()[:16]
+
+
+def params_key(strategy_name: str, params: dict) -> str:
+    payload = json.dumps({"strategy": strategy_name, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _store_path(strategy_name: str, key: str, store_dir: str) -> str:
+    return os.path.join(store_dir, f"{strategy_name}_{key}")
+
+
+def load_store(path: str) -> Optional[dict]:
+    """读取一份存储，不存在或损坏时返回 None"""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            store = {"meta": json.load(f)}
+        for name in ("signals", "trades", "equity"):
+            with open(os.path.join(path, f"{name}.pkl"), "rb") as f:
+                store[name] = pickle.load(f)
+        return store
+    except Exception as e:
+        logger.warning(f"回测存储损坏，忽略: {path}: {e}")
+        return None
+
+
+def save_store(path: str, store: dict):
+    """逐个文件先写临时文件再替换，meta.json 最后写，中途失败时旧的 meta 与新数据不一致会被当作损坏重建"""
+    os.makedirs(path, exist_ok=True)
+    for name in ("signals", "trades", "equity"):
+        tmp_path = os.path.join(path, f"{name}.pkl.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(store[name], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(path, f"{name}.pkl"))
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store["meta"], f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def last_trade_date(end_date: str) -> Optional[str]:
+    """不晚于 end_date 的最后一个已入库交易日，YYYYMMDD"""
+    next_day = (datetime.strptime(end_date, "%Y%m%d") + timedelta(days=1)).strftime("%Y%m%d")
+    value = query_previous_trade_date(next_day)
+    return value.replace("-", "") if value else None
+
+
+def _concat(*frames: pd.DataFrame) -> pd.DataFrame:
+    """拼接非空的表，全部为空时返回空表"""
+    parts = [df for df in frames if not df.empty]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def run_incremental(
+    strategy_name: str,
+    start_date: str,
+    end_date: str,
+    hold: int = 1,
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+    store_dir: str = STORE_DIR,
+    rebuild: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series, dict]:
+    """
+    把策略从 start_date 开始的回测结果更新到 end_date
+
+    Returns:
+        (命中长表, 交易明细, 资金曲线, 汇总指标)
+    """
+    lag = BATCH_EVALUATORS[strategy_name]["lag"]
+    params = {"start_date": start_date, "hold": hold, "exit_at": exit_at, "cost": cost}
+    path = _store_path(strategy_name, params_key(strategy_name, params), store_dir)
+    version = code_version()
+
+    store = None if rebuild else load_store(path)
+    if store is not None and store["meta"]["code_version"] != version:
+        logger.info(f"【{strategy_name}】策略代码已变化（{store['meta']['code_version']} → {version}），整份重建")
+        store = None
+
+    covered = last_trade_date(end_date)
+    if covered is None:
+        raise ValueError(f"{end_date} 之前没有已入库的交易日")
+    if store is not None and store["meta"]["last_date"] >= covered:
+        logger.info(f"【{strategy_name}】回测结果已覆盖到 {store['meta']['last_date']}，无需更新")
+        return store["signals"], store["trades"], store["equity"], summarize(store["trades"], hold)
+
+    started = time.perf_counter()
+    if store is None:
+        screen_start, old_signals, old_trades = start_date, pd.DataFrame(), pd.DataFrame(columns=TRADE_COLUMNS)
+    else:
+        last = datetime.strptime(store["meta"]["last_date"], "%Y%m%d")
+        screen_start = (last + timedelta(days=1)).strftime("%Y%m%d")
+        old_signals, old_trades = store["signals"], store["trades"]
+
+    new_signals = screen_range(strategy_name, screen_start, covered)
+    # 旧信号里还没结算的和新信号一起重新模拟
+    pending = old_trades.loc[old_trades["status"] == STATUS_PENDING, ["signal_date", "ts_code"]]
+    if not old_signals.empty and not pending.empty:
+        keyed = old_signals.assign(signal_date=pd.to_datetime(old_signals["trade_date"]))
+        reopened = keyed.merge(pending, on=["signal_date", "ts_code"]).drop(columns="signal_date")
+    else:
+        reopened = pd.DataFrame()
+    to_simulate = _concat(reopened, new_signals)
+    fresh, _ = backtest(to_simulate, entry_offset=1 - lag, hold=hold, exit_at=exit_at, cost=cost)
+
+    signals = _concat(old_signals, new_signals)
+    trades = _concat(old_trades[old_trades["status"] != STATUS_PENDING], fresh)
+    if trades.empty:
+        trades = pd.DataFrame(columns=TRADE_COLUMNS)
+    trades = trades.sort_values(["signal_date", "ts_code"], kind="stable").reset_index(drop=True)
+    equity = equity_curve(trades, hold)
+    meta = {
+        "strategy": strategy_name,
+        "params": params,
+        "code_version": version,
+        "last_date": covered,
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    save_store(path, {"signals": signals, "trades": trades, "equity": equity, "meta": meta})
+    logger.info(
+        f"【{strategy_name}】回测结果{'增量更新' if store is not None else '全量构建'}到 {covered}："
+        f"新信号 {len(new_signals)} 条，重新模拟 {len(to_simulate)} 条，耗时 {time.perf_counter() - started:.2f}s"
+    )
+    return signals, trades, equity, summarize(trades, hold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="增量回测结果存储")
+    parser.add_argument("--strategy", required=True, choices=["all"] + list(BATCH_EVALUATORS))
+    parser.add_argument("--start", required=True, help="回测起始日期 YYYYMMDD")
+    parser.add_argument("--end", default=datetime.now().strftime("%Y%m%d"), help="更新到的日期 YYYYMMDD，默认今天")
+    parser.add_argument("--hold", type=int, default=1, help="持有交易日数，1 即 T+1 卖出")
+    parser.add_argument("--exit-at", default="close", choices=["open", "close"])
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有结果全量重建")
+    args = parser.parse_args()
+
+    names = list(BATCH_EVALUATORS) if args.strategy == "all" else [args.strategy]
+    for name in names:
+        _, _, _, summary = run_incremental(
+            name, args.start, args.end, args.hold, args.exit_at, args.cost, args.store_dir, args.rebuild
+        )
+        logger.info(f"📈 【{name}】{json.dumps(summary, ensure_ascii=False)}")
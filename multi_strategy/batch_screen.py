@@ -0,0 +1,249 @@
+"""
+多日批量选股
+
+单日模式下筛选250天要调用250次策略，每次都重新读取大段重叠的历史。
+screen_range 只读取一次覆盖整个区间（加上回看期）的行情，
+在全市场长表上一次性求出每个交易日的命中，返回 (trade_date, ts_code, score, ...) 长表。
+
+每个策略在 BATCH_EVALUATORS 中登记一个批量求值器：
+    • evaluate(panel, st_periods)：在整段长表上求值，返回命中行，trade_date 为所用数据的日期
+    • lookback：区间起点之前需要多读的交易日数
+    • lag：策略以 trade_date 之前第几个交易日的数据选股（涨停连板预测用 T-1 日数据，为 1）
+    • universe：股票池，板块排除下推到读取，其余条件按每一天的截面判断
+
+trade_date 的含义与单日模式相同，即调用 strategy(trade_date) 时传入的日期；
+区间内尚未入库的交易日（例如明天）不在结果中，当天选股仍用单日模式。
+规格策略每个交易日只用单日模式读到的最近 lookback 个交易日求值（MACD 等递推指标依赖起点），
+--check 逐日与单日模式对比，确认两边命中一致。
+
+用法：
+    python batch_screen.py --strategy strategy_limit_up_continuation_prediction --start 20250101 --end 20250630
+    python batch_screen.py --strategy all --start 20250101 --end 20250630 --check
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from data_source import query_history
+from limit_price import load_st_periods
+from strategies import (
+    LIMIT_UP_COLUMNS,
+    LIMIT_UP_LOOKBACK,
+    LIMIT_UP_UNIVERSE,
+    add_limit_up_features,
+    score_limit_up,
+)
+from strategy_spec import (
+    BASE_LIMIT,
+    CALENDAR_DAYS_PER_SESSION,
+    CALENDAR_PADDING_DAYS,
+    STRATEGY_SPECS,
+    combine_masks,
+    compile_spec,
+    evaluate_truncated,
+    has_rank,
+    is_path_dependent,
+    load_universe,
+    prepare_panel,
+    run_spec,
+    single_date_lengths,
+)
+from universe import MAIN_BOARD_UNIVERSE, board_mask, day_mask, make_universe
+
+from utils.logger import logger
+
+
+def _evaluate_limit_up(panel: pd.DataFrame, st_periods: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """涨停连板预测：每个交易日收盘封板、收盘价不低于最高价95%、至少10天历史的股票打分"""
+    add_limit_up_features(panel, st_periods)
+    mask = (
+        day_mask(panel, LIMIT_UP_UNIVERSE, st_periods)
+        & panel["is_limit_up_close"].to_numpy()
+        & (panel["close"] >= panel["high"] * 0.95).to_numpy()
+        & (panel["n_days"] >= 10).to_numpy()
+    )
+    rows = panel[mask]
+    return score_limit_up(rows, rows["trade_date"].to_numpy())
+
+
+def _spec_evaluator(name: str):
+    spec = STRATEGY_SPECS[name]
+    path_dependent = is_path_dependent(spec)
+
+    def evaluate(panel: pd.DataFrame, st_periods: Optional[pd.DataFrame]) -> pd.DataFrame:
+        universe = day_mask(panel, spec.get("universe", MAIN_BOARD_UNIVERSE), st_periods)
+        # 每一行在单日模式下实际用到的行数（读取窗口内最近 lookback 个交易日）
+        lengths = single_date_lengths(spec, panel)
+        if path_dependent:
+            # 递推指标依赖起点，全部按单日模式的截断逐日求值
+            raw, parts, redo = panel, [], universe
+        else:
+            raw = panel.copy()
+            layout = prepare_panel(panel, spec.get("base", []), st_periods=st_periods)
+            full_history = np.minimum(layout.positions + 1, spec.get("lookback", len(panel)))
+            mask = combine_masks(compile_spec(spec)(panel, layout)) & universe
+            # 停牌较久、单日模式读不满 lookback 的行按截断后的窗口重算，其余行在整段上求值结果相同；
+            # 带截面排名的规格排名范围是当天股票池内的全部股票，这些日期整天重算
+            redo = universe & (lengths < full_history)
+            if has_rank(spec) and redo.any():
+                redo = universe & np.isin(panel["trade_date"].to_numpy(), panel["trade_date"].to_numpy()[redo])
+            parts = [panel.loc[mask & ~redo]]
+
+        if redo.any():
+            rows, redo_mask = evaluate_truncated(spec, raw, redo, lengths, st_periods)
+            parts.append(rows.loc[redo_mask])
+        columns = ["ts_code", "trade_date"] + spec.get("output", [])
+        hits = pd.concat([part[columns] for part in parts]).sort_index() if parts else pd.DataFrame(columns=columns)
+        if has_rank(spec):
+            # 排名在全部板块上算完，再排除板块（见 strategy_spec.load_universe）
+            hits = hits[board_mask(hits["ts_code"].to_numpy(), spec.get("universe", MAIN_BOARD_UNIVERSE))]
+        # 规格策略只有命中与否，没有打分
+        hits.insert(2, "score", 1.0)
+        hits["strategy"] = name
+        return hits
+
+    return evaluate
+
+
+BATCH_EVALUATORS = {
+    "strategy_limit_up_continuation_prediction": {
+        "evaluate": _evaluate_limit_up,
+        "lookback": LIMIT_UP_LOOKBACK,
+        "lag": 1,
+        "columns": LIMIT_UP_COLUMNS,
+        "universe": LIMIT_UP_UNIVERSE,
+        "needs_st": True,
+    },
+    **{
+        name: {
+            "evaluate": _spec_evaluator(name),
+            "lookback": spec.get("lookback", 1),
+            "lag": 0,
+            "columns": None,
+            "universe": load_universe(spec),
+            "needs_st": BASE_LIMIT in spec.get("base", []) or spec.get("universe", MAIN_BOARD_UNIVERSE)["exclude_st"],
+        }
+        for name, spec in STRATEGY_SPECS.items()
+    },
+}
+
+
+def load_window(evaluator: dict, start_date: str, end_date: str) -> pd.DataFrame:
+    """读取区间加回看期的长表，板块排除在读取时下推"""
+    start_obj = datetime.strptime(start_date.replace("-", ""), "%Y%m%d")
+    sessions = evaluator["lookback"] + evaluator["lag"]
+    window_start = start_obj - timedelta(days=int(sessions * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS)
+    boards_only = make_universe(exclude_boards=evaluator["universe"]["exclude_boards"])
+    return query_history(
+        None, end_date, start_date=window_start.strftime("%Y%m%d"), columns=evaluator["columns"], universe=boards_only
+    )
+
+
+def screen_range(strategy_name: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    在 [start_date, end_date] 的每个交易日上运行策略
+
+    Returns:
+        长表，列为 trade_date、ts_code、score 及策略输出的其他列，按 trade_date、score 降序排列
+    """
+    if strategy_name not in BATCH_EVALUATORS:
+        raise ValueError(f"策略 {strategy_name} 没有批量求值器，可选: {list(BATCH_EVALUATORS)}")
+    evaluator = BATCH_EVALUATORS[strategy_name]
+
+    load_start = time.perf_counter()
+    panel = load_window(evaluator, start_date, end_date)
+    load_seconds = time.perf_counter() - load_start
+    if panel.empty:
+        logger.info(f"【{strategy_name}】{start_date} ~ {end_date} 没有行情数据")
+        return pd.DataFrame()
+
+    compute_start = time.perf_counter()
+    st_periods = load_st_periods() if evaluator["needs_st"] else None
+    hits = evaluator["evaluate"](panel, st_periods)
+
+    # 数据日期映射为策略的 trade_date：往后挪 lag 个交易日
+    dates = np.sort(panel["trade_date"].unique())
+    target = np.searchsorted(dates, hits["trade_date"].to_numpy()) + evaluator["lag"]
+    valid = target < len(dates)
+    hits = hits[valid].copy()
+    hits["trade_date"] = dates[target[valid]]
+
+    in_range = (hits["trade_date"] >= pd.to_datetime(start_date)) & (hits["trade_date"] <= pd.to_datetime(end_date))
+    hits = hits[in_range].sort_values(["trade_date", "score"], ascending=[True, False], kind="stable")
+    compute_seconds = time.perf_counter() - compute_start
+
+    logger.info(
+        f"【{strategy_name}】批量选股 {start_date} ~ {end_date}: 读取 {len(panel)} 行 {load_seconds:.2f}s，"
+        f"计算 {compute_seconds:.2f}s，命中 {len(hits)} 条，覆盖 {hits['trade_date'].nunique()} 个交易日"
+    )
+    return hits.reset_index(drop=True)
+
+
+def check_consistency(strategy_name: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    逐个交易日对比批量选股与单日模式（strategy_spec.run_spec）的命中，只支持规格策略
+
+    Returns:
+        每个交易日一行：batch、single 为两边的命中数，batch_only、single_only 为只在一边出现的股票数
+    """
+    if strategy_name not in STRATEGY_SPECS:
+        raise ValueError(f"只能对比规格策略，可选: {list(STRATEGY_SPECS)}")
+    batch = screen_range(strategy_name, start_date, end_date)
+    panel = load_window(BATCH_EVALUATORS[strategy_name], start_date, end_date)
+    dates = np.sort(panel["trade_date"].unique())
+    start, end = np.datetime64(pd.to_datetime(start_date)), np.datetime64(pd.to_datetime(end_date))
+    dates = dates[(dates >= start) & (dates <= end)]
+
+    rows = []
+    for date in pd.to_datetime(dates):
+        single = run_spec(strategy_name, date.strftime("%Y%m%d"))
+        single_codes = set(single["ts_code"]) if not single.empty else set()
+        batch_codes = set(batch.loc[batch["trade_date"] == date, "ts_code"]) if not batch.empty else set()
+        rows.append(
+            {
+                "trade_date": date,
+                "batch": len(batch_codes),
+                "single": len(single_codes),
+                "batch_only": len(batch_codes - single_codes),
+                "single_only": len(single_codes - batch_codes),
+            }
+        )
+    report = pd.DataFrame(rows, columns=["trade_date", "batch", "single", "batch_only", "single_only"])
+    mismatched = int(((report["batch_only"] > 0) | (report["single_only"] > 0)).sum())
+    log = logger.warning if mismatched else logger.info
+    log(f"【{strategy_name}】批量与单日对比 {len(report)} 个交易日，不一致 {mismatched} 个")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多日批量选股")
+    parser.add_argument("--strategy", required=True, choices=["all"] + list(BATCH_EVALUATORS))
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--output", default=None, help="结果 CSV 路径，默认 batch_results/<策略>_<起>_<止>.csv")
+    parser.add_argument(
+        "--check", action="store_true", help="逐日与单日模式对比命中，strategy 为 all 时对比全部规格策略"
+    )
+    args = parser.parse_args()
+
+    if args.check:
+        names = list(STRATEGY_SPECS) if args.strategy == "all" else [args.strategy]
+        reports = [check_consistency(name, args.start, args.end).assign(strategy=name) for name in names]
+        report = pd.concat(reports, ignore_index=True)
+        print(report.groupby("strategy")[["batch", "single", "batch_only", "single_only"]].sum().to_string())
+        sys.exit(1 if (report[["batch_only", "single_only"]].to_numpy() > 0).any() else 0)
+    if args.strategy == "all":
+        parser.error("strategy 为 all 时只能与 --check 一起使用")
+
+    result = screen_range(args.strategy, args.start, args.end)
+    output = args.output or f"batch_results/{args.strategy}_{args.start}_{args.end}.csv"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    result.to_csv(output, index=False, encoding="utf-8-sig")
+    logger.info(f"✅ 结果已保存: {output}")
@@ -0,0 +1,249 @@
+"""
+指标正确性与速度基准
+
+用合成的全市场行情（含停牌、涨跌停、一字板、次新股）对比：
+    • 参考实现：holding_analysis.calc_holding_indicators 逐股 groupby
+    • 候选实现：indicators.add_indicators（NumPy 内核，装了 numba 时再测一遍编译内核）
+记录每个指标列的最大绝对误差和耗时，结果追加到 benchmarks/indicator_benchmark.jsonl，
+并与上一次同规模的结果比较，误差超标或明显变慢时告警。
+
+用法：
+    python benchmark_indicators.py --stocks 5000 --days 750
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kernels
+import numpy as np
+import pandas as pd
+from holding_analysis import calc_holding_indicators
+from indicators import add_indicators
+from limit_price import classify_board, limit_pct, limit_prices
+
+from utils.logger import logger
+
+RESULT_FILE = "benchmarks/indicator_benchmark.jsonl"
+INDICATOR_COLUMNS = [
+    "pct_chg", "ma5", "ma10", "ma20", "ma30", "avg_vol_5", "avg_vol_10", "vol_ratio",
+    "ema12", "ema26", "diff", "dea", "macd", "low_9", "high_9", "rsv", "k", "d", "j", "rsi",
+]  # fmt: skip
+
+# 候选实现与参考实现允许的最大绝对误差
+MAX_ABS_DIFF = 1e-9
+# 比上一次慢超过该倍数时告警
+SLOWDOWN_RATIO = 1.5
+
+
+def generate_universe(
+    n_stocks: int = 5000,
+    n_days: int = 750,
+    seed: int = 0,
+    suspend_prob: float = 0.003,
+    limit_prob: float = 0.02,
+    new_listing_ratio: float = 0.1,
+) -> pd.DataFrame:
+    """
+    生成合成的全市场日线长表（按 ts_code、trade_date 升序）
+
+    Args:
+        n_stocks: 股票数量，主板/创业板/科创板混合
+        n_days: 交易日数量
+        seed: 随机种子
+        suspend_prob: 每天开始停牌的概率，停牌持续1~20天，停牌日不产生行
+        limit_prob: 每天强制涨停或跌停的概率，其中三分之一为一字板
+        new_listing_ratio: 区间中途才上市的股票占比
+    """
+    rng = np.random.default_rng(seed)
+    prefixes = np.array(["600", "601", "000", "002", "300", "688"])
+    serials = np.char.zfill(rng.choice(1000, n_stocks, replace=n_stocks > 1000).astype(str), 3)
+    codes = np.unique(np.char.add(prefixes[rng.integers(0, len(prefixes), n_stocks)], serials))
+    n_stocks = len(codes)
+    dates = pd.bdate_range("2022-01-04", periods=n_days)
+
+    pct = limit_pct(classify_board(codes), np.zeros(n_stocks, dtype=bool), np.repeat(dates[-1], n_stocks))
+    listed_from = np.where(rng.random(n_stocks) < new_listing_ratio, rng.integers(0, n_days, n_stocks), 0)
+
+    # 停牌区间
+    suspended = np.zeros((n_days, n_stocks), dtype=bool)
+    starts = np.argwhere(rng.random((n_days, n_stocks)) < suspend_prob)
+    for day, stock in starts:
+        suspended[day : day + rng.integers(1, 21), stock] = True
+
+    fields = {name: np.full((n_days, n_stocks), np.nan) for name in ("open", "high", "low", "close", "pre_close")}
+    last_close = np.round(rng.uniform(3, 60, n_stocks), 2)
+    for t in range(n_days):
+        up, down = limit_prices(last_close, pct)
+        ret = rng.normal(0.0005, 0.025, n_stocks)
+        forced = rng.random(n_stocks)
+        close = np.round(last_close * (1 + ret), 2)
+        close = np.where(forced < limit_prob / 2, up, close)
+        close = np.where((forced >= limit_prob / 2) & (forced < limit_prob), down, close)
+        close = np.clip(close, down, up)
+        open_ = np.clip(np.round(last_close * (1 + rng.normal(0, 0.01, n_stocks)), 2), down, up)
+        high = np.minimum(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n_stocks))), up)
+        low = np.maximum(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n_stocks))), down)
+
+        one_word = forced < limit_prob / 6
+        open_, high, low = (np.where(one_word, up, x) for x in (open_, high, low))
+
+        halted = suspended[t]
+        close = np.where(halted, last_close, close)
+        fields["pre_close"][t] = last_close
+        fields["open"][t] = np.where(halted, last_close, open_)
+        fields["high"][t] = np.where(halted, last_close, np.round(high, 2))
+        fields["low"][t] = np.where(halted, last_close, np.round(low, 2))
+        fields["close"][t] = close
+        last_close = close
+
+    exists = ~suspended & (np.arange(n_days)[:, None] >= listed_from[None, :])
+    stock_idx, day_idx = np.nonzero(exists.T)
+    df = pd.DataFrame(
+        {
+            "ts_code": codes[stock_idx],
+            "trade_date": dates[day_idx],
+            **{name: values.T[stock_idx, day_idx] for name, values in fields.items()},
+        }
+    )
+    df["vol"] = np.round(rng.lognormal(10, 1, len(df)), 2)
+    df["amount"] = df["vol"] * df["close"] / 10
+
+    # 复牌日的昨收取上一个有成交的收盘价
+    prev_close = df.groupby("ts_code")["close"].shift()
+    df["pre_close"] = prev_close.fillna(df["pre_close"])
+    return df[["ts_code", "trade_date", "open", "high", "low", "close", "pre_close", "vol", "amount"]]
+
+
+def run_reference(df: pd.DataFrame) -> pd.DataFrame:
+    """参考实现：逐股 groupby + holding_analysis 的指标计算"""
+    parts = [calc_holding_indicators(group.reset_index(drop=True)) for _, group in df.groupby("ts_code", sort=True)]
+    return pd.concat(parts, ignore_index=True)
+
+
+def run_vectorized(df: pd.DataFrame, use_numba: bool) -> pd.DataFrame:
+    """候选实现：全市场一次性计算"""
+    previous = kernels.USE_NUMBA
+    kernels.USE_NUMBA = use_numba
+    try:
+        return add_indicators(df.copy())
+    finally:
+        kernels.USE_NUMBA = previous
+
+
+def max_abs_diff(reference: pd.DataFrame, candidate: pd.DataFrame) -> Dict[str, float]:
+    """逐列最大绝对误差；NaN 位置不一致视为无穷大"""
+    result = {}
+    for col in INDICATOR_COLUMNS:
+        a = reference[col].to_numpy(dtype=np.float64)
+        b = candidate[col].to_numpy(dtype=np.float64)
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            result[col] = float("inf")
+            continue
+        finite = np.isfinite(a) & np.isfinite(b)
+        if not np.array_equal(a[~finite], b[~finite], equal_nan=True):
+            result[col] = float("inf")
+            continue
+        result[col] = float(np.max(np.abs(a[finite] - b[finite]))) if finite.any() else 0.0
+    return result
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(n_stocks: int, n_days: int, seed: int = 0) -> dict:
+    """生成数据、运行参考实现和各候选实现，返回一条结果记录"""
+    df, gen_seconds = timed(generate_universe, n_stocks, n_days, seed)
+    logger.info(f"合成数据: {df['ts_code'].nunique()} 只股票，{len(df)} 行，耗时 {gen_seconds:.2f}s")
+
+    reference, ref_seconds = timed(run_reference, df)
+    logger.info(f"参考实现（逐股 groupby）耗时 {ref_seconds:.2f}s")
+
+    record = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "n_stocks": n_stocks,
+        "n_days": n_days,
+        "seed": seed,
+        "rows": len(df),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "reference_seconds": round(ref_seconds, 4),
+        "candidates": {},
+    }
+
+    candidates = {"vectorized_numpy": False}
+    if kernels.HAS_NUMBA:
+        candidates["vectorized_numba"] = True
+        run_vectorized(df.head(100), True)  # 预热，排除编译耗时
+
+    for name, use_numba in candidates.items():
+        candidate, seconds = timed(run_vectorized, df, use_numba)
+        diffs = max_abs_diff(reference, candidate)
+        worst = max(diffs.values())
+        record["candidates"][name] = {
+            "seconds": round(seconds, 4),
+            "speedup": round(ref_seconds / seconds, 1) if seconds > 0 else None,
+            "max_abs_diff": worst,
+            "passed": worst <= MAX_ABS_DIFF,
+            "diff_by_column": diffs,
+        }
+        logger.info(f"{name}: 耗时 {seconds:.2f}s，加速 {ref_seconds / seconds:.1f}x，最大误差 {worst:.3g}")
+
+    return record
+
+
+def load_previous(path: str, n_stocks: int, n_days: int) -> Optional[dict]:
+    """读取上一次同规模的结果"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["n_stocks"] == n_stocks and record["n_days"] == n_days:
+                previous = record
+    return previous
+
+
+def check_regression(record: dict, previous: Optional[dict]) -> bool:
+    """误差超标或比上一次明显变慢时告警，返回是否通过"""
+    passed = True
+    for name, result in record["candidates"].items():
+        if not result["passed"]:
+            passed = False
+            bad = {k: v for k, v in result["diff_by_column"].items() if v > MAX_ABS_DIFF}
+            logger.error(f"❌ {name} 与参考实现不一致: {bad}")
+
+        last = (previous or {}).get("candidates", {}).get(name)
+        if last and result["seconds"] > last["seconds"] * SLOWDOWN_RATIO:
+            logger.warning(f"⚠️ {name} 变慢: {last['seconds']}s -> {result['seconds']}s")
+    return passed
+
+
+def save_record(record: dict, path: str = RESULT_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="指标正确性与速度基准")
+    parser.add_argument("--stocks", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=750)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=RESULT_FILE)
+    args = parser.parse_args()
+
+    previous = load_previous(args.output, args.stocks, args.days)
+    record = run_benchmark(args.stocks, args.days, args.seed)
+    ok = check_regression(record, previous)
+    save_record(record, args.output)
+    logger.info(f"{'✅' if ok else '❌'} 基准结果已保存: {args.output}")
@@ -0,0 +1,35 @@
+"""
+按需创建的外部资源
+
+模块导入时不做任何连接或登录：数据库引擎、Tushare 客户端、HTTP 会话都在第一次调用对应的 get_* 时才创建，
+之后在进程内复用。盘后选股用不到行情接口，回测和基准测试用不到 Tushare，导入时都不必为它们付出代价。
+重依赖（sqlalchemy、tushare、requests）也在函数内导入，缺少某个依赖只影响真正用到它的功能。
+"""
+from functools import lru_cache
+
+from config import MYSQL_URL, TUSHARE_TOKEN
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """MySQL 引擎（SQLAlchemy 自带连接池，整个进程共用一个）"""
+    from sqlalchemy import create_engine
+
+    return create_engine(MYSQL_URL)
+
+
+@lru_cache(maxsize=None)
+def get_pro():
+    """已设置 token 的 Tushare Pro 客户端"""
+    import tushare as ts
+
+    ts.set_token(TUSHARE_TOKEN)
+    return ts.pro_api()
+
+
+@lru_cache(maxsize=None)
+def get_http_session():
+    """实时行情请求共用的 HTTP 会话，复用 TCP 连接"""
+    import requests
+
+    return requests.Session()
@@ -0,0 +1,169 @@
+"""
+紧凑存储模式（可选）：把全市场多年日线 + 指标列压缩到内存里
+
+存储约定：
+    • ts_code     -> int32 股票编号，直接取6位代码的数值（"000001" -> 1），跨批次稳定，无需额外映射表
+    • trade_date  -> int32 的 YYYYMMDD
+    • 价格列      -> int32 的“分”（价格 × 100），缺失值用 PRICE_NA 表示
+    • vol/amount  -> float32
+    • 指标列      -> float32
+
+精度保证：
+    • 价格：A股最小变动单位是0.01元，压缩/还原完全无损；若原值多于2位小数，误差 ≤ 0.005 元
+    • float32 列：相对误差 ≤ 2^-24（约 6e-8），例如100元的均线误差 < 1e-5 元，1亿手成交量误差 < 6手
+    • 指标应先用 float64 计算再压缩，压缩只影响存储，不影响计算过程
+
+每行约 36 字节（float64 + 字符串代码约 130 字节以上），5000只股票 × 750天 ≈ 130MB。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from data_source import read_daily
+
+from utils.logger import logger
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "pre_close"]
+FLOAT32_COLUMNS = ["vol", "amount"]
+PRICE_SCALE = 100
+PRICE_NA = np.iinfo(np.int32).min
+
+# 还原后允许的最大误差，供校验使用
+PRICE_TOLERANCE = 0.5 / PRICE_SCALE
+FLOAT32_RTOL = 2.0**-24
+
+
+def encode_symbols(ts_codes) -> np.ndarray:
+    """把6位股票代码转成 int32 编号，如 "600000" -> 600000"""
+    codes = pd.Series(ts_codes, dtype="object").astype(str).str[:6]
+    if not codes.str.isdigit().all():
+        bad = codes[~codes.str.isdigit()].unique()[:5].tolist()
+        raise ValueError(f"无法转换为数字编号的股票代码: {bad}")
+    return codes.astype(np.int32).to_numpy()
+
+
+def decode_symbols(symbol_ids) -> np.ndarray:
+    """把 int32 编号还原成6位股票代码"""
+    return pd.Series(symbol_ids).astype(str).str.zfill(6).to_numpy()
+
+
+def encode_prices(values) -> np.ndarray:
+    """价格（元）-> int32 分，NaN 记为 PRICE_NA"""
+    values = np.asarray(values, dtype=np.float64)
+    scaled = np.rint(values * PRICE_SCALE)
+    scaled[np.isnan(scaled)] = PRICE_NA
+    return scaled.astype(np.int32)
+
+
+def decode_prices(values) -> np.ndarray:
+    """int32 分 -> float64 元，PRICE_NA 还原为 NaN"""
+    values = np.asarray(values)
+    result = values.astype(np.float64) / PRICE_SCALE
+    result[values == PRICE_NA] = np.nan
+    return result
+
+
+def compact_daily(df: pd.DataFrame, indicator_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    把 read_daily 风格的日线长表转成紧凑表示
+
+    Args:
+        df: 含 ts_code、trade_date 及行情字段的 DataFrame
+        indicator_columns: 需要压成 float32 的指标列，None 表示其余所有浮点列
+    """
+    result = {
+        "ts_code": encode_symbols(df["ts_code"]),
+        "trade_date": pd.to_datetime(df["trade_date"]).dt.strftime("%Y%m%d").astype(np.int32).to_numpy(),
+    }
+    for col in df.columns:
+        if col in result:
+            continue
+        if col in PRICE_COLUMNS:
+            result[col] = encode_prices(df[col])
+        elif col in FLOAT32_COLUMNS:
+            result[col] = df[col].to_numpy(dtype=np.float32)
+        elif pd.api.types.is_float_dtype(df[col]) and (indicator_columns is None or col in indicator_columns):
+            result[col] = df[col].to_numpy(dtype=np.float32)
+        else:
+            result[col] = df[col].to_numpy()
+    return pd.DataFrame(result)
+
+
+def restore_daily(df: pd.DataFrame) -> pd.DataFrame:
+    """把紧凑表示还原为常规 float64 日线长表（ts_code 为字符串，trade_date 为日期）"""
+    result = {
+        "ts_code": decode_symbols(df["ts_code"]),
+        "trade_date": pd.to_datetime(df["trade_date"].astype(str), format="%Y%m%d"),
+    }
+    for col in df.columns:
+        if col in result:
+            continue
+        if col in PRICE_COLUMNS:
+            result[col] = decode_prices(df[col])
+        elif df[col].dtype == np.float32:
+            result[col] = df[col].to_numpy(dtype=np.float64)
+        else:
+            result[col] = df[col].to_numpy()
+    return pd.DataFrame(result)
+
+
+def downcast_indicators(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """把指标列（默认所有 float64 列）原地降为 float32，返回同一个 DataFrame"""
+    if columns is None:
+        columns = [c for c in df.columns if df[c].dtype == np.float64]
+    for col in columns:
+        df[col] = df[col].astype(np.float32)
+    return df
+
+
+def max_roundtrip_error(raw: pd.DataFrame, compact: pd.DataFrame) -> Dict[str, float]:
+    """
+    校验压缩精度：返回每个数值列还原后的最大绝对误差
+    价格列应 ≤ PRICE_TOLERANCE，float32 列应 ≤ |原值| × FLOAT32_RTOL
+    """
+    restored = restore_daily(compact)
+    errors = {}
+    for col in raw.columns:
+        if col in ("ts_code", "trade_date") or not pd.api.types.is_float_dtype(raw[col]):
+            continue
+        diff = np.abs(raw[col].to_numpy(dtype=np.float64) - restored[col].to_numpy(dtype=np.float64))
+        errors[col] = float(np.nanmax(diff)) if len(diff) else 0.0
+    return errors
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """DataFrame 实际占用内存（MB）"""
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def load_compact_daily(
+    start_date: str,
+    end_date: str,
+    ts_codes: Optional[List[str]] = None,
+    chunk_days: int = 90,
+) -> pd.DataFrame:
+    """
+    按日期分段读取 stock_daily 并逐段压缩，峰值内存只有一段 float64 数据
+
+    Args:
+        start_date: 起始日期（含），YYYYMMDD
+        end_date: 截止日期（含），YYYYMMDD
+        ts_codes: 只读取这些股票，None 表示全市场
+        chunk_days: 每段覆盖的自然日天数
+    """
+    chunks = []
+    bounds = pd.date_range(pd.to_datetime(start_date), pd.to_datetime(end_date), freq=f"{chunk_days}D")
+    for chunk_start in bounds:
+        chunk_end = min(chunk_start + pd.Timedelta(days=chunk_days - 1), pd.to_datetime(end_date))
+        df = read_daily(chunk_start.strftime("%Y%m%d"), chunk_end.strftime("%Y%m%d"), ts_codes=ts_codes)
+        if not df.empty:
+            chunks.append(compact_daily(df))
+
+    if not chunks:
+        return compact_daily(pd.DataFrame(columns=["ts_code", "trade_date"]))
+
+    result = pd.concat(chunks, ignore_index=True)
+    result.sort_values(["ts_code", "trade_date"], inplace=True, kind="stable")
+    result.reset_index(drop=True, inplace=True)
+    logger.info(f"紧凑日线加载完成: {len(result)} 行，占用 {memory_mb(result):.1f} MB")
+    return result
@@ -0,0 +1,173 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+from clients import get_engine
+from instrumentation import record_load
+from universe import sql_conditions
+
+from utils.logger import logger
+
+# stock_daily 中可供读取的行情字段
+DAILY_COLUMNS = ["ts_code", "trade_date", "open", "high", "low", "close", "pre_close", "vol", "amount"]
+
+# 当前生效的内存快照（snapshot.DailySnapshot），为 None 时直接查 MySQL
+_snapshot = None
+
+
+def set_snapshot(snapshot):
+    """设置（或传 None 清除）当前进程使用的内存快照"""
+    global _snapshot
+    _snapshot = snapshot
+
+
+def get_snapshot():
+    return _snapshot
+
+
+@contextmanager
+def use_snapshot(snapshot):
+    """在 with 块内让 query_* 系列函数从快照取数"""
+    previous = _snapshot
+    set_snapshot(snapshot)
+    try:
+        yield snapshot
+    finally:
+        set_snapshot(previous)
+
+
+def read_daily(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    ts_codes: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+    universe: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    读取 stock_daily 长表（每行一只股票一个交易日），按 ts_code、trade_date 升序返回
+
+    Args:
+        start_date: 起始日期（含），YYYYMMDD 或 YYYY-MM-DD，None 表示不限
+        end_date: 截止日期（含），None 表示不限
+        ts_codes: 只读取这些股票，None 表示全市场
+        columns: 需要的字段，ts_code 和 trade_date 总会带上
+        universe: 股票池条件（universe.make_universe），拼进 WHERE 下推到 MySQL；
+                  起止日期相同时按行过滤，否则以 end_date 为截面日选股
+    """
+    columns = [c for c in (columns or DAILY_COLUMNS) if c not in ("ts_code", "trade_date")]
+    select_cols = ", ".join(["ts_code", "trade_date"] + columns)
+
+    conditions = []
+    params = {}
+    if start_date:
+        conditions.append("trade_date >= %(start_date)s")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("trade_date <= %(end_date)s")
+        params["end_date"] = end_date
+    if ts_codes is not None:
+        if not ts_codes:
+            return pd.DataFrame(columns=["ts_code", "trade_date"] + columns)
+        placeholders = ",".join([f"%(ts_code_{i})s" for i in range(len(ts_codes))])
+        conditions.append(f"ts_code IN ({placeholders})")
+        for i, code in enumerate(ts_codes):
+            params[f"ts_code_{i}"] = code
+    if universe is not None:
+        universe_conditions, universe_params = sql_conditions(
+            universe, cross_section=bool(start_date) and start_date == end_date, end_date=end_date
+        )
+        conditions += universe_conditions
+        params.update(universe_params)
+
+    sql = f"SELECT {select_cols} FROM stock_daily"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ts_code, trade_date"
+
+    df = pd.read_sql(sql, get_engine(), params=params)
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    logger.info(f"读取 stock_daily: {start_date} ~ {end_date}，{len(df)} 行")
+    return df
+
+
+def query_cross_section(
+    trade_date: str,
+    columns: Optional[List[str]] = None,
+    universe: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    某一交易日的全市场截面（快照优先），universe 为股票池条件，不在池内的股票不会被读出
+    """
+    start = time.perf_counter()
+    if _snapshot is not None:
+        df = _snapshot.cross_section(trade_date, columns, universe)
+    else:
+        df = read_daily(trade_date, trade_date, columns=columns, universe=universe)
+    record_load(len(df), time.perf_counter() - start)
+    return df
+
+
+def query_history(
+    ts_codes: Optional[List[str]],
+    end_date: str,
+    start_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    universe: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    指定股票截至 end_date（含）的历史日线（快照优先），按 ts_code、trade_date 升序
+    快照模式下只能取到快照窗口内的历史
+    universe 的板块排除对所有行生效，价格/ST/停牌/成交额条件以 end_date 为截面日判断
+    """
+    start = time.perf_counter()
+    if _snapshot is not None:
+        df = _snapshot.history(ts_codes, end_date, start_date, columns, universe)
+    else:
+        df = read_daily(start_date, end_date, ts_codes=ts_codes, columns=columns, universe=universe)
+    record_load(len(df), time.perf_counter() - start)
+    return df
+
+
+def query_trade_dates(start_date: str, end_date: str) -> pd.DatetimeIndex:
+    """
+    区间内（含首尾）的全部交易日（快照优先），即全市场有行情的日期，与读取了哪些股票无关
+    """
+    if _snapshot is not None:
+        return _snapshot.trade_dates(start_date, end_date)
+
+    sql = """
+    SELECT DISTINCT trade_date
+    FROM stock_daily
+    WHERE trade_date >= %(start_date)s AND trade_date <= %(end_date)s
+    ORDER BY trade_date
+    """
+    result = pd.read_sql(sql, get_engine(), params={"start_date": start_date, "end_date": end_date})
+    return pd.DatetimeIndex(pd.to_datetime(result["trade_date"]))
+
+
+def query_previous_trade_date(trade_date: str, max_days: int = 10) -> Optional[str]:
+    """
+    获取指定日期之前的最近一个交易日，返回 YYYY-MM-DD（快照优先）
+    """
+    if _snapshot is not None:
+        return _snapshot.previous_trade_date(trade_date)
+
+    trade_date_obj = datetime.strptime(trade_date.replace("-", ""), "%Y%m%d")
+    sql = """
+    SELECT MAX(trade_date) AS trade_date
+    FROM stock_daily
+    WHERE trade_date < %(trade_date)s AND trade_date >= %(since)s
+    """
+    since = (trade_date_obj - timedelta(days=max_days)).strftime("%Y-%m-%d")
+    result = pd.read_sql(sql, get_engine(), params={"trade_date": trade_date_obj.strftime("%Y-%m-%d"), "since": since})
+    value = result.iloc[0]["trade_date"]
+    if value is None or pd.isna(value):
+        return None
+    return pd.to_datetime(value).strftime("%Y-%m-%d")
@@ -2,20 +2,13 @@ import time
 from datetime import datetime, timedelta
 
 import pandas as pd
-import tushare as ts
-from config import MYSQL_URL, TUSHARE_TOKEN
+from clients import get_engine, get_pro
 
 # 加载表元信息
-from models import StockDaily  # 假设你已定义 ORM 类
-from sqlalchemy import create_engine
+from models import StockAdjFactor, StockDaily  # 假设你已定义 ORM 类
 from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.orm import sessionmaker
 
-# 初始化 Tushare 和数据库连接
-ts.set_token(TUSHARE_TOKEN)
-pro = ts.pro_api()
-engine = create_engine(MYSQL_URL)
-
 
 def get_daily_by_trade_date(trade_date: str):
     """
@@ -27,7 +20,7 @@ def get_daily_by_trade_date(trade_date: str):
 
     while True:
         try:
-            df = pro.daily(trade_date=trade_date, offset=offset, limit=limit)
+            df = get_pro().daily(trade_date=trade_date, offset=offset, limit=limit)
             if df.empty:
                 break
             all_data.append(df)
@@ -52,7 +45,7 @@ def save_to_mysql(df: pd.DataFrame):
     df["trade_date"] = pd.to_datetime(df["trade_date"])
     df["update_time"] = datetime.now()
 
-    Session = sessionmaker(bind=engine)
+    Session = sessionmaker(bind=get_engine())
     session = Session()
 
     try:
@@ -79,9 +72,61 @@ def save_to_mysql(df: pd.DataFrame):
         session.close()
 
 
+def get_adj_factor_by_trade_date(trade_date: str):
+    """
+    拉取指定交易日所有股票的复权因子
+    """
+    try:
+        return get_pro().adj_factor(trade_date=trade_date)
+    except Exception as e:
+        print(f"❌ 拉取复权因子出错：{e}")
+        return pd.DataFrame()
+
+
+def save_adj_factor_to_mysql(df: pd.DataFrame):
+    """
+    复权因子有则更新，无则插入
+    """
+    df = df[["ts_code", "trade_date", "adj_factor"]].copy()
+    df["ts_code"] = df["ts_code"].str.split(".").str[0]  # 只保留股票代码
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    df["update_time"] = datetime.now()
+
+    Session = sessionmaker(bind=get_engine())
+    session = Session()
+
+    try:
+        for _, row in df.iterrows():
+            insert_stmt = insert(StockAdjFactor).values(**row.to_dict())
+            update_stmt = insert_stmt.on_duplicate_key_update(
+                adj_factor=insert_stmt.inserted.adj_factor,
+                update_time=datetime.now(),
+            )
+            session.execute(update_stmt)
+
+        session.commit()
+        print(f"✅ 已插入/更新 {len(df)} 条复权因子")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 复权因子写入失败: {e}")
+    finally:
+        session.close()
+
+
+def backfill_adj_factor(start_date: str, end_date: str):
+    """
+    补齐一段区间内每个交易日的复权因子（非交易日返回空，自动跳过）
+    """
+    for day in pd.bdate_range(start_date, end_date):
+        df_adj = get_adj_factor_by_trade_date(day.strftime("%Y%m%d"))
+        if not df_adj.empty:
+            save_adj_factor_to_mysql(df_adj)
+        time.sleep(0.2)  # 防止频率过高
+
+
 def run(trade_date: str):
     """
-    主函数：拉取并写入指定日期的所有股票日行情
+    主函数：拉取并写入指定日期的所有股票日行情和复权因子
     """
     print(f"📦 开始处理：{trade_date}")
     df = get_daily_by_trade_date(trade_date)
@@ -90,6 +135,10 @@ def run(trade_date: str):
         return
     save_to_mysql(df)
 
+    df_adj = get_adj_factor_by_trade_date(trade_date)
+    if not df_adj.empty:
+        save_adj_factor_to_mysql(df_adj)
+
 
 if __name__ == "__main__":
     # 示例：拉取今天的数据
@@ -97,4 +146,12 @@ if __name__ == "__main__":
     today = datetime.today().strftime("%Y%m%d")
     run(yesterday)
     run(today)
+
+    # 入库后增量更新远期收益立方体（还没构建过时跳过），失败不影响已入库的数据
+    try:
+        from forward_returns import update_cube
+
+        update_cube()
+    except Exception as e:
+        print(f"⚠️ 远期收益立方体更新失败：{e}")
     # run('')
@@ -2,23 +2,17 @@ import time
 from datetime import datetime
 
 import pandas as pd
-import tushare as ts
-from config import MYSQL_URL, TUSHARE_TOKEN
+from clients import get_engine, get_pro
 from models import StockDaily
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-ts.set_token(TUSHARE_TOKEN)
-pro = ts.pro_api()
-engine = create_engine(MYSQL_URL)
-Session = sessionmaker(bind=engine)
-
 
 def get_stock_list():
     return pd.read_csv("data/stock_list.csv")
 
 
 def update_stock(ts_code):
+    Session = sessionmaker(bind=get_engine())
     session = Session()
     try:
         last_record = (
@@ -26,7 +20,7 @@ def update_stock(ts_code):
         )
         start_date = last_record.trade_date.strftime("%Y%m%d") if last_record else "20240101"
 
-        df = pro.daily(ts_code=ts_code, start_date=start_date)
+        df = get_pro().daily(ts_code=ts_code, start_date=start_date)
         if df.empty:
             return
 
@@ -49,7 +43,7 @@ def update_stock(ts_code):
             print(f"⚠️ 无新增数据：{ts_code}")
             return
 
-        df.to_sql("stock_daily", con=engine, if_exists="append", index=False)
+        df.to_sql("stock_daily", con=get_engine(), if_exists="append", index=False)
         print(f"✅ 更新：{ts_code}，新增 {len(df)} 条记录")
         time.sleep(0.3)
 
@@ -0,0 +1,68 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+from clients import get_engine, get_pro
+from models import StockST
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import sessionmaker
+
+
+def get_name_changes():
+    """
+    分页拉取全部股票的曾用名记录
+    """
+    all_data = []
+    offset = 0
+    limit = 5000
+
+    while True:
+        try:
+            df = get_pro().namechange(fields="ts_code,name,start_date,end_date", offset=offset, limit=limit)
+            if df.empty:
+                break
+            all_data.append(df)
+            offset += limit
+            time.sleep(0.2)  # 防止频率过高
+        except Exception as e:
+            print(f"❌ 拉取数据出错：{e}")
+            break
+
+    return pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
+
+
+def save_st_periods(df: pd.DataFrame):
+    """
+    从曾用名记录中提取ST区间（名称含 ST），有则更新，无则插入
+    """
+    df = df[df["name"].str.contains("ST", na=False)].copy()
+    df["ts_code"] = df["ts_code"].str.split(".").str[0]  # 只保留股票代码
+    df["start_date"] = pd.to_datetime(df["start_date"])
+    df["end_date"] = pd.to_datetime(df["end_date"]).astype(object).where(df["end_date"].notna(), None)
+    df = df.drop_duplicates(["ts_code", "start_date"])[["ts_code", "start_date", "end_date", "name"]]
+    df["update_time"] = datetime.now()
+
+    Session = sessionmaker(bind=get_engine())
+    session = Session()
+
+    try:
+        for _, row in df.iterrows():
+            insert_stmt = insert(StockST).values(**row.to_dict())
+            update_stmt = insert_stmt.on_duplicate_key_update(
+                end_date=insert_stmt.inserted.end_date,
+                name=insert_stmt.inserted.name,
+                update_time=datetime.now(),
+            )
+            session.execute(update_stmt)
+
+        session.commit()
+        print(f"✅ 已插入/更新 {len(df)} 条ST区间")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 写入失败: {e}")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    save_st_periods(get_name_changes())
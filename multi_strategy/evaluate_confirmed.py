@@ -0,0 +1,277 @@
+"""
+历史确认买入列表的事后评估
+
+confirmed_stocks/ 下每天一份 confirmed_stocks_YYYYMMDD.csv（含 his/、newhis/ 子目录里的旧文件），
+这里把所有文件一次读入，与 stock_daily 后续 N 个交易日的行情做一次向量化对齐，统计每天、每个策略的命中率和收益：
+    • 文件日期为买入日：当天（非交易日则顺延到下一个交易日）开盘买入，一字涨停视为买不进
+    • ret_h 为第 h 个交易日收盘卖出的收益（h = 1..N，A股 T+1），max_high_ret 为 N 日内最高价相对买入价的涨幅
+    • 同一天有多份文件时以顶层目录为准，其次 newhis/、his/；文件名带 copy、bak 等后缀的不读
+
+历史文件格式不统一，读入时统一处理：
+    • 股票代码可能带 .SZ/.SH 后缀（stock_daily 只存6位代码）
+    • 策略名称可能是 "a, b"，也可能是 "['a', 'b']"，也可能为空（记为“未标注”）
+    • 旧文件没有昨收、策略数量列
+
+结果写到 confirmed_outcomes/：
+    outcomes.pkl   逐只股票的结果（增量维护）
+    per_day.csv    每天的统计
+    per_strategy.csv 每个策略的统计
+    manifest.json  每个日期已处理的文件（路径、修改时间、大小）以及结果是否已完整
+再次运行时只处理新增或修改过的文件，以及上次还没走完 N 个交易日的日期。
+
+用法：
+    python evaluate_confirmed.py --horizon 5
+"""
+import argparse
+import glob
+import json
+import os
+import pickle
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from data_source import query_history
+from limit_price import add_limit_columns, load_st_periods
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+
+from utils.logger import logger
+
+CONFIRMED_DIR = "confirmed_stocks"
+# 同一日期有多份文件时的优先级（靠前的优先）
+SOURCE_DIRS = ["", "newhis", "his"]
+OUTPUT_DIR = "confirmed_outcomes"
+UNLABELED = "未标注"
+
+FILE_PATTERN = re.compile(r"^confirmed_stocks_(\d{8})\.csv$")
+PRICE_COLUMNS = ["open", "high", "low", "close", "pre_close"]
+# 文件日期之后这么多自然日内都没有行情（长期停牌）视为没有买入，覆盖春节、国庆长假
+MAX_ENTRY_DELAY_DAYS = 10
+
+
+def list_sources(confirmed_dir: str = CONFIRMED_DIR) -> Dict[str, dict]:
+    """每个日期选一份文件，返回 {YYYYMMDD: {path, mtime, size}}"""
+    sources = {}
+    for sub in SOURCE_DIRS:
+        for path in sorted(glob.glob(os.path.join(confirmed_dir, sub, "*.csv"))):
+            match = FILE_PATTERN.match(os.path.basename(path))
+            if not match:
+                logger.info(f"跳过非标准文件名: {path}")
+                continue
+            date = match.group(1)
+            if date in sources:
+                continue
+            stat = os.stat(path)
+            sources[date] = {"path": path, "mtime": stat.st_mtime, "size": stat.st_size}
+    return dict(sorted(sources.items()))
+
+
+def parse_strategies(names: pd.Series) -> pd.Series:
+    """把 "a, b" 和 "['a', 'b']" 两种格式统一成策略名列表，空值为 [UNLABELED]"""
+    cleaned = names.fillna("").astype(str).str.replace(r"[\[\]'\"]", "", regex=True)
+    return cleaned.map(lambda s: [name.strip() for name in s.split(",") if name.strip()] or [UNLABELED])
+
+
+def read_picks(sources: Dict[str, dict]) -> pd.DataFrame:
+    """读取并统一格式，返回 pick_date、ts_code、strategies、strategy_count 长表"""
+    frames = []
+    for date, source in sources.items():
+        df = pd.read_csv(source["path"], encoding="utf-8-sig", dtype={"股票代码": str})
+        if df.empty:
+            continue
+        strategies = parse_strategies(df["策略名称"] if "策略名称" in df.columns else pd.Series([None] * len(df)))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "pick_date": pd.Timestamp(date),
+                    "ts_code": df["股票代码"].str.split(".").str[0].str.zfill(6).to_numpy(),
+                    "strategies": strategies.to_numpy(),
+                    "strategy_count": strategies.map(len).to_numpy(),
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=["pick_date", "ts_code", "strategies", "strategy_count"])
+    picks = pd.concat(frames, ignore_index=True)
+    return picks.drop_duplicates(["pick_date", "ts_code"]).reset_index(drop=True)
+
+
+def evaluate_picks(picks: pd.DataFrame, horizon: int) -> pd.DataFrame:
+    """
+    一次读出所有股票覆盖全部日期的行情，对每只股票的买入日和之后 horizon 个交易日做向量化取值
+
+    Returns:
+        picks 加上 entry_date、entry_price、filled、ret_1..ret_N、max_high_ret、complete
+    """
+    # 下面 merge_asof 要求两边日期单位一致：pick_date 来自 pd.Timestamp，行情的 trade_date 单位由数据源决定，统一成纳秒
+    picks = picks.assign(pick_date=picks["pick_date"].astype("datetime64[ns]"))
+    first = picks["pick_date"].min()
+    last = picks["pick_date"].max() + timedelta(days=int(horizon * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS)
+    last = min(last, pd.Timestamp(datetime.now().date()))
+    panel = query_history(
+        sorted(picks["ts_code"].unique()), last.strftime("%Y%m%d"), first.strftime("%Y%m%d"), PRICE_COLUMNS
+    )
+    if panel.empty:
+        # 这些股票在区间内都没有行情，全部记为未买入
+        result = picks.copy()
+        result["entry_date"] = pd.Series(pd.NaT, index=result.index, dtype="datetime64[ns]")
+        result["entry_price"] = np.nan
+        result["filled"] = False
+        for h in range(1, horizon + 1):
+            result[f"ret_{h}"] = np.nan
+        result["max_high_ret"] = np.nan
+        result["complete"] = False
+        return result
+    add_limit_columns(panel, load_st_periods())
+
+    panel["trade_date"] = panel["trade_date"].astype("datetime64[ns]")
+
+    # 每只股票的买入日：不早于文件日期的第一个交易日（按股票自身交易日，短暂停牌则顺延）
+    panel["row"] = np.arange(len(panel))
+    located = pd.merge_asof(
+        picks.assign(_order=np.arange(len(picks))).sort_values("pick_date"),
+        panel[["trade_date", "ts_code", "row"]].sort_values("trade_date"),
+        left_on="pick_date",
+        right_on="trade_date",
+        by="ts_code",
+        direction="forward",
+        tolerance=pd.Timedelta(days=MAX_ENTRY_DELAY_DAYS),
+    ).sort_values("_order")
+    row = located["row"].to_numpy()
+    found = ~np.isnan(row)
+    row = np.where(found, row, 0).astype(np.int64)
+
+    # (股票, 0..horizon) 的行号矩阵，越过该股票最后一行的位置记为无效
+    codes = panel["ts_code"].to_numpy()
+    offsets = row[:, None] + np.arange(horizon + 1)
+    valid = found[:, None] & (offsets < len(panel))
+    offsets = np.minimum(offsets, len(panel) - 1)
+    valid &= codes[offsets] == codes[row][:, None]
+
+    entry = panel["open"].to_numpy()[row]
+    filled = found & ~panel["is_one_word_board"].to_numpy()[row]
+    close = np.where(valid, panel["close"].to_numpy()[offsets], np.nan)
+    high = np.where(valid[:, 1:], panel["high"].to_numpy()[offsets[:, 1:]], np.nan)
+
+    result = picks.copy()
+    result["entry_date"] = np.where(found, panel["trade_date"].to_numpy()[row], np.datetime64("NaT"))
+    result["entry_price"] = np.where(found, entry, np.nan)
+    result["filled"] = filled
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for h in range(1, horizon + 1):
+            result[f"ret_{h}"] = np.where(filled, close[:, h] / entry - 1, np.nan)
+        max_high = np.fmax.reduce(high, axis=1) if horizon else np.full(len(result), np.nan)
+        result["max_high_ret"] = np.where(filled, max_high / entry - 1, np.nan)
+    result["complete"] = valid[:, horizon]
+    return result
+
+
+def summarize_outcomes(outcomes: pd.DataFrame, by: str, horizon: int) -> pd.DataFrame:
+    """按 by 分组统计：入选数、买入数、各持有期的命中率（收益>0）和平均收益、N 日内最高涨幅均值"""
+    groups = outcomes.groupby(by, sort=True)
+    stats = pd.DataFrame({"picks": groups.size(), "filled": groups["filled"].sum().astype(int)})
+    for h in range(1, horizon + 1):
+        ret = outcomes[f"ret_{h}"]
+        stats[f"hit_rate_{h}"] = (ret > 0).astype(float).where(ret.notna()).groupby(outcomes[by]).mean().round(4)
+        stats[f"avg_ret_{h}"] = groups[f"ret_{h}"].mean().round(5)
+    stats["avg_max_high_ret"] = groups["max_high_ret"].mean().round(5)
+    return stats.reset_index()
+
+
+def load_state(output_dir: str):
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    outcomes_path = os.path.join(output_dir, "outcomes.pkl")
+    if not (os.path.exists(manifest_path) and os.path.exists(outcomes_path)):
+        return {"files": {}}, None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    with open(outcomes_path, "rb") as f:
+        outcomes = pickle.load(f)
+    return manifest, outcomes
+
+
+def save_state(output_dir: str, manifest: dict, outcomes: pd.DataFrame):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "outcomes.pkl"), "wb") as f:
+        pickle.dump(outcomes, f)
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def evaluate_confirmed(
+    confirmed_dir: str = CONFIRMED_DIR, output_dir: str = OUTPUT_DIR, horizon: int = 5, rebuild: bool = False
+):
+    """
+    增量评估所有确认买入文件，返回 (outcomes, per_day, per_strategy)
+
+    Args:
+        horizon: 统计买入后多少个交易日
+        rebuild: 忽略已有结果，全部重算；horizon 与上次不同时也会全部重算
+    """
+    sources = list_sources(confirmed_dir)
+    manifest, outcomes = load_state(output_dir)
+    if rebuild or outcomes is None or manifest.get("horizon") != horizon:
+        manifest, outcomes = {"files": {}}, None
+
+    done = manifest["files"]
+    pending = [
+        date
+        for date, source in sources.items()
+        if date not in done
+        or not done[date]["complete"]
+        or any(done[date][k] != source[k] for k in ("path", "mtime", "size"))
+    ]
+    removed = [date for date in done if date not in sources]
+    logger.info(f"共 {len(sources)} 个日期，本次处理 {len(pending)} 个，移除 {len(removed)} 个")
+
+    if outcomes is not None:
+        stale = pd.to_datetime(pending + removed, format="%Y%m%d")
+        outcomes = outcomes[~outcomes["pick_date"].isin(stale)]
+    for date in removed:
+        del done[date]
+
+    picks = read_picks({date: sources[date] for date in pending})
+    complete = pd.Series(dtype=bool)
+    if not picks.empty:
+        fresh = evaluate_picks(picks, horizon)
+        outcomes = fresh if outcomes is None else pd.concat([outcomes, fresh], ignore_index=True)
+        # 一天算完整：至少有一只股票有行情，且有行情的股票都走完了 horizon 个交易日（找不到行情的代码不再等待）
+        found = fresh["entry_date"].notna()
+        days = fresh["pick_date"].dt.strftime("%Y%m%d")
+        complete = found.groupby(days).any() & ~(found & ~fresh["complete"]).groupby(days).any()
+    for date in pending:
+        done[date] = {**sources[date], "complete": bool(complete.get(date, True))}
+
+    manifest = {"horizon": horizon, "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "files": done}
+    if outcomes is None or outcomes.empty:
+        logger.warning(f"{confirmed_dir} 下没有可评估的入选记录")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    outcomes = outcomes.sort_values(["pick_date", "ts_code"]).reset_index(drop=True)
+    save_state(output_dir, manifest, outcomes)
+
+    per_day = summarize_outcomes(outcomes, "pick_date", horizon)
+    per_strategy = summarize_outcomes(outcomes.explode("strategies"), "strategies", horizon)
+    per_day.to_csv(os.path.join(output_dir, "per_day.csv"), index=False, encoding="utf-8-sig")
+    per_strategy.to_csv(os.path.join(output_dir, "per_strategy.csv"), index=False, encoding="utf-8-sig")
+    return outcomes, per_day, per_strategy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="历史确认买入列表的事后评估")
+    parser.add_argument("--confirmed-dir", default=CONFIRMED_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--horizon", type=int, default=5, help="统计买入后多少个交易日")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有结果全部重算")
+    args = parser.parse_args()
+
+    outcomes, per_day, per_strategy = evaluate_confirmed(
+        args.confirmed_dir, args.output_dir, args.horizon, args.rebuild
+    )
+    logger.info(f"✅ 共 {len(outcomes)} 条入选记录，{per_day['pick_date'].nunique()} 个交易日")
+    logger.info(f"📊 各策略表现:\n{per_strategy.to_string(index=False)}")
+    logger.info(f"✅ 结果已保存: {args.output_dir}")
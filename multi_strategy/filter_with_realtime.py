@@ -7,19 +7,17 @@ import time
 from datetime import datetime, timedelta
 
 import pandas as pd
-import schedule
-from config import MYSQL_URL
+from adj_factor import adjust_prices, load_adj_factors
+from clients import get_engine
 from get_realtime import get_realtime_info
-
-# 加载表元信息
-from models import StockDaily  # 假设你已定义 ORM 类
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
-from strategies import ALL_STRATEGIES
+from tick_source import get_quote, now, query_ticks
 
 from utils.logger import logger
 
-engine = create_engine(MYSQL_URL)
+# 实时昨收与库里 T-1 收盘价相差超过这个比例才视为当天除权除息（两者都保留两位小数）
+EX_RIGHTS_TOLERANCE = 1e-4
 
 
 def get_yesterday_close(ts_code, trade_date):
@@ -29,7 +27,7 @@ def get_yesterday_close(ts_code, trade_date):
     ORDER BY trade_date DESC
     LIMIT 1
     """
-    df = pd.read_sql(sql, engine, params={"ts_code": ts_code, "trade_date": trade_date})
+    df = pd.read_sql(sql, get_engine(), params={"ts_code": ts_code, "trade_date": trade_date})
     if not df.empty:
         return df.iloc[0]["close"]
     return None
@@ -40,7 +38,7 @@ def record_realtime_ticks(trade_date: str):
     ts_codes = df["股票代码"].tolist()
     now = datetime.now()
 
-    Session = sessionmaker(bind=engine)
+    Session = sessionmaker(bind=get_engine())
     session = Session()
 
     try:
@@ -84,13 +82,8 @@ def record_realtime_ticks(trade_date: str):
 
 
 def is_rising_in_recent_ticks(ts_code: str, minutes: int = 5) -> bool:
-    since = datetime.now() - timedelta(minutes=minutes)
-    sql = """
-    SELECT timestamp, price FROM realtime_ticks
-    WHERE ts_code = %(ts_code)s AND timestamp >= %(since)s
-    ORDER BY timestamp ASC
-    """
-    df = pd.read_sql(sql, engine, params={"ts_code": ts_code, "since": since})
+    since = now() - timedelta(minutes=minutes)
+    df = query_ticks(ts_code, since)
     if len(df) < 3:
         logger.info(f"{ts_code} 最近 {minutes} 分钟数据不足，无法判断是否上涨")
         return False
@@ -104,18 +97,8 @@ def get_pct_change_in_last_n_minutes(ts_code: str, minutes: int) -> float:
     """
     获取最近 N 分钟涨幅
     """
-    now = datetime.now()
-    start_time = now - timedelta(minutes=minutes)
-    df = pd.read_sql(
-        """
-        SELECT timestamp, price
-        FROM realtime_ticks
-        WHERE ts_code = %s AND timestamp >= %s
-        ORDER BY timestamp ASC
-        """,
-        con=engine,
-        params=(ts_code, start_time),
-    )
+    start_time = now() - timedelta(minutes=minutes)
+    df = query_ticks(ts_code, start_time)
 
     if df.empty or len(df) < 2:
         return 0.0
@@ -128,12 +111,18 @@ def get_pct_change_in_last_n_minutes(ts_code: str, minutes: int) -> float:
     return (end_price - start_price) / start_price * 100
 
 
-def get_platform_breakout_price(ts_code: str, trade_date: str, window: int = 20) -> float | None:
+def get_platform_breakout_price(
+    ts_code: str, trade_date: str, window: int = 20, pre_close: float | None = None
+) -> float | None:
     """
     获取某只股票最近window日内的最高价（即平台突破参考价）
+    按前复权口径计算，与实时行情（fqt=1）可直接比较
+
+    当天的复权因子收盘后才由 download_by_date 入库，除权除息日盘中只能取到 T-1 的因子。
+    传入实时行情的昨收（pre_close，已按除权调整）时，用它与库里 T-1 收盘价之比补上当天的除权调整
     """
     sql = """
-    SELECT MAX(high) as breakout_price
+    SELECT ts_code, trade_date, high
     FROM stock_daily
     WHERE ts_code = %(ts_code)s AND trade_date < %(trade_date)s
     ORDER BY trade_date DESC
@@ -141,43 +130,39 @@ def get_platform_breakout_price(ts_code: str, trade_date: str, window: int = 20)
     """
     df = pd.read_sql(
         sql,
-        engine,
+        get_engine(),
         params={"ts_code": ts_code, "trade_date": trade_date, "window": window},
     )
-    if not df.empty and df.iloc[0]["breakout_price"]:
-        return df.iloc[0]["breakout_price"]
-    return None
+    if df.empty:
+        return None
+
+    factors = load_adj_factors(end_date=trade_date, ts_codes=[ts_code])
+    if not factors.empty:
+        df = adjust_prices(df, factors, base_date=trade_date, columns=["high"])
+
+    has_today_factor = not factors.empty and factors["trade_date"].max() >= pd.to_datetime(trade_date)
+    if pre_close and not has_today_factor:
+        last_close = get_yesterday_close(ts_code, trade_date)
+        if last_close and abs(pre_close / last_close - 1) > EX_RIGHTS_TOLERANCE:
+            df["high"] = df["high"] * (pre_close / last_close)
+
+    breakout_price = df["high"].max()
+    return breakout_price if breakout_price else None
 
 
 def get_volume_ratio(ts_code: str, current_minutes: int, compare_minutes: int) -> float:
     """
     成交量放大倍数（当前 N 分钟均量 vs 前 M 分钟均量）
     """
-    now = datetime.now()
-    current_start = now - timedelta(minutes=current_minutes)
-    compare_start = now - timedelta(minutes=current_minutes + compare_minutes)
+    current_time = now()
+    current_start = current_time - timedelta(minutes=current_minutes)
+    compare_start = current_time - timedelta(minutes=current_minutes + compare_minutes)
 
     # 当前时间段
-    df_current = pd.read_sql(
-        """
-        SELECT volume
-        FROM realtime_ticks
-        WHERE ts_code = %s AND timestamp >= %s
-        """,
-        con=engine,
-        params=(ts_code, current_start),
-    )
+    df_current = query_ticks(ts_code, current_start, columns=["volume"])
 
     # 比较时间段
-    df_compare = pd.read_sql(
-        """
-        SELECT volume
-        FROM realtime_ticks
-        WHERE ts_code = %s AND timestamp >= %s AND timestamp < %s
-        """,
-        con=engine,
-        params=(ts_code, compare_start, current_start),
-    )
+    df_compare = query_ticks(ts_code, compare_start, until=current_start, columns=["volume"])
 
     if df_current.empty or df_compare.empty:
         return 1.0  # 无数据视为未放量
@@ -195,19 +180,8 @@ def is_kline_up_trending(ts_code: str, minutes: int) -> bool:
     """
     即时 K 线趋势识别（判断是否上涨趋势）
     """
-    now = datetime.now()
-    start_time = now - timedelta(minutes=minutes)
-
-    df = pd.read_sql(
-        """
-        SELECT timestamp, price
-        FROM realtime_ticks
-        WHERE ts_code = %s AND timestamp >= %s
-        ORDER BY timestamp ASC
-        """,
-        con=engine,
-        params=(ts_code, start_time),
-    )
+    start_time = now() - timedelta(minutes=minutes)
+    df = query_ticks(ts_code, start_time)
 
     if df.empty or len(df) < 3:
         return False
@@ -224,20 +198,9 @@ def is_local_low_point(ts_code: str, minutes: int = 10) -> bool:
     判断当前价格是否处于局部低点
     通过比较最近N分钟的价格走势，判断当前是否处于回调后的低点
     """
-    now = datetime.now()
-    start_time = now - timedelta(minutes=minutes)
-    
-    df = pd.read_sql(
-        """
-        SELECT timestamp, price
-        FROM realtime_ticks
-        WHERE ts_code = %s AND timestamp >= %s
-        ORDER BY timestamp ASC
-        """,
-        con=engine,
-        params=(ts_code, start_time),
-    )
-    
+    start_time = now() - timedelta(minutes=minutes)
+    df = query_ticks(ts_code, start_time)
+
     if df.empty or len(df) < 10:  # 至少需要5个点来判断
         return False
         
@@ -263,7 +226,7 @@ def confirm_buy_with_realtime(ts_code: str, trade_date: str) -> bool:
     # 获取昨收价、今日实时行情
     yesterday_close = get_yesterday_close(ts_code, trade_date)
     try:
-        today_info = get_realtime_info(ts_code, trade_date)
+        today_info = get_quote(ts_code, trade_date)
     except Exception as e:
         logger.warning(f"⚠️{ts_code} 获取实时行情失败: {e}")
         return False
@@ -328,7 +291,7 @@ def confirm_buy_with_realtime(ts_code: str, trade_date: str) -> bool:
         # return False  # 可选放宽此限制
 
     # 条件8：平台突破价限制，避免追高
-    breakout_price = get_platform_breakout_price(ts_code, trade_date)
+    breakout_price = get_platform_breakout_price(ts_code, trade_date, pre_close=today_info.get("昨收"))
     if breakout_price and realtime_price > breakout_price * 1.08:
         logger.info(f"{ts_code} 当前价格 ({realtime_price:.2f}) 已远离平台突破价 ({breakout_price:.2f})，追高风险大，不买入")
         return False
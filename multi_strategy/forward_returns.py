@@ -0,0 +1,313 @@
+"""
+远期收益立方体
+
+每次分析“信号之后发生了什么”都要重新读行情、重新算未来 N 日涨幅。
+这里对每个 (交易日 t, 股票) 预先算好 1~20 个交易日的远期收益，float32 存成 (交易日 × 股票 × 期限) 的立方体：
+    close_to_close  t 日收盘到 t+h 日收盘
+    open_to_close   t+1 日开盘买入到 t+h 日收盘
+    max_high        t+1 ~ t+h 日最高价相对 t 日收盘的最大涨幅
+    entry_buyable   t+1 日能否开盘买入（有成交且非一字涨停），形状 (交易日 × 股票)
+收益按 backtest.price_matrices 的 growth（逐日 log(close/pre_close) 累加）计算，自动处理除权；
+t 日停牌的行为 NaN，持有期内停牌沿用停牌前的收盘；t+h 超出已入库交易日的格子为 NaN，等后续入库再补上。
+
+立方体存在 forward_cube/ 下，每个数组一个 .npy（按内存映射读取），meta.json 最后写。
+每天入库后 update_cube 只重算最后 20 个交易日（它们的远期窗口还不完整）和新的交易日，其余部分原样拷贝。
+事件研究就是按 (t, 股票) 下标从立方体里取出若干行再求均值，不再读行情。
+
+用法：
+    python forward_returns.py update --start 20220101
+    python forward_returns.py study --strategy strategy_limit_up_continuation_prediction --start 20230101 --end 20250630
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from backtest import load_prices, price_matrices
+from backtest_store import code_version, last_trade_date
+from limit_price import load_st_periods
+
+from utils.logger import logger
+
+CUBE_DIR = "forward_cube"
+HORIZONS = 20
+RETURN_KINDS = ["close_to_close", "open_to_close", "max_high"]
+CODE_MODULES = ["forward_returns", "backtest", "limit_price"]
+
+# 拷贝旧立方体时每次处理的交易日数，控制内存
+COPY_CHUNK = 250
+
+
+def compute_forward(matrices: dict, horizons: int = HORIZONS) -> Dict[str, np.ndarray]:
+    """
+    在 backtest.price_matrices 的矩阵上计算远期收益立方体
+
+    Returns:
+        dict：RETURN_KINDS 各一个 (交易日, 股票, horizons) 的 float32 数组，以及 entry_buyable
+    """
+    growth, has_bar = matrices["growth"], matrices["has_bar"]
+    n_dates, n_codes = growth.shape
+    cube = {kind: np.full((n_dates, n_codes, horizons), np.nan, dtype=np.float32) for kind in RETURN_KINDS}
+    entry_buyable = np.zeros((n_dates, n_codes), dtype=bool)
+    entry_buyable[:-1] = matrices["buyable"][1:]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        close_over_open = matrices["close"] / matrices["open"]
+        high_over_close = matrices["high"] / matrices["close"]
+        # t+1 ~ t+h 日最高价相对 t 日收盘的涨幅，逐个期限滚动取最大
+        running_high = np.full((n_dates, n_codes), np.nan)
+        for h in range(1, min(horizons, n_dates - 1) + 1):
+            n = n_dates - h
+            base = has_bar[:n]
+            cube["close_to_close"][:n, :, h - 1] = np.where(base, np.expm1(growth[h:] - growth[:n]), np.nan)
+
+            entry = base & has_bar[1 : n + 1]
+            open_to_close = np.exp(growth[h:] - growth[1 : n + 1]) * close_over_open[1 : n + 1] - 1
+            cube["open_to_close"][:n, :, h - 1] = np.where(entry, open_to_close, np.nan)
+
+            day_high = np.exp(growth[h:] - growth[:n]) * high_over_close[h:] - 1
+            running_high = np.fmax(running_high[:n], np.where(has_bar[h:], day_high, np.nan))
+            cube["max_high"][:n, :, h - 1] = np.where(base, running_high, np.nan)
+
+    cube["entry_buyable"] = entry_buyable
+    return cube
+
+
+# ---------------------------------------------------------------------------
+# 存储
+# ---------------------------------------------------------------------------
+
+
+def load_cube(cube_dir: str = CUBE_DIR, mmap: bool = True) -> Optional[dict]:
+    """读取立方体，数组默认以只读内存映射打开；不存在或损坏时返回 None"""
+    meta_path = os.path.join(cube_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            cube = {"meta": json.load(f)}
+        for name in ["dates", "codes", "entry_buyable"] + RETURN_KINDS:
+            cube[name] = np.load(os.path.join(cube_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        return cube
+    except Exception as e:
+        logger.warning(f"远期收益立方体损坏，忽略: {cube_dir}: {e}")
+        return None
+
+
+def _write_array(path: str, shape: tuple, dtype, fill, parts: list):
+    """
+    分块写一个 .npy：先填 fill，再把 parts 里的 (目标起始行, 目标列下标, 源数组) 依次放进去
+    """
+    tmp_path = path + ".tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+    out[:] = fill
+    for row, cols, source in parts:
+        for start in range(0, len(source), COPY_CHUNK):
+            block = np.asarray(source[start : start + COPY_CHUNK])
+            out[row + start : row + start + len(block), cols] = block
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+def _save_cube(cube_dir: str, dates: np.ndarray, codes: np.ndarray, parts: Dict[str, list], meta: dict):
+    os.makedirs(cube_dir, exist_ok=True)
+    # 先作废旧的 meta，写到一半失败时整份当作不存在
+    meta_path = os.path.join(cube_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    # 旧立方体以内存映射打开着，全部先写临时文件再替换，不覆盖正在读的文件
+    for name, values in (("dates", dates), ("codes", codes)):
+        with open(os.path.join(cube_dir, f"{name}.npy.tmp"), "wb") as f:
+            np.save(f, values)
+        os.replace(os.path.join(cube_dir, f"{name}.npy.tmp"), os.path.join(cube_dir, f"{name}.npy"))
+    shape = (len(dates), len(codes))
+    _write_array(os.path.join(cube_dir, "entry_buyable.npy"), shape, bool, False, parts["entry_buyable"])
+    for kind in RETURN_KINDS:
+        shape = (len(dates), len(codes), meta["horizons"])
+        _write_array(os.path.join(cube_dir, f"{kind}.npy"), shape, np.float32, np.nan, parts[kind])
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def update_cube(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cube_dir: str = CUBE_DIR,
+    horizons: int = HORIZONS,
+    rebuild: bool = False,
+) -> Optional[dict]:
+    """
+    构建或增量更新立方体到 end_date（默认今天）之前最后一个已入库的交易日
+
+    Args:
+        start_date: 首次构建的起始日期；已有立方体时忽略（rebuild 时沿用原起始日期，除非显式给出）
+        rebuild: 忽略已有立方体整份重建
+
+    Returns:
+        更新后的立方体（内存映射），立方体不存在又没给 start_date 时返回 None
+    """
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    version = code_version(CODE_MODULES)
+    cube = load_cube(cube_dir)
+    if cube is not None and not rebuild:
+        meta = cube["meta"]
+        if meta["code_version"] != version or meta["horizons"] != horizons:
+            logger.info("远期收益的计算代码或期限已变化，整份重建")
+            rebuild = True
+    if cube is not None and rebuild:
+        start_date = start_date or cube["meta"]["start_date"]
+        cube = None
+    if cube is None and start_date is None:
+        logger.warning(f"{cube_dir} 下还没有远期收益立方体，需要给出 start_date 首次构建")
+        return None
+
+    covered = last_trade_date(end_date)
+    if covered is None:
+        raise ValueError(f"{end_date} 之前没有已入库的交易日")
+    if cube is not None and cube["meta"]["last_date"] >= covered:
+        logger.info(f"远期收益立方体已覆盖到 {cube['meta']['last_date']}，无需更新")
+        return cube
+
+    started = time.perf_counter()
+    if cube is None:
+        keep = 0
+        window_start = start_date
+    else:
+        # 最后 horizons 个交易日的远期窗口不完整，连同新交易日一起重算
+        keep = max(len(cube["dates"]) - horizons, 0)
+        window_start = pd.Timestamp(cube["dates"][keep]).strftime("%Y%m%d")
+
+    panel = load_prices(None, window_start, covered)
+    if panel.empty:
+        raise ValueError(f"{window_start} ~ {covered} 没有行情数据")
+    matrices = price_matrices(panel, load_st_periods())
+    fresh = compute_forward(matrices, horizons)
+    fresh_dates = matrices["dates"].astype("datetime64[D]")
+    fresh_codes = matrices["codes"].astype(str)
+
+    if cube is None:
+        dates, codes = fresh_dates, fresh_codes
+        parts = {name: [(0, slice(None), fresh[name])] for name in ["entry_buyable"] + RETURN_KINDS}
+    else:
+        dates = np.concatenate([cube["dates"][:keep], fresh_dates])
+        codes = np.union1d(cube["codes"], fresh_codes).astype(str)
+        old_cols, fresh_cols = np.searchsorted(codes, cube["codes"]), np.searchsorted(codes, fresh_codes)
+        parts = {
+            name: [(0, old_cols, cube[name][:keep]), (keep, fresh_cols, fresh[name])]
+            for name in ["entry_buyable"] + RETURN_KINDS
+        }
+
+    meta = {
+        "start_date": start_date if cube is None else cube["meta"]["start_date"],
+        "last_date": covered,
+        "horizons": horizons,
+        "code_version": version,
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _save_cube(cube_dir, dates, codes, parts, meta)
+    logger.info(
+        f"✅ 远期收益立方体{'增量更新' if keep else '全量构建'}到 {covered}：{len(dates)} 个交易日 × {len(codes)} 只 × "
+        f"{horizons} 期，重算 {len(fresh_dates)} 个交易日，耗时 {time.perf_counter() - started:.2f}s"
+    )
+    return load_cube(cube_dir)
+
+
+# ---------------------------------------------------------------------------
+# 事件研究
+# ---------------------------------------------------------------------------
+
+
+def locate_events(cube: dict, events: pd.DataFrame, offset: int = 0) -> tuple:
+    """
+    事件（trade_date、ts_code）在立方体里的下标
+
+    Args:
+        offset: 事件日期往前（负）或往后挪的交易日数，例如 T-1 数据选股的策略传 -1，以数据日收盘为基准
+
+    Returns:
+        (t, j, valid)：valid 为日期、股票都在立方体中的事件
+    """
+    dates, codes = np.asarray(cube["dates"]), np.asarray(cube["codes"])
+    event_dates = pd.to_datetime(events["trade_date"]).to_numpy().astype(dates.dtype)
+    event_codes = events["ts_code"].to_numpy().astype(str)
+    t = np.searchsorted(dates, event_dates)
+    j = np.searchsorted(codes, event_codes)
+    t_ok, j_ok = np.minimum(t, len(dates) - 1), np.minimum(j, len(codes) - 1)
+    valid = (t < len(dates)) & (j < len(codes)) & (dates[t_ok] == event_dates) & (codes[j_ok] == event_codes)
+    t = t_ok + offset
+    valid &= (t >= 0) & (t < len(dates))
+    return np.clip(t, 0, len(dates) - 1), j_ok, valid
+
+
+def event_study(cube: dict, events: pd.DataFrame, offset: int = 0, filled_only: bool = False) -> pd.DataFrame:
+    """
+    事件之后 1~horizons 个交易日的平均表现
+
+    Args:
+        filled_only: 只统计 t+1 日能开盘买入的事件（剔除一字涨停、停牌）
+
+    Returns:
+        每个期限一行：事件数、各类收益的均值和中位数、收盘收益为正的比例
+    """
+    t, j, valid = locate_events(cube, events, offset)
+    if filled_only:
+        valid &= np.asarray(cube["entry_buyable"][t, j])
+    t, j = t[valid], j[valid]
+    order = np.argsort(t, kind="stable")  # 按交易日顺序读取，内存映射时更连续
+    t, j = t[order], j[order]
+
+    horizons = cube["meta"]["horizons"]
+    table = pd.DataFrame({"horizon": np.arange(1, horizons + 1)})
+    for kind in RETURN_KINDS:
+        values = np.asarray(cube[kind][t, j], dtype=np.float64).reshape(len(t), horizons)
+        if kind == "close_to_close":
+            table["events"] = (~np.isnan(values)).sum(axis=0)
+            with np.errstate(invalid="ignore"):
+                table["win_rate"] = (values > 0).sum(axis=0) / table["events"].where(table["events"] > 0)
+        with warnings.catch_warnings():
+            # 某个期限全部为 NaN（事件太靠近最后一个交易日）时均值为 NaN，不必告警
+            warnings.simplefilter("ignore", RuntimeWarning)
+            table[f"{kind}_mean"] = np.nanmean(values, axis=0)
+            table[f"{kind}_median"] = np.nanmedian(values, axis=0)
+    return table.round(5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="远期收益立方体")
+    parser.add_argument("command", choices=["update", "study"])
+    parser.add_argument("--start", default=None, help="update：首次构建的起始日期；study：信号起始日期 YYYYMMDD")
+    parser.add_argument("--end", default=None, help="截止日期 YYYYMMDD，默认今天")
+    parser.add_argument("--strategy", default=None, help="study：要研究的策略")
+    parser.add_argument("--filled-only", action="store_true", help="study：只统计次日能买入的信号")
+    parser.add_argument("--cube-dir", default=CUBE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="update：整份重建")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        update_cube(args.start, args.end, args.cube_dir, rebuild=args.rebuild)
+    else:
+        from batch_screen import BATCH_EVALUATORS
+        from signal_cache import get_signals, to_frame
+
+        if not (args.strategy and args.start):
+            parser.error("study 需要 --strategy 和 --start")
+        cube = load_cube(args.cube_dir)
+        if cube is None:
+            parser.error(f"{args.cube_dir} 下没有远期收益立方体，先运行 update")
+        end = args.end or datetime.now().strftime("%Y%m%d")
+        events = to_frame(get_signals(args.strategy, args.start, end))
+        started = time.perf_counter()
+        # 选股日转成数据日：T-1 数据选股的策略往前挪一个交易日
+        table = event_study(cube, events, -BATCH_EVALUATORS[args.strategy]["lag"], args.filled_only)
+        logger.info(f"✅ {len(events)} 个信号的事件研究耗时 {time.perf_counter() - started:.3f}s")
+        print(table.to_string(index=False))
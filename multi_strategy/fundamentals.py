@@ -0,0 +1,209 @@
+"""
+基本面快照与按策略的基本面过滤
+
+原来的 filter_by_fundamentals 每次调用都要对整张 stock_fundamental 做 MAX(trade_date) GROUP BY 自连接，
+所以 main 里有一批策略干脆跳过基本面过滤。这里改为：
+    • 整表读一次，按 (ts_code, trade_date) 排好放在内存里，同时落盘到 cache/fundamentals.pkl
+    • 用 COUNT(*) 和 MAX(trade_date) 作为指纹，只有新财报入库后才重新读取
+    • 按日期取“当时已知的最新一期”（point-in-time）：最新日期直接查按 ts_code 索引的表，
+      其他日期用 merge_asof，多日批量结果也能逐行对齐
+README 中每个策略的 ROE、毛利率、增速等门槛写在 FUNDAMENTAL_RULES 里，
+apply_fundamental_rules 对所有策略的命中结果做一次向量化连接和比较。
+"""
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from clients import get_engine
+
+from utils.logger import logger
+
+CACHE_FILE = "cache/fundamentals.pkl"
+
+FUNDAMENTAL_COLUMNS = [
+    "roe", "eps", "profit_yoy", "revenue_yoy", "gross_margin", "total_liabilities", "total_assets",
+    "operating_cash_flow", "total_revenue", "total_profit", "net_profit", "investing_cash_flow", "financing_cash_flow",
+]  # fmt: skip
+
+# 各策略的基本面门槛（README），每条为 (字段, 比较方式, 阈值)，全部满足才保留；未列出的策略不做基本面过滤
+FUNDAMENTAL_RULES = {
+    "strategy_check_breakout_batch": [
+        ("roe", ">", 15), ("gross_margin", ">", 25), ("revenue_yoy", ">", 20), ("profit_yoy", ">", 30),
+        ("operating_cash_flow", ">", 0),
+    ],
+    "strategy_top_gainers": [
+        ("roe", ">", 12), ("gross_margin", ">", 20), ("revenue_yoy", ">", 15), ("profit_yoy", ">", 20),
+        ("debt_ratio", "<", 60),
+    ],
+    "strategy_plate_breakout_post_close": [
+        ("roe", ">", 10), ("gross_margin", ">", 15), ("revenue_yoy", ">", 10), ("profit_yoy", ">", 15),
+        ("operating_cash_flow", ">", 0),
+    ],
+    "strategy_macd_golden_cross": [
+        ("roe", ">", 8), ("gross_margin", ">", 15), ("revenue_yoy", ">", 5), ("profit_yoy", ">", 10),
+        ("operating_cash_flow", ">", 0),
+    ],
+    "strategy_first_limit_up_low_position": [
+        ("roe", ">", 10), ("gross_margin", ">", 20), ("revenue_yoy", ">", 0), ("profit_yoy", ">", 0),
+        ("debt_ratio", "<", 70),
+    ],
+    "strategy_consolidation_breakout_preparation": [
+        ("roe", ">", 12), ("gross_margin", ">", 20), ("revenue_yoy", ">", 15), ("profit_yoy", ">", 20),
+        ("operating_cash_flow", ">", 0),
+    ],
+    "strategy_box_bottom_rebound": [
+        ("roe", ">", 8), ("gross_margin", ">", 15), ("revenue_yoy", ">", 5), ("profit_yoy", ">", 10),
+        ("debt_ratio", "<", 60),
+    ],
+    "strategy_ma_convergence_start": [
+        ("roe", ">", 10), ("gross_margin", ">", 18), ("revenue_yoy", ">", 8), ("profit_yoy", ">", 15),
+        ("operating_cash_flow", ">", 0),
+    ],
+    "strategy_macd_divergent_gold_cross": [
+        ("roe", ">", 9), ("gross_margin", ">", 16), ("revenue_yoy", ">", 6), ("profit_yoy", ">", 12),
+        ("debt_ratio", "<", 65),
+    ],
+    "strategy_annual_line_breakout": [
+        ("roe", ">", 12), ("gross_margin", ">", 22), ("revenue_yoy", ">", 15), ("profit_yoy", ">", 20),
+        ("operating_cash_flow", ">", 0),
+    ],
+}  # fmt: skip
+
+_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+# 进程内缓存：(指纹, 全部历史按 trade_date 排序, 最新一期按 ts_code 索引)
+_memory: Optional[Tuple[str, pd.DataFrame, pd.DataFrame]] = None
+
+
+def fundamentals_fingerprint() -> str:
+    """stock_fundamental 的版本号，新财报入库后变化"""
+    sql = "SELECT COUNT(*) AS row_count, MAX(trade_date) AS last_date FROM stock_fundamental"
+    result = pd.read_sql(sql, get_engine())
+    return "|".join(str(v) for v in result.iloc[0].tolist())
+
+
+def load_fundamentals_table() -> pd.DataFrame:
+    """整表读取 stock_fundamental，并计算负债率（%）"""
+    sql = f"SELECT ts_code, trade_date, {', '.join(FUNDAMENTAL_COLUMNS)} FROM stock_fundamental"
+    df = pd.read_sql(sql, get_engine())
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["debt_ratio"] = df["total_liabilities"] / df["total_assets"] * 100
+    return df.sort_values(["trade_date", "ts_code"], kind="stable").reset_index(drop=True)
+
+
+def _build(history: pd.DataFrame, fingerprint: str) -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+    latest = history.sort_values(["ts_code", "trade_date"], kind="stable").groupby("ts_code").tail(1)
+    return fingerprint, history, latest.set_index("ts_code")
+
+
+def get_fundamentals(cache_file: str = CACHE_FILE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    返回 (全部历史, 最新一期)，指纹未变时直接用内存或磁盘缓存
+
+    Returns:
+        history: 按 trade_date 排序的全部财报记录
+        latest: 每只股票最新一期，按 ts_code 索引
+    """
+    global _memory
+    fingerprint = fundamentals_fingerprint()
+    if _memory is not None and _memory[0] == fingerprint:
+        return _memory[1], _memory[2]
+
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                cached_fingerprint, history = pickle.load(f)
+            if cached_fingerprint == fingerprint:
+                _memory = _build(history, fingerprint)
+                return _memory[1], _memory[2]
+        except Exception as e:
+            logger.warning(f"基本面缓存读取失败，重新构建: {e}")
+
+    history = load_fundamentals_table()
+    logger.info(f"基本面快照已重建: {len(history)} 条财报记录（{fingerprint}）")
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump((fingerprint, history), f, protocol=pickle.HIGHEST_PROTOCOL)
+    _memory = _build(history, fingerprint)
+    return _memory[1], _memory[2]
+
+
+def attach_fundamentals(df: pd.DataFrame, as_of=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    给 df 的每一行接上当时已知的最新一期财报
+
+    Args:
+        df: 至少含 ts_code；as_of 为 None 且 df 含 trade_date 时按每行的 trade_date 对齐
+        as_of: 统一的截止日期；为 None 且 df 没有 trade_date 时取最新一期
+        columns: 需要的字段，默认全部（含 debt_ratio）
+    """
+    history, latest = get_fundamentals()
+    columns = columns or FUNDAMENTAL_COLUMNS + ["debt_ratio"]
+
+    if as_of is None and "trade_date" not in df.columns:
+        return df.join(latest[columns], on="ts_code")
+
+    rows = pd.DataFrame({"row": np.arange(len(df)), "ts_code": df["ts_code"].to_numpy()})
+    if as_of is None:
+        rows["as_of"] = pd.to_datetime(df["trade_date"]).to_numpy()
+    else:
+        rows["as_of"] = pd.to_datetime(str(as_of))
+    # merge_asof 要求两边日期单位一致，统一成纳秒
+    rows["as_of"] = rows["as_of"].astype("datetime64[ns]")
+    reports = history[["ts_code", "trade_date"] + columns]
+    reports = reports.assign(trade_date=reports["trade_date"].astype("datetime64[ns]"))
+    merged = pd.merge_asof(
+        rows.sort_values("as_of"),
+        reports,
+        left_on="as_of",
+        right_on="trade_date",
+        by="ts_code",
+        direction="backward",
+    ).sort_values("row")
+
+    result = df.copy()
+    for col in columns:
+        result[col] = merged[col].to_numpy()
+    return result
+
+
+def fundamental_mask(df: pd.DataFrame, rules: List[Tuple[str, str, float]]) -> np.ndarray:
+    """df 已带基本面字段时，判断每行是否满足全部门槛；缺失数据视为不满足"""
+    mask = np.ones(len(df), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for column, op, threshold in rules:
+            mask &= _OPS[op](df[column].to_numpy(dtype=np.float64), threshold)
+    return mask
+
+
+def apply_fundamental_rules(
+    df: pd.DataFrame, as_of=None, rules: Dict[str, List[Tuple[str, str, float]]] = FUNDAMENTAL_RULES
+) -> pd.DataFrame:
+    """
+    按每行的 strategy 列应用对应策略的基本面门槛，没有门槛的策略原样保留
+
+    Args:
+        df: 策略命中结果，含 ts_code、strategy
+        as_of: 财报截止日期（通常是 trade_date），为 None 时按行的 trade_date 或最新一期
+    """
+    need = df["strategy"].isin(list(rules)).to_numpy()
+    if not need.any():
+        return df
+
+    attached = attach_fundamentals(df[need], as_of=as_of)
+    keep = np.ones(len(df), dtype=bool)
+    keep_need = np.zeros(need.sum(), dtype=bool)
+    strategies = attached["strategy"].to_numpy()
+    for name, strategy_rules in rules.items():
+        rows = strategies == name
+        if rows.any():
+            keep_need[rows] = fundamental_mask(attached[rows], strategy_rules)
+    keep[need] = keep_need
+
+    dropped = len(df) - int(keep.sum())
+    if dropped:
+        logger.info(f"基本面过滤剔除 {dropped} 条命中")
+    return df[keep]
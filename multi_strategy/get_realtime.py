@@ -3,7 +3,7 @@ import re
 import time
 from datetime import datetime
 
-import requests
+from clients import get_http_session
 
 
 def get_secid(code):
@@ -44,7 +44,7 @@ def get_realtime_info(code, trade_date):
         "host": "push2his.eastmoney.com",
     }
 
-    response = requests.get(url, params=params, headers=headers)
+    response = get_http_session().get(url, params=params, headers=headers)
     match = re.search(r"jQuery\d+_\d+\((.*)\);?", response.text)
     if not match:
         raise ValueError("无法解析 JSONP 响应")
@@ -4,8 +4,7 @@ from datetime import datetime, timedelta
 from typing import List
 
 import pandas as pd
-from config import MYSQL_URL
-from sqlalchemy import create_engine
+from clients import get_engine
 
 # 修复导入路径问题
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,8 +18,6 @@ except ImportError:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     logger = logging.getLogger(__name__)
 
-engine = create_engine(MYSQL_URL)
-
 
 def get_previous_trading_date(trade_date: str):
     """
@@ -42,7 +39,7 @@ def get_previous_trading_date(trade_date: str):
         """
 
         try:
-            result = pd.read_sql(sql, engine, params={"check_date": check_date_str})
+            result = pd.read_sql(sql, get_engine(), params={"check_date": check_date_str})
             if result.iloc[0]["count"] > 0:
                 logger.info(f"找到最近交易日: {check_date_str}")
                 return check_date_str
@@ -75,6 +72,44 @@ def add_exchange_suffix(stock_codes: List[str]) -> List[str]:
     return result
 
 
+def calc_holding_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    计算单只股票的技术指标（df 为该股按 trade_date 升序的日线）
+    """
+    df["pct_chg"] = (df["close"] - df["pre_close"]) / df["pre_close"] * 100
+    df["ma5"] = df["close"].rolling(5).mean()
+    df["ma10"] = df["close"].rolling(10).mean()
+    df["ma20"] = df["close"].rolling(20).mean()
+    df["ma30"] = df["close"].rolling(30).mean()
+    df["avg_vol_5"] = df["vol"].rolling(5).mean()
+    df["avg_vol_10"] = df["vol"].rolling(10).mean()
+    df["vol_ratio"] = df["vol"] / df["avg_vol_5"]
+
+    # 计算MACD指标
+    df["ema12"] = df["close"].ewm(span=12).mean()
+    df["ema26"] = df["close"].ewm(span=26).mean()
+    df["diff"] = df["ema12"] - df["ema26"]
+    df["dea"] = df["diff"].ewm(span=9).mean()
+    df["macd"] = 2 * (df["diff"] - df["dea"])
+
+    # 计算KDJ指标
+    df["low_9"] = df["low"].rolling(9).min()
+    df["high_9"] = df["high"].rolling(9).max()
+    df["rsv"] = (df["close"] - df["low_9"]) / (df["high_9"] - df["low_9"]) * 100
+    df["k"] = df["rsv"].ewm(com=2).mean()
+    df["d"] = df["k"].ewm(com=2).mean()
+    df["j"] = 3 * df["k"] - 2 * df["d"]
+
+    # 计算RSI指标
+    delta = df["close"].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df["rsi"] = 100 - (100 / (1 + rs))
+
+    return df
+
+
 def analyze_holding_stocks(trade_date: str, holding_stocks: List[str]):
     """
     持仓股票T日涨势分析策略
@@ -119,7 +154,7 @@ def analyze_holding_stocks(trade_date: str, holding_stocks: List[str]):
         WHERE ts_code = %(ts_code)s
         """
         try:
-            result = pd.read_sql(check_sql, engine, params={"ts_code": ts_code})
+            result = pd.read_sql(check_sql, get_engine(), params={"ts_code": ts_code})
             count = result.iloc[0]["count"]
             min_date = result.iloc[0]["min_date"]
             max_date = result.iloc[0]["max_date"]
@@ -134,7 +169,9 @@ def analyze_holding_stocks(trade_date: str, holding_stocks: List[str]):
     WHERE trade_date >= %(start_date)s AND trade_date <= %(yesterday)s
     """
     try:
-        date_result = pd.read_sql(check_date_sql, engine, params={"start_date": start_date, "yesterday": yesterday})
+        date_result = pd.read_sql(
+            check_date_sql, get_engine(), params={"start_date": start_date, "yesterday": yesterday}
+        )
         total_records = date_result.iloc[0]["count"]
         print(f"\n✅ 日期范围 {start_date} 至 {yesterday} 的总记录数: {total_records}")
     except Exception as e:
@@ -158,7 +195,7 @@ def analyze_holding_stocks(trade_date: str, holding_stocks: List[str]):
     print(f"参数: {params}")
 
     try:
-        df_all = pd.read_sql(sql, engine, params=params)
+        df_all = pd.read_sql(sql, get_engine(), params=params)
         print(f"查询结果: {len(df_all)}条记录")
     except Exception as e:
         logger.error(f"数据库查询失败: {e}")
@@ -183,36 +220,7 @@ def analyze_holding_stocks(trade_date: str, holding_stocks: List[str]):
         print(f"📊 分析股票: {ts_code}")
 
         # 计算技术指标
-        df["pct_chg"] = (df["close"] - df["pre_close"]) / df["pre_close"] * 100
-        df["ma5"] = df["close"].rolling(5).mean()
-        df["ma10"] = df["close"].rolling(10).mean()
-        df["ma20"] = df["close"].rolling(20).mean()
-        df["ma30"] = df["close"].rolling(30).mean()
-        df["avg_vol_5"] = df["vol"].rolling(5).mean()
-        df["avg_vol_10"] = df["vol"].rolling(10).mean()
-        df["vol_ratio"] = df["vol"] / df["avg_vol_5"]
-
-        # 计算MACD指标
-        df["ema12"] = df["close"].ewm(span=12).mean()
-        df["ema26"] = df["close"].ewm(span=26).mean()
-        df["diff"] = df["ema12"] - df["ema26"]
-        df["dea"] = df["diff"].ewm(span=9).mean()
-        df["macd"] = 2 * (df["diff"] - df["dea"])
-
-        # 计算KDJ指标
-        df["low_9"] = df["low"].rolling(9).min()
-        df["high_9"] = df["high"].rolling(9).max()
-        df["rsv"] = (df["close"] - df["low_9"]) / (df["high_9"] - df["low_9"]) * 100
-        df["k"] = df["rsv"].ewm(com=2).mean()
-        df["d"] = df["k"].ewm(com=2).mean()
-        df["j"] = 3 * df["k"] - 2 * df["d"]
-
-        # 计算RSI指标
-        delta = df["close"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df["rsi"] = 100 - (100 / (1 + rs))
+        df = calc_holding_indicators(df)
 
         # T-1日（昨天）是最后一天数据
         current_idx = len(df) - 1
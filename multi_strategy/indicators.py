@@ -0,0 +1,82 @@
+"""
+全市场向量化技术指标
+
+输入为按 ts_code、trade_date 升序排列的日线长表，所有指标对每只股票独立计算，
+结果与 holding_analysis.analyze_holding_stocks 中逐股 groupby 的写法一致。
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from kernels import GroupLayout, ewm_mean
+
+
+def _rolling(padded: np.ndarray, window: int, how: str) -> np.ndarray:
+    """对（交易日序号 × 股票）矩阵按列做滚动统计"""
+    rolling = pd.DataFrame(padded).rolling(window)
+    return getattr(rolling, how)().to_numpy()
+
+
+def _shift(padded: np.ndarray, periods: int = 1) -> np.ndarray:
+    """periods > 0 取前 periods 天的值，< 0 取后 -periods 天的值"""
+    out = np.full_like(padded, np.nan)
+    if 0 < periods < len(padded):
+        out[periods:] = padded[:-periods]
+    elif 0 < -periods < len(padded):
+        out[:periods] = padded[-periods:]
+    return out
+
+
+def add_indicators(df: pd.DataFrame, layout: Optional[GroupLayout] = None) -> pd.DataFrame:
+    """
+    一次性为全市场计算常用指标，直接写回 df 并返回
+
+    新增列：pct_chg、ma5/10/20/30、avg_vol_5/10、vol_ratio、
+            ema12/26、diff、dea、macd、low_9、high_9、rsv、k、d、j、rsi
+    """
+    layout = layout or GroupLayout(df["ts_code"].to_numpy())
+    close = layout.to_padded(df["close"])
+    vol = layout.to_padded(df["vol"])
+    high = layout.to_padded(df["high"])
+    low = layout.to_padded(df["low"])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["pct_chg"] = (df["close"] - df["pre_close"]) / df["pre_close"] * 100
+        for n in (5, 10, 20, 30):
+            df[f"ma{n}"] = layout.to_long(_rolling(close, n, "mean"))
+        avg_vol_5 = _rolling(vol, 5, "mean")
+        df["avg_vol_5"] = layout.to_long(avg_vol_5)
+        df["avg_vol_10"] = layout.to_long(_rolling(vol, 10, "mean"))
+        df["vol_ratio"] = layout.to_long(vol / avg_vol_5)
+
+        # MACD
+        ema12 = ewm_mean(close, span=12)
+        ema26 = ewm_mean(close, span=26)
+        diff = ema12 - ema26
+        dea = ewm_mean(diff, span=9)
+        df["ema12"] = layout.to_long(ema12)
+        df["ema26"] = layout.to_long(ema26)
+        df["diff"] = layout.to_long(diff)
+        df["dea"] = layout.to_long(dea)
+        df["macd"] = 2 * (df["diff"] - df["dea"])
+
+        # KDJ
+        low_9 = _rolling(low, 9, "min")
+        high_9 = _rolling(high, 9, "max")
+        rsv = (close - low_9) / (high_9 - low_9) * 100
+        k = ewm_mean(rsv, com=2)
+        d = ewm_mean(k, com=2)
+        df["low_9"] = layout.to_long(low_9)
+        df["high_9"] = layout.to_long(high_9)
+        df["rsv"] = layout.to_long(rsv)
+        df["k"] = layout.to_long(k)
+        df["d"] = layout.to_long(d)
+        df["j"] = 3 * df["k"] - 2 * df["d"]
+
+        # RSI
+        delta = close - _shift(close)
+        gain = _rolling(np.where(delta > 0, delta, 0.0), 14, "mean")
+        loss = _rolling(np.where(delta < 0, -delta, 0.0), 14, "mean")
+        df["rsi"] = layout.to_long(100 - (100 / (1 + gain / loss)))
+
+    return df
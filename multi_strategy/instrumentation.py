@@ -0,0 +1,124 @@
+"""
+策略运行埋点
+
+每次执行一个策略生成一条结构化记录，追加到 utils/logs/strategy_runs.jsonl：
+    {"time", "strategy", "trade_date", "rows_loaded", "load_seconds", "compute_seconds", "total_seconds",
+     "max_rss_mb", "peak_memory_mb", "funnel": {阶段: 剩余数量, ...}, "hits", "cache_hit", "error"}
+    • rows_loaded / load_seconds：data_source.query_* 读取行情的行数与耗时（快照和 MySQL 都算）
+    • compute_seconds：总耗时减去读取耗时
+    • max_rss_mb：运行结束时进程的常驻内存峰值（进程级高水位，开销可忽略）
+    • peak_memory_mb：运行期间 Python 分配的峰值，由 tracemalloc 统计，会让 pandas 计算慢数倍，
+      默认关闭，设置 STOCK_TRACK_MEMORY=1 开启
+    • funnel：策略内部各筛选阶段后还剩多少只股票，按记录顺序排列
+
+策略内部只需要调用 record_funnel(阶段, 数量)；不在 track_strategy 内调用时什么也不做。
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from utils.logger import logger
+
+RUN_LOG_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "logs", "strategy_runs.jsonl"
+)
+TRACK_MEMORY = os.environ.get("STOCK_TRACK_MEMORY") == "1"
+
+# 当前正在记录的运行（同一进程内策略串行执行，并行时每个子进程各有一份）
+_current = None
+
+
+def current_run() -> Optional[dict]:
+    return _current
+
+
+def record_load(rows: int, seconds: float):
+    """data_source 每次读取行情后调用"""
+    if _current is not None:
+        _current["rows_loaded"] += int(rows)
+        _current["load_seconds"] += seconds
+
+
+def record_funnel(stage: str, count: int):
+    """记录某个筛选阶段后剩余的股票数量"""
+    if _current is not None:
+        _current["funnel"][stage] = int(count)
+
+
+@contextmanager
+def track_strategy(strategy_name: str, trade_date: str, path: Optional[str] = RUN_LOG_FILE):
+    """
+    记录一次策略执行，with 块内可以往 record 里补充 hits、cache_hit 等字段
+
+    Args:
+        path: 结束后追加写入的 JSONL 文件，None 表示不写（例如在子进程里，由父进程统一写）
+    """
+    global _current
+    record = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "strategy": strategy_name,
+        "trade_date": trade_date,
+        "rows_loaded": 0,
+        "load_seconds": 0.0,
+        "compute_seconds": None,
+        "total_seconds": None,
+        "max_rss_mb": None,
+        "peak_memory_mb": None,
+        "funnel": {},
+        "hits": None,
+        "cache_hit": False,
+        "error": None,
+    }
+    previous = _current
+    _current = record
+
+    started_tracing = TRACK_MEMORY and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif TRACK_MEMORY:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = str(e)
+        raise
+    finally:
+        total = time.perf_counter() - start
+        if TRACK_MEMORY:
+            record["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            if started_tracing:
+                tracemalloc.stop()
+        if resource is not None:
+            # Linux 上 ru_maxrss 单位为 KB
+            record["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        record["total_seconds"] = round(total, 3)
+        record["load_seconds"] = round(record["load_seconds"], 3)
+        record["compute_seconds"] = round(max(total - record["load_seconds"], 0.0), 3)
+        _current = previous
+        if path:
+            save_run(record, path)
+
+
+def save_run(record: dict, path: str = RUN_LOG_FILE):
+    """追加一条运行记录，并打印一行摘要"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    if record.get("error"):
+        logger.info(f"📊 【{record['strategy']}】运行失败: {record['error']}")
+        return
+    logger.info(
+        f"📊 【{record['strategy']}】读取 {record['rows_loaded']} 行 {record['load_seconds']}s，"
+        f"计算 {record['compute_seconds']}s，内存高水位 {record['max_rss_mb']}MB，"
+        f"漏斗 {record['funnel']}，命中 {record['hits']}{'（缓存）' if record['cache_hit'] else ''}"
+    )
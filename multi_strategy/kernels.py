@@ -0,0 +1,186 @@
+"""
+递推类指标（EWM）的计算内核
+
+全市场日线按 ts_code、trade_date 排好序后，先用 GroupLayout 展开成
+（该股第k个交易日 × 股票）的二维矩阵，再按列做递推，最后映射回长表。
+停牌日在长表中本来就没有行，所以每一列与逐股 groupby 的序列完全一致。
+
+安装了 numba 时使用编译循环，否则退回 NumPy（按时间循环、按股票向量化）。
+numba 本身导入就要半秒左右，所以只在第一次走编译路径时才导入和编译，导入本模块不受影响。
+两条路径与 pandas 的 Series.ewm(...).mean()（ignore_na=False）逐位一致，包括 adjust=True。
+设置环境变量 STOCK_DISABLE_NUMBA=1 可强制使用 NumPy 路径。
+"""
+import importlib.util
+import os
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+HAS_NUMBA = importlib.util.find_spec("numba") is not None
+
+USE_NUMBA = HAS_NUMBA and os.environ.get("STOCK_DISABLE_NUMBA") != "1"
+
+
+class GroupLayout:
+    """
+    长表（按 ts_code、trade_date 排序）与二维矩阵之间的映射
+    矩阵第 k 行、第 g 列 = 第 g 只股票自身的第 k 个交易日，不足部分填 NaN
+    """
+
+    def __init__(self, ts_codes):
+        codes = np.asarray(ts_codes)
+        n = len(codes)
+        is_new = np.ones(n, dtype=bool)
+        if n > 1:
+            is_new[1:] = codes[1:] != codes[:-1]
+        starts = np.flatnonzero(is_new)
+
+        self.group_ids = np.cumsum(is_new) - 1
+        self.positions = np.arange(n) - starts[self.group_ids] if n else np.zeros(0, dtype=np.int64)
+        self.codes = codes[starts]
+        self.lengths = np.diff(np.append(starts, n))
+        self.shape = (int(self.lengths.max()) if n else 0, len(starts))
+
+    def to_padded(self, values, fill=np.nan) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(self.shape, fill, dtype=np.float64)
+        out[self.positions, self.group_ids] = values
+        return out
+
+    def to_long(self, padded) -> np.ndarray:
+        return padded[self.positions, self.group_ids]
+
+
+def resolve_alpha(
+    com: Optional[float] = None,
+    span: Optional[float] = None,
+    halflife: Optional[float] = None,
+    alpha: Optional[float] = None,
+) -> float:
+    """按 pandas 的参数约定换算平滑系数 alpha"""
+    given = [x is not None for x in (com, span, halflife, alpha)]
+    if sum(given) != 1:
+        raise ValueError("com、span、halflife、alpha 必须且只能指定一个")
+    if com is not None:
+        return 1.0 / (1.0 + com)
+    if span is not None:
+        return 2.0 / (span + 1.0)
+    if halflife is not None:
+        return 1.0 - np.exp(np.log(0.5) / halflife)
+    return float(alpha)
+
+
+def _ewm_mean_numpy(values: np.ndarray, alpha: float, adjust: bool, minp: int) -> np.ndarray:
+    """按时间循环、按列向量化，逐步复刻 pandas 的 ewm 递推"""
+    n_rows, n_cols = values.shape
+    out = np.full((n_rows, n_cols), np.nan)
+    if n_rows == 0:
+        return out
+
+    old_wt_factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+
+    weighted = values[0].copy()
+    nobs = (weighted == weighted).astype(np.int64)
+    old_wt = np.ones(n_cols)
+    out[0] = np.where(nobs >= minp, weighted, np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i in range(1, n_rows):
+            cur = values[i]
+            is_observation = cur == cur
+            nobs += is_observation
+            has_value = weighted == weighted
+
+            old_wt = np.where(has_value, old_wt * old_wt_factor, old_wt)
+            update = has_value & is_observation
+            changed = update & (weighted != cur)
+            weighted = np.where(changed, (old_wt * weighted + new_wt * cur) / (old_wt + new_wt), weighted)
+            if adjust:
+                old_wt = np.where(update, old_wt + new_wt, old_wt)
+            else:
+                old_wt = np.where(update, 1.0, old_wt)
+            weighted = np.where(~has_value & is_observation, cur, weighted)
+
+            out[i] = np.where(nobs >= minp, weighted, np.nan)
+    return out
+
+
+def _ewm_mean_loop(values, alpha, adjust, minp):
+    n_rows, n_cols = values.shape
+    out = np.full((n_rows, n_cols), np.nan)
+    old_wt_factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+
+    for j in range(n_cols):
+        if n_rows == 0:
+            break
+        weighted = values[0, j]
+        nobs = 1 if weighted == weighted else 0
+        old_wt = 1.0
+        out[0, j] = weighted if nobs >= minp else np.nan
+        for i in range(1, n_rows):
+            cur = values[i, j]
+            is_observation = cur == cur
+            if is_observation:
+                nobs += 1
+            if weighted == weighted:
+                old_wt *= old_wt_factor
+                if is_observation:
+                    if weighted != cur:
+                        weighted = old_wt * weighted + new_wt * cur
+                        weighted /= old_wt + new_wt
+                    if adjust:
+                        old_wt += new_wt
+                    else:
+                        old_wt = 1.0
+            elif is_observation:
+                weighted = cur
+            out[i, j] = weighted if nobs >= minp else np.nan
+    return out
+
+
+@lru_cache(maxsize=None)
+def _ewm_mean_numba():
+    """第一次使用时才导入 numba 并编译逐列递推（cache=True 时编译结果落盘，之后的进程直接加载）"""
+    import numba
+
+    return numba.njit(cache=True)(_ewm_mean_loop)
+
+
+def ewm_mean(
+    values,
+    com: Optional[float] = None,
+    span: Optional[float] = None,
+    halflife: Optional[float] = None,
+    alpha: Optional[float] = None,
+    adjust: bool = True,
+    min_periods: int = 0,
+) -> np.ndarray:
+    """
+    对二维矩阵按列计算指数加权均值，语义同 pd.DataFrame.ewm(...).mean()
+
+    Args:
+        values: 形状为（时间 × 股票）的矩阵，或一维序列
+        com/span/halflife/alpha: 平滑参数，四选一
+        adjust: 同 pandas，默认 True
+        min_periods: 同 pandas
+    """
+    alpha = resolve_alpha(com, span, halflife, alpha)
+    values = np.asarray(values, dtype=np.float64)
+    one_dim = values.ndim == 1
+    if one_dim:
+        values = values[:, None]
+    minp = max(int(min_periods), 1)
+
+    if USE_NUMBA:
+        out = _ewm_mean_numba()(np.ascontiguousarray(values), alpha, adjust, minp)
+    else:
+        out = _ewm_mean_numpy(values, alpha, adjust, minp)
+    return out[:, 0] if one_dim else out
+
+
+def grouped_ewm_mean(values, layout: GroupLayout, **kwargs) -> np.ndarray:
+    """长表版本：按 layout 分组（每只股票独立递推），返回与 values 等长的结果"""
+    return layout.to_long(ewm_mean(layout.to_padded(values), **kwargs))
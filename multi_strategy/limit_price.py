@@ -0,0 +1,154 @@
+"""
+涨跌停价格与连板计算（全市场向量化）
+
+涨跌幅限制：
+    • 主板（60x、000/001/002/003）：10%，ST 5%
+    • 创业板（300/301）：2020-08-24 注册制改革后 20%（含ST），之前 10%，ST 5%
+    • 科创板（688/689）：20%（含ST）
+    • 北交所（4xx、8xx、920）：30%
+涨停价 = 昨收 × (1 + 涨跌幅限制)，四舍五入到分；跌停价同理
+新股上市初期不设涨跌幅的交易日不在此处处理
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from clients import get_engine
+
+from utils.logger import logger
+
+BOARD_MAIN = "main"
+BOARD_CHINEXT = "chinext"
+BOARD_STAR = "star"
+BOARD_BSE = "bse"
+
+# 各板块的代码前缀，其余为主板
+BOARD_PREFIXES = {
+    BOARD_CHINEXT: ("300", "301"),
+    BOARD_STAR: ("688", "689"),
+    BOARD_BSE: ("4", "8", "920"),
+}
+
+CHINEXT_REFORM_DATE = pd.Timestamp("2020-08-24")
+
+# 判断收盘是否封板时允许的价格误差（元）
+PRICE_EPS = 0.005
+
+
+def classify_board(ts_codes) -> np.ndarray:
+    """根据代码前缀判断所属板块"""
+    codes = pd.Series(ts_codes, dtype="object").astype(str).str[:6]
+    return np.select(
+        [codes.str.startswith(prefixes) for prefixes in BOARD_PREFIXES.values()],
+        list(BOARD_PREFIXES),
+        default=BOARD_MAIN,
+    )
+
+
+def limit_pct(boards, is_st, trade_dates) -> np.ndarray:
+    """
+    计算每行的涨跌幅限制（小数，如 0.1）
+
+    Args:
+        boards: classify_board 的结果
+        is_st: 是否ST
+        trade_dates: 交易日，用于区分创业板改革前后
+    """
+    boards = np.asarray(boards)
+    is_st = np.asarray(is_st, dtype=bool)
+    after_reform = pd.to_datetime(pd.Series(trade_dates)).to_numpy() >= CHINEXT_REFORM_DATE.to_datetime64()
+    return np.select(
+        [
+            boards == BOARD_BSE,
+            boards == BOARD_STAR,
+            (boards == BOARD_CHINEXT) & after_reform,
+            is_st,
+        ],
+        [0.30, 0.20, 0.20, 0.05],
+        default=0.10,
+    )
+
+
+def round_price(values) -> np.ndarray:
+    """按交易所规则四舍五入到分（加微小偏移避免 x.xx5 的浮点误差）"""
+    return np.floor(np.asarray(values, dtype=np.float64) * 100 + 0.5 + 1e-6) / 100
+
+
+def limit_prices(pre_close, pct):
+    """返回 (涨停价, 跌停价)"""
+    pre_close = np.asarray(pre_close, dtype=np.float64)
+    pct = np.asarray(pct, dtype=np.float64)
+    return round_price(pre_close * (1 + pct)), round_price(pre_close * (1 - pct))
+
+
+def load_st_periods() -> pd.DataFrame:
+    """
+    读取 stock_st 表中的ST区间（ts_code, start_date, end_date）
+    表不存在或查询失败时返回空表，即视为全部非ST
+    """
+    sql = "SELECT ts_code, start_date, end_date FROM stock_st"
+    try:
+        df = pd.read_sql(sql, get_engine())
+    except Exception as e:
+        logger.error(f"读取ST区间失败，按非ST处理: {e}")
+        return pd.DataFrame(columns=["ts_code", "start_date", "end_date"])
+    df["start_date"] = pd.to_datetime(df["start_date"])
+    df["end_date"] = pd.to_datetime(df["end_date"])
+    return df
+
+
+def mark_st(df: pd.DataFrame, st_periods: Optional[pd.DataFrame]) -> np.ndarray:
+    """标记 df 中每行（ts_code, trade_date）当天是否处于ST状态"""
+    if st_periods is None or st_periods.empty or df.empty:
+        return np.zeros(len(df), dtype=bool)
+
+    rows = pd.DataFrame(
+        {
+            "row": np.arange(len(df)),
+            "ts_code": df["ts_code"].to_numpy(),
+            "trade_date": pd.to_datetime(df["trade_date"]).to_numpy(),
+        }
+    )
+    merged = rows.merge(st_periods, on="ts_code", how="inner")
+    in_period = (merged["trade_date"] >= merged["start_date"]) & (
+        merged["end_date"].isna() | (merged["trade_date"] <= merged["end_date"])
+    )
+    result = np.zeros(len(df), dtype=bool)
+    result[merged.loc[in_period, "row"].to_numpy()] = True
+    return result
+
+
+def add_limit_columns(df: pd.DataFrame, st_periods: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    为日线长表添加涨跌停相关列（df 需按 ts_code、trade_date 升序，至少含 open/high/low/close/pre_close）
+
+    新增列：
+        board               所属板块
+        is_st               当天是否ST
+        limit_pct           涨跌幅限制
+        up_limit/down_limit 涨停价/跌停价
+        is_limit_up_close   收盘封涨停
+        is_limit_down_close 收盘封跌停
+        is_one_word_board   一字涨停（最低价即涨停价）
+        limit_up_streak     截至当天的连续涨停收盘天数（按该股自身交易日计）
+    """
+    df["board"] = classify_board(df["ts_code"])
+    df["is_st"] = mark_st(df, st_periods)
+    df["limit_pct"] = limit_pct(df["board"], df["is_st"], df["trade_date"])
+    df["up_limit"], df["down_limit"] = limit_prices(df["pre_close"], df["limit_pct"])
+
+    df["is_limit_up_close"] = (df["close"] >= df["up_limit"] - PRICE_EPS).to_numpy()
+    df["is_limit_down_close"] = (df["close"] <= df["down_limit"] + PRICE_EPS).to_numpy()
+    df["is_one_word_board"] = (df["low"] >= df["up_limit"] - PRICE_EPS).to_numpy()
+
+    # 连板天数：遇到非涨停或换股即重新计数
+    limit_up = df["is_limit_up_close"]
+    new_stock = df["ts_code"].ne(df["ts_code"].shift())
+    run_id = (~limit_up | new_stock).cumsum()
+    df["limit_up_streak"] = limit_up.astype(np.int32).groupby(run_id.to_numpy()).cumsum().to_numpy()
+    return df
@@ -1,58 +1,89 @@
 import os
 import sys
 
-# sys.path.insert(0, os.path.abspath("../"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import time
 from datetime import datetime, timedelta
 
 import pandas as pd
-import schedule
-from config import MYSQL_URL
-from filter_with_realtime import confirm_buy_with_realtime, get_yesterday_close, record_realtime_ticks
-from get_realtime import get_realtime_info
-
-# 加载表元信息
-from models import StockDaily  # 假设你已定义 ORM 类
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from strategies import ALL_STRATEGIES
+from fundamentals import apply_fundamental_rules
+from instrumentation import track_strategy
+from parallel_runner import run_strategies_parallel
+from result_cache import cache_key, data_fingerprint, load_result, run_cached, save_result
+from strategies import ALL_STRATEGIES, STRATEGY_PARAMS
 
 from utils.logger import logger
 
-engine = create_engine(MYSQL_URL)
-
+# 实时复审相关模块（filter_with_realtime、get_realtime、schedule）在用到它们的函数内导入，
+# 盘后选股只需要策略和数据库，不加载 requests、schedule
 
-# 定义不进行基本面过滤的策略列表
-strategies_without_fundamental_filter = [
-    "strategy_check_breakout_batch",
-    "strategy_top_gainers",
-    "strategy_plate_breakout_post_close",
-]
 
-
-def run_all_strategies_with_confirmation(trade_date: str, need_realtime_confirm: bool = True):
+def run_all_strategies_with_confirmation(
+    trade_date: str, need_realtime_confirm: bool = True, parallel: bool = False, use_cache: bool = True
+):
     """
     执行选股和实时确认买入流程
     Args:
         trade_date: 交易日期
         need_realtime_confirm: 是否需要实时确认
+        parallel: 是否在共享内存快照上并行执行所有策略
+        use_cache: 数据和参数都没有变化时直接使用上次的策略结果
     """
     logger.info(f"\n===== 执行选股和{'实时确认' if need_realtime_confirm else '非实时'}买入流程: {trade_date} =====")
 
-    all_hits = []
-    for strategy_func in ALL_STRATEGIES:
+    fingerprint = None
+    if use_cache:
         try:
-            # 给策略传前一天的数据
-            # pre_work_day = get_trade_date(trade_date)
-            df = strategy_func(trade_date)
-            logger.info(f"【{strategy_func.__name__}】命中数量: {len(df)}")
+            fingerprint = data_fingerprint(trade_date)
+        except Exception as e:
+            logger.warning(f"计算数据指纹失败，本次不使用缓存: {e}")
+
+    all_hits = []
+    if parallel:
+        pending = []
+        for strategy_func in ALL_STRATEGIES:
+            name = strategy_func.__name__
+            cached = None
+            if fingerprint is not None:
+                key = cache_key(name, trade_date, fingerprint, STRATEGY_PARAMS.get(name))
+                cached = load_result(name, trade_date, key)
+            if cached is None:
+                pending.append(strategy_func)
+                continue
+            with track_strategy(name, trade_date) as record:
+                record.update(cache_hit=True, hits=len(cached))
+            if not cached.empty:
+                all_hits.append(cached.assign(strategy=name))
+
+        results, _ = run_strategies_parallel(trade_date, pending) if pending else ({}, {})
+        for name, df in results.items():
+            if fingerprint is not None:
+                key = cache_key(name, trade_date, fingerprint, STRATEGY_PARAMS.get(name))
+                save_result(name, trade_date, key, df)
             if not df.empty:
-                df["strategy"] = strategy_func.__name__
+                df["strategy"] = name
                 all_hits.append(df)
+    else:
+        for strategy_func in ALL_STRATEGIES:
+            try:
+                # 给策略传前一天的数据
+                # pre_work_day = get_trade_date(trade_date)
+                with track_strategy(strategy_func.__name__, trade_date) as record:
+                    if fingerprint is not None:
+                        df, record["cache_hit"] = run_cached(
+                            strategy_func, trade_date, fingerprint, STRATEGY_PARAMS.get(strategy_func.__name__)
+                        )
+                    else:
+                        df = strategy_func(trade_date)
+                    record["hits"] = len(df)
                 logger.info(f"【{strategy_func.__name__}】命中数量: {len(df)}")
-        except Exception as e:
-            logger.error(f"策略 {strategy_func.__name__} 运行失败: {e}")
+                if not df.empty:
+                    df = df.copy()
+                    df["strategy"] = strategy_func.__name__
+                    all_hits.append(df)
+            except Exception as e:
+                logger.error(f"策略 {strategy_func.__name__} 运行失败: {e}")
 
     if not all_hits:
         logger.info("无策略命中，结束")
@@ -60,8 +91,17 @@ def run_all_strategies_with_confirmation(trade_date: str, need_realtime_confirm:
 
     df_all = pd.concat(all_hits, ignore_index=True)
 
-    # 过滤掉科创板（688开头）和创业板（300开头）
-    df_all = df_all[~df_all["ts_code"].str.startswith(("300", "688"))]
+    # 按策略应用 README 中的基本面门槛（fundamentals.FUNDAMENTAL_RULES，未配置门槛的策略不过滤）
+    try:
+        df_all = apply_fundamental_rules(df_all, as_of=trade_date)
+    except Exception as e:
+        logger.warning(f"基本面过滤失败，本次跳过: {e}")
+    if df_all.empty:
+        logger.info("基本面过滤后无命中，结束")
+        return
+
+    # 科创板、创业板已由各策略的股票池（universe）在读取行情时排除
+    from filter_with_realtime import get_yesterday_close
 
     # 汇总每只股票命中策略
     df_confirmed = df_all.groupby("ts_code")["strategy"].apply(list).reset_index()
@@ -169,6 +209,9 @@ def reconfirm_from_file(trade_date: str):
     从 confirmed_stocks_{trade_date}.csv 文件读取已确认股票，
     重新执行 confirm_buy_with_realtime 逻辑确认，并保存成功的股票列表。
     """
+    from filter_with_realtime import confirm_buy_with_realtime
+    from get_realtime import get_realtime_info
+
     filename = f"confirmed_stocks/confirmed_stocks_{trade_date}.csv"
     try:
         df = pd.read_csv(filename, encoding="utf-8-sig", dtype={"股票代码": str})
@@ -216,6 +259,9 @@ def is_market_open():
 
 
 def run_schedule_reconfirm(trade_date: str):
+    import schedule
+    from filter_with_realtime import record_realtime_ticks
+
     logger.info(f"⏳ 每一分钟执行一次实时数据下载和实时复审任务，开始监控...（交易日: {trade_date}）")
 
     def job():
@@ -20,3 +20,26 @@ class StockDaily(Base):
     update_time = Column(DateTime)  # ✅ 添加这一行
 
     __table_args__ = (PrimaryKeyConstraint("ts_code", "trade_date"),)  # 设为联合主键，确保唯一性
+
+
+class StockST(Base):
+    __tablename__ = "stock_st"
+
+    ts_code = Column(String(10), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date)  # 为空表示至今仍为ST
+    name = Column(String(20))
+    update_time = Column(DateTime)
+
+    __table_args__ = (PrimaryKeyConstraint("ts_code", "start_date"),)
+
+
+class StockAdjFactor(Base):
+    __tablename__ = "stock_adj_factor"
+
+    ts_code = Column(String(10), nullable=False)
+    trade_date = Column(Date, nullable=False)
+    adj_factor = Column(Float)
+    update_time = Column(DateTime)
+
+    __table_args__ = (PrimaryKeyConstraint("ts_code", "trade_date"),)
@@ -0,0 +1,85 @@
+"""
+并行策略执行器
+
+先把策略需要的日线窗口一次性读进共享内存快照，再用进程池并行执行 ALL_STRATEGIES，
+每个子进程映射同一块共享内存（不复制数据），策略里的 data_source.query_* 查询全部走快照。
+总耗时约等于“加载一次 + 最慢的那个策略”。
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from data_source import set_snapshot
+from instrumentation import save_run, track_strategy
+from snapshot import DailySnapshot
+
+from utils.logger import logger
+
+# 快照默认覆盖的自然日天数（约 270 个交易日，够年线以外的所有策略使用）
+DEFAULT_LOOKBACK_DAYS = 400
+
+
+def _init_worker(handle: dict):
+    """子进程初始化：映射共享内存快照，并让 data_source 使用它"""
+    set_snapshot(DailySnapshot.attach(handle))
+
+
+def _run_strategy(strategy_func: Callable, trade_date: str) -> Tuple[pd.DataFrame, dict]:
+    """子进程中执行策略，运行记录随结果返回，由父进程统一写入"""
+    with track_strategy(strategy_func.__name__, trade_date, path=None) as record:
+        df = strategy_func(trade_date)
+        record["hits"] = len(df)
+    return df, record
+
+
+def run_strategies_parallel(
+    trade_date: str,
+    strategies: List[Callable],
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    max_workers: Optional[int] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, dict]]:
+    """
+    在共享快照上并行执行策略
+
+    Args:
+        trade_date: 交易日期，YYYYMMDD
+        strategies: 策略函数列表，签名为 strategy(trade_date) -> DataFrame
+        lookback_days: 快照覆盖 trade_date 之前多少个自然日
+        max_workers: 进程数，默认取 CPU 核数与策略数的较小值
+
+    Returns:
+        (results, timings)
+        results: {策略名: 命中结果}，失败的策略不在其中
+        timings: {策略名: instrumentation 运行记录}，另含 "_load" 记录快照加载耗时
+    """
+    start_date = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=lookback_days)).strftime("%Y%m%d")
+
+    load_start = time.perf_counter()
+    snapshot = DailySnapshot.load(start_date, trade_date)
+    handle = snapshot.to_shared()
+    load_seconds = time.perf_counter() - load_start
+    logger.info(f"快照加载完成: {len(snapshot)} 行，{snapshot.nbytes / 2**20:.1f} MB，耗时 {load_seconds:.2f}s")
+
+    results = {}
+    timings = {"_load": {"seconds": round(load_seconds, 3), "rows": len(snapshot)}}
+    try:
+        workers = max_workers or max(1, min(len(strategies), os.cpu_count() or 1))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(handle,)) as pool:
+            futures = {func.__name__: pool.submit(_run_strategy, func, trade_date) for func in strategies}
+            for name, future in futures.items():
+                try:
+                    df, record = future.result()
+                    results[name] = df
+                    logger.info(f"【{name}】命中数量: {len(df)}，耗时 {record['total_seconds']:.2f}s")
+                except Exception as e:
+                    record = {"strategy": name, "trade_date": trade_date, "hits": None, "error": str(e)}
+                    logger.error(f"策略 {name} 运行失败: {e}")
+                timings[name] = record
+                save_run(record)
+    finally:
+        snapshot.close(unlink=True)
+
+    return results, timings
@@ -0,0 +1,298 @@
+"""
+策略阈值的并行参数扫描
+
+涨停连板预测里的 close < 13、收盘价 >= 最高价的95%、量比 >2 的满分档、score >= 60 都是手工定的。
+这里对一组参数网格逐个回测：
+    • 行情只读一次，指标（均线、量比、连板天数、涨停价）只算一次，得到“所有参数下都可能入选”的候选行
+      以及回测用的价格矩阵（backtest.price_matrices）
+    • 与参数无关的评分项预先求和，每个组合只重新判断受参数影响的条件和那一条评分规则
+    • 候选数组和价格矩阵放进共享内存，进程池里的每个子进程映射同一份只读数据，按组合并行回测
+    • 结果按指标（默认平均收益）排序，成交笔数不足 min_trades 的组合排在最后
+
+每个可扫描的策略在 SWEEP_TARGETS 中登记：prepare 生成候选数组，select 按参数返回候选行是否入选的布尔掩码，
+defaults 为当前线上参数。
+
+用法：
+    python param_sweep.py --start 20230101 --end 20250630 \\
+        --grid max_price=10,13,15 min_score=50,60,70 vol_ratio_threshold=1.8,2.0,2.5 hold=1,2
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import scoring
+from backtest import DEFAULT_COST, price_matrices, simulate_trades, summarize
+from batch_screen import BATCH_EVALUATORS, load_window
+from limit_price import load_st_periods
+from snapshot import attach_arrays, release_shared, share_arrays
+from strategies import LIMIT_UP_MIN_SCORE, LIMIT_UP_UNIVERSE, add_limit_up_features
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+
+from utils.logger import logger
+
+RESULT_DIR = "sweep_results"
+
+# 回测用到的价格矩阵
+MATRIX_KEYS = [
+    "dates", "codes", "open", "close", "pre_close", "log_return", "growth", "has_bar", "buyable", "next_sellable",
+]  # fmt: skip
+
+# 子进程里映射好的共享数据；共享内存对象也要留着，被回收时映射会随之关闭
+_shared: Optional[dict] = None
+_shared_shms: list = []
+
+
+# ---------------------------------------------------------------------------
+# 涨停连板预测
+# ---------------------------------------------------------------------------
+
+LIMIT_UP_DEFAULTS = {
+    "max_price": LIMIT_UP_UNIVERSE["max_price"],
+    "close_high_ratio": 0.95,
+    "vol_ratio_threshold": float(scoring.LIMIT_UP_SCORE_RULES[0]["thresholds"].max()),
+    "min_score": LIMIT_UP_MIN_SCORE,
+    "hold": 1,
+}
+# 量比规则只扫描最高一档的阈值，不能低于下一档，否则分数不再随量比单调递增
+VOL_RATIO_FLOOR = float(scoring.LIMIT_UP_SCORE_RULES[0]["thresholds"][-2])
+
+
+def _validate_limit_up(params: dict):
+    if params["vol_ratio_threshold"] < VOL_RATIO_FLOOR:
+        raise ValueError(f"vol_ratio_threshold={params['vol_ratio_threshold']} 低于下一档量比阈值 {VOL_RATIO_FLOOR}")
+
+
+def _prepare_limit_up(panel: pd.DataFrame, st_periods: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """所有参数下都可能入选的行：收盘封涨停、当天有成交、至少10天历史（股价上限留给参数判断）"""
+    add_limit_up_features(panel, st_periods)
+    base = panel["is_limit_up_close"].to_numpy() & (panel["vol"] > 0).to_numpy() & (panel["n_days"] >= 10).to_numpy()
+    rows = panel[base]
+
+    other_points, _ = scoring.score(rows, scoring.LIMIT_UP_SCORE_RULES[1:])
+    return {
+        "trade_date": rows["trade_date"].to_numpy(),
+        "ts_code": rows["ts_code"].to_numpy().astype(str),
+        "close": rows["close"].to_numpy(dtype=np.float64),
+        "high": rows["high"].to_numpy(dtype=np.float64),
+        "vol_ratio": rows["vol_ratio"].to_numpy(dtype=np.float64),
+        "other_points": other_points,
+    }
+
+
+def _select_limit_up(candidates: Dict[str, np.ndarray], params: dict) -> np.ndarray:
+    """按参数判断候选行是否入选，只重算量比这一条评分规则"""
+    _validate_limit_up(params)
+    vol_rule = scoring.LIMIT_UP_SCORE_RULES[0]
+    thresholds = vol_rule["thresholds"].copy()
+    thresholds[-1] = params["vol_ratio_threshold"]
+    level = scoring.bracket_level(candidates["vol_ratio"], thresholds, ">")
+    vol_points = np.where(level >= 0, vol_rule["points"][np.maximum(level, 0)], 0.0)
+    score = candidates["other_points"] + vol_points
+
+    with np.errstate(invalid="ignore"):
+        return (
+            (candidates["close"] < params["max_price"])
+            & (candidates["close"] >= candidates["high"] * params["close_high_ratio"])
+            & (score >= params["min_score"])
+        )
+
+
+SWEEP_TARGETS = {
+    "strategy_limit_up_continuation_prediction": {
+        "prepare": _prepare_limit_up,
+        "select": _select_limit_up,
+        "validate": _validate_limit_up,
+        "defaults": LIMIT_UP_DEFAULTS,
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# 扫描
+# ---------------------------------------------------------------------------
+
+
+def expand_grid(
+    grid: Dict[str, List], defaults: dict, validate: Optional[Callable[[dict], None]] = None
+) -> List[dict]:
+    """网格展开成参数组合列表，网格里没有的参数取 defaults；validate 对每组参数做检查，不合法时抛 ValueError"""
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"未知参数: {sorted(unknown)}，可选: {list(defaults)}")
+    names = list(grid)
+    combos = [{**defaults, **dict(zip(names, values))} for values in itertools.product(*(grid[n] for n in names))]
+    if validate is not None:
+        for combo in combos:
+            validate(combo)
+    return combos
+
+
+def build_sweep_data(strategy_name: str, start_date: str, end_date: str, max_hold: int) -> Dict[str, np.ndarray]:
+    """读取一次行情，生成候选数组和价格矩阵（键名加 c_ / m_ 前缀，可直接放进共享内存）"""
+    evaluator = BATCH_EVALUATORS[strategy_name]
+    # 区间末尾的信号还要留出买入和持有的交易日
+    end_obj = datetime.strptime(end_date, "%Y%m%d")
+    extra_days = int((max_hold + evaluator["lag"] + 5) * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS
+    price_end = (end_obj + timedelta(days=extra_days)).strftime("%Y%m%d")
+    panel = load_window(evaluator, start_date, price_end)
+    if panel.empty:
+        raise ValueError(f"{start_date} ~ {end_date} 没有行情数据")
+
+    st_periods = load_st_periods()
+    candidates = SWEEP_TARGETS[strategy_name]["prepare"](panel, st_periods)
+    matrices = price_matrices(panel, st_periods)
+
+    # 候选行的数据日须落在区间内（T-1 数据选股时数据日比选股日早一个交易日，这里按数据日截取）
+    dates = matrices["dates"]
+    first = np.searchsorted(dates, np.datetime64(pd.to_datetime(start_date)))
+    last = np.searchsorted(dates, np.datetime64(pd.to_datetime(end_date)), side="right")
+    t = np.searchsorted(dates, candidates["trade_date"].astype(dates.dtype))
+    keep = (t >= max(first - evaluator["lag"], 0)) & (t < last - evaluator["lag"])
+    data = {f"c_{k}": v[keep] for k, v in candidates.items()}
+    data["c_t"] = t[keep]
+    data["c_j"] = np.searchsorted(matrices["codes"], candidates["ts_code"][keep])
+    for key in MATRIX_KEYS:
+        data[f"m_{key}"] = matrices[key] if key != "codes" else matrices[key].astype(str)
+    return data
+
+
+def simulate_params(strategy_name: str, params: dict, data: dict, cost: float = DEFAULT_COST) -> pd.DataFrame:
+    """按一组参数选出信号并逐笔回测，返回 backtest.simulate_trades 的交易明细"""
+    candidates = {k[2:]: v for k, v in data.items() if k.startswith("c_")}
+    matrices = {k[2:]: v for k, v in data.items() if k.startswith("m_")}
+    selected = SWEEP_TARGETS[strategy_name]["select"](candidates, params)
+
+    signal = np.zeros(matrices["growth"].shape, dtype=bool)
+    signal[candidates["t"][selected], candidates["j"][selected]] = True
+    # 数据日收盘后出信号，下一个交易日开盘买入
+    return simulate_trades(signal, matrices, entry_offset=1, hold=int(params["hold"]), cost=cost)
+
+
+def evaluate_params(strategy_name: str, params: dict, data: dict, cost: float = DEFAULT_COST) -> dict:
+    """回测一组参数，返回参数加汇总指标"""
+    trades = simulate_params(strategy_name, params, data, cost)
+    return {**params, **summarize(trades, int(params["hold"]))}
+
+
+def _init_worker(handle: dict):
+    """子进程初始化：映射共享内存中的候选数组和价格矩阵"""
+    global _shared, _shared_shms
+    _shared, _shared_shms = attach_arrays(handle)
+
+
+def _evaluate_shared(strategy_name: str, params: dict, cost: float) -> dict:
+    return evaluate_params(strategy_name, params, _shared, cost)
+
+
+def rank_results(results: List[dict], metric: str = "avg_return", min_trades: int = 30) -> pd.DataFrame:
+    """按 metric 降序排列，成交不足 min_trades 笔的组合排在最后"""
+    table = pd.DataFrame(results)
+    table["enough_trades"] = table["filled"] >= min_trades
+    table = table.sort_values(["enough_trades", metric], ascending=[False, False], na_position="last", kind="stable")
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table.reset_index(drop=True)
+
+
+def run_sweep(
+    strategy_name: str,
+    start_date: str,
+    end_date: str,
+    grid: Dict[str, List],
+    metric: str = "avg_return",
+    min_trades: int = 30,
+    cost: float = DEFAULT_COST,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    在 [start_date, end_date] 上扫描参数网格
+
+    Args:
+        grid: {参数名: 候选值列表}，未列出的参数取当前线上值
+        metric: 排序指标（backtest.summarize 的字段）
+        max_workers: 进程数，1 表示在当前进程中串行执行
+
+    Returns:
+        排好序的结果表，每行一个参数组合
+    """
+    if strategy_name not in SWEEP_TARGETS:
+        raise ValueError(f"策略 {strategy_name} 不支持参数扫描，可选: {list(SWEEP_TARGETS)}")
+    target = SWEEP_TARGETS[strategy_name]
+    combos = expand_grid(grid, target["defaults"], target.get("validate"))
+    max_hold = max(int(c["hold"]) for c in combos)
+
+    load_start = time.perf_counter()
+    data = build_sweep_data(strategy_name, start_date, end_date, max_hold)
+    logger.info(
+        f"【{strategy_name}】参数扫描数据就绪: {len(data['c_t'])} 条候选，价格矩阵 {data['m_growth'].shape}，"
+        f"耗时 {time.perf_counter() - load_start:.2f}s，共 {len(combos)} 组参数"
+    )
+
+    sweep_start = time.perf_counter()
+    workers = max_workers or max(1, min(len(combos), os.cpu_count() or 1))
+    if workers == 1:
+        results = [evaluate_params(strategy_name, params, data, cost) for params in combos]
+    else:
+        handle, _, shms = share_arrays(data)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(handle,)) as pool:
+                futures = [pool.submit(_evaluate_shared, strategy_name, params, cost) for params in combos]
+                results = [f.result() for f in futures]
+        finally:
+            release_shared(shms, unlink=True)
+    logger.info(f"【{strategy_name}】{len(combos)} 组参数回测完成，耗时 {time.perf_counter() - sweep_start:.2f}s")
+    return rank_results(results, metric, min_trades)
+
+
+def _parse_value(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_grid(items: List[str]) -> Dict[str, List]:
+    """解析命令行的 name=v1,v2,... 形式，数值转成 float，其余保留为字符串"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        grid[name] = [_parse_value(v) for v in values.split(",") if v]
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="策略阈值的并行参数扫描")
+    parser.add_argument("--strategy", default="strategy_limit_up_continuation_prediction", choices=list(SWEEP_TARGETS))
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--grid", nargs="+", required=True, help="参数网格，如 max_price=10,13,15 hold=1,2")
+    parser.add_argument("--metric", default="avg_return")
+    parser.add_argument("--min-trades", type=int, default=30)
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="结果 CSV 路径，默认 sweep_results/<策略>_<起>_<止>.csv")
+    args = parser.parse_args()
+
+    table = run_sweep(
+        args.strategy,
+        args.start,
+        args.end,
+        parse_grid(args.grid),
+        args.metric,
+        args.min_trades,
+        args.cost,
+        args.workers,
+    )
+    output = args.output or os.path.join(RESULT_DIR, f"{args.strategy}_{args.start}_{args.end}.csv")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    table.to_csv(output, index=False, encoding="utf-8-sig")
+    logger.info(f"✅ 前5组参数:\n{table.head(5).to_string(index=False)}")
+    logger.info(f"✅ 结果已保存: {output}")
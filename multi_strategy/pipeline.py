@@ -0,0 +1,203 @@
+"""
+分阶段级联筛选
+
+很多策略都是同一个套路：先在某一天的全市场截面上用便宜的条件筛掉绝大多数股票，
+再只对剩下的几十只读取历史、算滚动指标，最后对更少的股票打分。
+这里把这个套路写成一条流水线（普通 dict，make_pipeline 生成），按顺序执行三类阶段：
+    • cross_section_stage：截面阶段，在数据日的截面上过滤；第一个截面阶段负责读取截面，股票池在读取时下推
+    • window_stage：窗口阶段，第一次进入时只为当前幸存的股票读取最近 lookback 个交易日的历史，
+      依次执行各阶段的 prepare 计算指标，再在每只股票的最后一行上过滤；相邻的窗口阶段共用一次读取
+    • score_stage：打分阶段，对最后幸存的行打分，返回策略结果
+任何一个阶段后没有剩余股票就直接结束，后面更贵的阶段不会执行。
+每个阶段后剩余的股票数通过 instrumentation.record_funnel 记录，并在日志里打印一行漏斗。
+
+阶段函数的签名：
+    prepare(df, ctx) -> None，就地添加列
+    where(df, ctx) -> 布尔数组（与 df 等长）
+    score(rows, ctx) -> 结果 DataFrame
+ctx 是本次运行的上下文 dict：trade_date（选股日期）、data_date（所用数据的日期）、st_periods（needs_st 时读取）。
+"""
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from data_source import query_cross_section, query_history, query_previous_trade_date
+from instrumentation import record_funnel
+from limit_price import load_st_periods
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+from universe import MAIN_BOARD_UNIVERSE
+
+from utils.logger import logger
+
+STAGE_CROSS_SECTION = "cross_section"
+STAGE_WINDOW = "window"
+STAGE_SCORE = "score"
+
+
+def cross_section_stage(
+    name: str,
+    where: Optional[Callable] = None,
+    prepare: Optional[Callable] = None,
+    columns: Optional[List[str]] = None,
+) -> dict:
+    """
+    截面阶段
+
+    Args:
+        where: 过滤函数，为 None 时只记录剩余数量（例如第一个阶段只记录股票池大小）
+        prepare: 过滤前在截面上添加列
+        columns: 需要的行情字段，所有截面阶段的字段在第一次读取时一起读出
+    """
+    return {"kind": STAGE_CROSS_SECTION, "name": name, "where": where, "prepare": prepare, "columns": columns or []}
+
+
+def window_stage(
+    name: str,
+    where: Callable,
+    prepare: Optional[Callable] = None,
+    columns: Optional[List[str]] = None,
+    lookback: Optional[int] = None,
+) -> dict:
+    """
+    窗口阶段
+
+    Args:
+        where: 在每只股票数据日那一行（历史的最后一行）上过滤
+        prepare: 在幸存股票的历史长表上添加列（按 ts_code、trade_date 升序）
+        columns: 需要的行情字段
+        lookback: 需要的交易日数，None 表示全部历史；相邻窗口阶段取最大值
+    """
+    return {
+        "kind": STAGE_WINDOW,
+        "name": name,
+        "where": where,
+        "prepare": prepare,
+        "columns": columns or [],
+        "lookback": lookback,
+    }
+
+
+def score_stage(name: str, score: Callable) -> dict:
+    """打分阶段，score 返回的结果即策略输出，剩余数量为结果行数"""
+    return {"kind": STAGE_SCORE, "name": name, "score": score}
+
+
+def make_pipeline(
+    name: str, stages: List[dict], universe: dict = MAIN_BOARD_UNIVERSE, lag: int = 0, needs_st: bool = False
+) -> dict:
+    """
+    定义一条流水线
+
+    Args:
+        stages: 阶段列表，第一个必须是截面阶段
+        universe: 股票池，读取截面时下推
+        lag: 以 trade_date 之前第几个交易日的数据选股（T-1 日数据为 1）
+        needs_st: 是否需要 ST 区间（放进 ctx["st_periods"]）
+    """
+    if not stages or stages[0]["kind"] != STAGE_CROSS_SECTION:
+        raise ValueError(f"流水线 {name} 的第一个阶段必须是截面阶段")
+    return {"name": name, "stages": stages, "universe": universe, "lag": lag, "needs_st": needs_st}
+
+
+def _columns(stages: List[dict]) -> List[str]:
+    return list(dict.fromkeys(col for stage in stages for col in stage["columns"]))
+
+
+def _window_group(stages: List[dict], start: int) -> List[dict]:
+    """从 start 开始的连续窗口阶段，它们共用一次历史读取"""
+    group = []
+    for stage in stages[start:]:
+        if stage["kind"] != STAGE_WINDOW:
+            break
+        group.append(stage)
+    return group
+
+
+def load_window(codes: List[str], data_date: str, columns: List[str], lookback: Optional[int]) -> pd.DataFrame:
+    """读取 codes 截至 data_date 的历史，lookback 为 None 时不限起始日期"""
+    start_date = None
+    if lookback:
+        data_date_obj = datetime.strptime(data_date.replace("-", ""), "%Y%m%d")
+        days = int(lookback * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS
+        start_date = (data_date_obj - timedelta(days=days)).strftime("%Y%m%d")
+    return query_history(codes, data_date, start_date=start_date, columns=columns)
+
+
+def resolve_data_date(trade_date: str, lag: int) -> Optional[str]:
+    """trade_date 往前数 lag 个交易日"""
+    data_date = trade_date
+    for _ in range(lag):
+        data_date = query_previous_trade_date(data_date)
+        if not data_date:
+            return None
+    return data_date
+
+
+def run_pipeline(pipeline: dict, trade_date: str) -> pd.DataFrame:
+    """
+    执行流水线，返回打分阶段的结果；没有打分阶段时返回最后幸存的行
+
+    Returns:
+        策略结果，任何阶段后没有剩余股票时为空 DataFrame
+    """
+    name = pipeline["name"]
+    data_date = resolve_data_date(trade_date, pipeline["lag"])
+    if not data_date:
+        logger.error(f"【{name}】无法获取 {trade_date} 之前的交易日")
+        return pd.DataFrame()
+    if pipeline["lag"]:
+        logger.info(f"【{name}】选股日期 {trade_date}，使用 {data_date} 的数据")
+
+    ctx = {"trade_date": trade_date, "data_date": data_date, "st_periods": None}
+    stages = pipeline["stages"]
+    survivors = []
+    df = None
+    i = 0
+    while i < len(stages):
+        stage = stages[i]
+        kind = stage["kind"]
+
+        if kind == STAGE_CROSS_SECTION and df is None:
+            cross_stages = [s for s in stages if s["kind"] == STAGE_CROSS_SECTION]
+            df = query_cross_section(data_date, _columns(cross_stages), universe=pipeline["universe"])
+            if pipeline["needs_st"] and not df.empty:
+                ctx["st_periods"] = load_st_periods()
+
+        if kind == STAGE_WINDOW:
+            group = _window_group(stages, i)
+            lookbacks = [s["lookback"] for s in group]
+            lookback = None if None in lookbacks else max(lookbacks)
+            history = load_window(df["ts_code"].tolist(), data_date, _columns(group), lookback)
+            for window in group:
+                if window["prepare"] is not None:
+                    window["prepare"](history, ctx)
+            # 数据日是每只股票历史的最后一行
+            df = history.groupby("ts_code", sort=True).tail(1).reset_index(drop=True)
+            for window in group:
+                df = df[np.asarray(window["where"](df, ctx), dtype=bool)]
+                survivors.append((window["name"], len(df)))
+                record_funnel(window["name"], len(df))
+                if df.empty:
+                    break
+            i += len(group)
+        elif kind == STAGE_SCORE:
+            df = stage["score"](df, ctx)
+            survivors.append((stage["name"], len(df)))
+            record_funnel(stage["name"], len(df))
+            i += 1
+        else:
+            if stage["prepare"] is not None and not df.empty:
+                stage["prepare"](df, ctx)
+            if stage["where"] is not None and not df.empty:
+                df = df[np.asarray(stage["where"](df, ctx), dtype=bool)]
+            survivors.append((stage["name"], len(df)))
+            record_funnel(stage["name"], len(df))
+            i += 1
+
+        if df.empty:
+            logger.info(f"【{name}】{data_date} 在阶段 {survivors[-1][0]} 后没有剩余股票")
+            return pd.DataFrame()
+
+    logger.info(f"【{name}】{data_date} 各阶段剩余: {' → '.join(f'{s} {n}' for s, n in survivors)}")
+    return df.reset_index(drop=True)
@@ -0,0 +1,374 @@
+"""
+带仓位上限的组合回测
+
+backtest.py 的逐笔回测回答“信号有没有用”，实盘却只有固定几个仓位（holding_stock / stock_to_sell 里记录的持仓）：
+信号多的日子只能买排在前面的几只，满仓时新信号只能放弃，资金也要在几个仓位之间分配。这里模拟这个过程：
+    • slots 个仓位，每天开盘时用可用现金等分给空仓位（现金 / 空仓位数），按 100 股一手向下取整，买不起一手的跳过
+    • 候选按 priority 排序：score（策略评分，同分看策略数量）或 strategy_count（策略数量，同数看评分）
+    • 只买被至少 min_count 个策略同时选中的股票；已持有的股票不重复买入
+    • 买入日停牌或一字涨停买不进，顺延给排在后面的候选
+    • 每笔交易的卖出日和收益与 backtest.simulate_trades 相同（持有 hold 个交易日，卖出日停牌、一字跌停顺延）
+    • 收盘卖出的资金次日才能再买入；开盘卖出（--exit-at open）的资金当天开盘即可再买入
+    • 每天按收盘价（growth 链接，自动处理除权）计算持仓市值，得到资金曲线和最大回撤
+
+全部参数组合（仓位数、排序方式、持有期、最少策略数、初始资金）放在同一组数组里，按交易日逐日推进，
+每一天对所有组合同时做卖出、排序、选股、分配资金，几千组参数一次跑完。
+
+用法：
+    python portfolio_sim.py --strategies all --start 20230101 --end 20250630 \\
+        --grid slots=3,5,10 priority=score,strategy_count hold=1,2,3 min_count=1,2
+    python portfolio_sim.py --confirmed --start 20250101 --end 20250630 --grid slots=2,3,5 priority=strategy_count
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from backtest import DEFAULT_COST, load_prices, max_drawdown, price_matrices, simulate_trades
+from data_source import query_trade_dates
+from param_sweep import expand_grid, parse_grid
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+
+from utils.logger import logger
+
+RESULT_DIR = "portfolio_results"
+LOT_SIZE = 100
+
+PORTFOLIO_DEFAULTS = {
+    "slots": 5,
+    "priority": "score",
+    "hold": 1,
+    "min_count": 1,
+    "capital": 1_000_000,
+}
+
+# 排序方式 -> (主键, 次键)，都按降序
+PRIORITIES = {
+    "score": ("score", "strategy_count"),
+    "strategy_count": ("strategy_count", "score"),
+}
+
+CANDIDATE_COLUMNS = ["trade_date", "ts_code", "score", "strategy_count", "entry_offset"]
+
+
+# ---------------------------------------------------------------------------
+# 候选
+# ---------------------------------------------------------------------------
+
+
+def strategy_candidates(strategy_names: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    批量选股的命中作为候选，每个策略的每条命中一行（strategy_count 为 1，合并同一买入日时累加）
+
+    entry_offset 与 backtest.backtest_strategy 一致：用当天收盘数据的策略次日开盘买入，T-1 数据选股的策略当天买入
+    """
+    from batch_screen import BATCH_EVALUATORS, screen_range
+
+    frames = []
+    for name in strategy_names:
+        hits = screen_range(name, start_date, end_date)
+        if hits.empty:
+            continue
+        frames.append(
+            pd.DataFrame(
+                {
+                    "trade_date": pd.to_datetime(hits["trade_date"]).to_numpy(),
+                    "ts_code": hits["ts_code"].to_numpy(),
+                    "score": hits["score"].to_numpy(dtype=np.float64),
+                    "strategy_count": 1,
+                    "entry_offset": 1 - BATCH_EVALUATORS[name]["lag"],
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CANDIDATE_COLUMNS)
+
+
+def confirmed_candidates(start_date: str, end_date: str) -> pd.DataFrame:
+    """confirmed_stocks 文件里的实盘候选：pick_date 当天（或其后第一个交易日）买入，没有评分"""
+    from evaluate_confirmed import list_sources, read_picks
+
+    sources = {date: source for date, source in list_sources().items() if start_date <= date <= end_date}
+    picks = read_picks(sources)
+    return pd.DataFrame(
+        {
+            "trade_date": pd.to_datetime(picks["pick_date"]).to_numpy(),
+            "ts_code": picks["ts_code"].to_numpy(),
+            "score": np.nan,
+            "strategy_count": picks["strategy_count"].to_numpy(),
+            "entry_offset": 0,
+        }
+    )
+
+
+def load_matrices(candidates: pd.DataFrame, max_hold: int) -> dict:
+    """只为候选股票读取价格矩阵，末尾留出买入和持有的交易日"""
+    signal_dates = pd.to_datetime(candidates["trade_date"])
+    start = signal_dates.min().strftime("%Y%m%d")
+    sessions = max_hold + 6
+    end = signal_dates.max() + timedelta(days=int(sessions * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS)
+    end = end.strftime("%Y%m%d")
+    panel = load_prices(sorted(candidates["ts_code"].unique()), start, end)
+    return price_matrices(panel, calendar=query_trade_dates(start, end))
+
+
+def prepare_candidates(candidates: pd.DataFrame, matrices: dict) -> Dict[str, np.ndarray]:
+    """
+    候选放到价格矩阵的下标上，同一 (买入日, 股票) 合并：评分取最高，策略数量累加
+
+    Returns:
+        dict：t（买入日下标，按升序）、j（股票下标）、score、strategy_count、fillable（买入日有成交且非一字涨停）
+    """
+    dates, codes = matrices["dates"], matrices["codes"]
+    signal_dates = pd.to_datetime(candidates["trade_date"]).to_numpy().astype(dates.dtype)
+    t = np.searchsorted(dates, signal_dates) + candidates["entry_offset"].to_numpy(dtype=np.int64)
+    j = np.searchsorted(codes, candidates["ts_code"].to_numpy())
+    j_ok = np.minimum(j, len(codes) - 1)
+    valid = (t < len(dates)) & (j < len(codes)) & (codes[j_ok] == candidates["ts_code"].to_numpy())
+
+    located = pd.DataFrame(
+        {
+            "t": t[valid],
+            "j": j_ok[valid],
+            "score": candidates["score"].to_numpy(dtype=np.float64)[valid],
+            "strategy_count": candidates["strategy_count"].to_numpy(dtype=np.int64)[valid],
+        }
+    )
+    merged = (
+        located.groupby(["t", "j"], sort=True)
+        .agg(score=("score", "max"), strategy_count=("strategy_count", "sum"))
+        .reset_index()
+    )
+    prepared = {col: merged[col].to_numpy() for col in merged.columns}
+    prepared["fillable"] = matrices["buyable"][prepared["t"], prepared["j"]]
+    return prepared
+
+
+def trade_outcomes(
+    prepared: Dict[str, np.ndarray], matrices: dict, holds: List[int], exit_at: str, cost: float
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    每个持有期下每个候选的卖出日下标（还没有数据时为交易日数）和扣费后收益，复用 backtest.simulate_trades
+
+    Returns:
+        {hold: (exit_t, return)}，与 prepared 逐行对应
+    """
+    n_dates = len(matrices["dates"])
+    signal = np.zeros((n_dates, len(matrices["codes"])), dtype=bool)
+    signal[prepared["t"], prepared["j"]] = True
+    outcomes = {}
+    for hold in holds:
+        # 信号矩阵 np.nonzero 的顺序即 (t, j) 升序，与 prepared 的顺序一致
+        trades = simulate_trades(signal, matrices, entry_offset=0, hold=hold, exit_at=exit_at, cost=cost)
+        exit_dates = trades["exit_date"].to_numpy().astype(matrices["dates"].dtype)
+        exit_t = np.where(np.isnat(exit_dates), n_dates, np.searchsorted(matrices["dates"], exit_dates))
+        outcomes[hold] = (exit_t, trades["return"].to_numpy(dtype=np.float64))
+    return outcomes
+
+
+def _priority_orders(prepared: Dict[str, np.ndarray], lo: int, hi: int) -> np.ndarray:
+    """当天候选在每种排序方式下的顺序，形状 (len(PRIORITIES), hi - lo)；NaN 排在最后"""
+    orders = []
+    for primary, secondary in PRIORITIES.values():
+        first = np.nan_to_num(prepared[primary][lo:hi].astype(np.float64), nan=-np.inf)
+        second = np.nan_to_num(prepared[secondary][lo:hi].astype(np.float64), nan=-np.inf)
+        orders.append(np.lexsort((-second, -first)))
+    return np.array(orders)
+
+
+# ---------------------------------------------------------------------------
+# 组合模拟
+# ---------------------------------------------------------------------------
+
+
+def simulate_portfolios(
+    configs: List[dict],
+    prepared: Dict[str, np.ndarray],
+    matrices: dict,
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    所有参数组合同时逐日模拟
+
+    Args:
+        configs: 参数组合列表，键同 PORTFOLIO_DEFAULTS
+        prepared: prepare_candidates 的结果
+
+    Returns:
+        (每个组合一行的汇总表, 资金曲线表：交易日 × 组合序号，按初始资金归一)
+    """
+    n_configs = len(configs)
+    unknown = {c["priority"] for c in configs} - set(PRIORITIES)
+    if unknown:
+        raise ValueError(f"未知的排序方式: {sorted(unknown)}，可选: {list(PRIORITIES)}")
+    slots = np.array([int(c["slots"]) for c in configs])
+    min_count = np.array([int(c["min_count"]) for c in configs])
+    capital = np.array([float(c["capital"]) for c in configs])
+    priority_idx = np.array([list(PRIORITIES).index(c["priority"]) for c in configs])
+    holds = sorted({int(c["hold"]) for c in configs})
+    hold_idx = np.array([holds.index(int(c["hold"])) for c in configs])
+
+    outcomes = trade_outcomes(prepared, matrices, holds, exit_at, cost)
+    exit_t_by_hold = np.array([outcomes[h][0] for h in holds])  # (持有期数, 候选数)
+    return_by_hold = np.array([outcomes[h][1] for h in holds])
+
+    growth, open_, close = matrices["growth"], matrices["open"], matrices["close"]
+    n_slots = int(slots.max())
+    usable = np.arange(n_slots)[None, :] < slots[:, None]
+
+    # 每个仓位：股票下标（-1 为空）、卖出日、卖出所得、买入成本、按 growth 折算的市值基数
+    slot_code = np.full((n_configs, n_slots), -1)
+    slot_exit = np.zeros((n_configs, n_slots), dtype=np.int64)
+    slot_proceeds = np.zeros((n_configs, n_slots))
+    slot_cost = np.zeros((n_configs, n_slots))
+    slot_base = np.zeros((n_configs, n_slots))
+    cash = capital.copy()
+
+    stats = {name: np.zeros(n_configs, dtype=np.int64) for name in ("trades", "wins", "skipped_full", "unfillable")}
+    occupied_days = np.zeros(n_configs)
+
+    first_t = int(prepared["t"][0]) if len(prepared["t"]) else len(matrices["dates"])
+    sim_dates = np.arange(first_t, len(matrices["dates"]))
+    equity = np.zeros((len(sim_dates), n_configs))
+    day_bounds = np.searchsorted(prepared["t"], np.r_[sim_dates, len(matrices["dates"])])
+
+    def realize(d: int):
+        done = (slot_code >= 0) & (slot_exit == d)
+        if not done.any():
+            return
+        proceeds = np.where(done, slot_proceeds, 0.0)
+        cash[:] += proceeds.sum(axis=1)
+        stats["wins"] += (done & (slot_proceeds > slot_cost)).sum(axis=1)
+        slot_code[done] = -1
+
+    for i, d in enumerate(sim_dates):
+        if exit_at == "open":
+            realize(d)
+
+        lo, hi = day_bounds[i], day_bounds[i + 1]
+        if hi > lo:
+            j = prepared["j"][lo:hi]
+            held = (slot_code[:, :, None] == j[None, None, :]).any(axis=1)
+            empty = usable & (slot_code < 0)
+            n_free = empty.sum(axis=1)
+            alloc = cash / np.maximum(n_free, 1)
+            entry_price = open_[d, j]
+            wanted = (prepared["strategy_count"][lo:hi][None, :] >= min_count[:, None]) & ~held
+            with np.errstate(invalid="ignore"):
+                affordable = entry_price[None, :] * LOT_SIZE <= alloc[:, None]
+            fillable = prepared["fillable"][lo:hi][None, :]
+            stats["unfillable"] += (wanted & ~fillable & (n_free > 0)[:, None]).sum(axis=1)
+            eligible = wanted & fillable & affordable
+
+            order = _priority_orders(prepared, lo, hi)[priority_idx]  # (组合数, 当天候选数)
+            eligible_sorted = np.take_along_axis(eligible, order, axis=1)
+            rank = np.cumsum(eligible_sorted, axis=1) - 1
+            chosen_sorted = eligible_sorted & (rank < n_free[:, None])
+            stats["skipped_full"] += (eligible_sorted & ~chosen_sorted).sum(axis=1)
+
+            ci, pos = np.nonzero(chosen_sorted)
+            if len(ci):
+                k = order[ci, pos]
+                cand = lo + k
+                # 第 r 个入选的候选放进该组合第 r 个空仓位
+                empty_rank = np.cumsum(empty, axis=1) - 1
+                slot_of_rank = np.full((n_configs, n_slots), -1)
+                ec, es = np.nonzero(empty)
+                slot_of_rank[ec, empty_rank[ec, es]] = es
+                si = slot_of_rank[ci, rank[ci, pos]]
+
+                price = entry_price[k]
+                shares = np.floor(alloc[ci] / (price * LOT_SIZE)) * LOT_SIZE
+                spent = shares * price
+                np.subtract.at(cash, ci, spent)
+                h = hold_idx[ci]
+                slot_code[ci, si] = j[k]
+                slot_exit[ci, si] = exit_t_by_hold[h, cand]
+                slot_proceeds[ci, si] = spent * (1 + return_by_hold[h, cand])
+                slot_cost[ci, si] = spent
+                slot_base[ci, si] = shares * close[d, j[k]] * np.exp(-growth[d, j[k]])
+                np.add.at(stats["trades"], ci, 1)
+
+        if exit_at == "close":
+            realize(d)
+
+        holding = slot_code >= 0
+        occupied_days += holding.sum(axis=1) / slots
+        market = np.where(holding, slot_base * np.exp(growth[d, np.maximum(slot_code, 0)]), 0.0)
+        equity[i] = cash + market.sum(axis=1)
+
+    curve = pd.DataFrame(equity / capital, index=pd.to_datetime(matrices["dates"][sim_dates]))
+    table = pd.DataFrame(configs)
+    for name, values in stats.items():
+        table[name] = values
+    table["hit_rate"] = (table["wins"] / table["trades"].where(table["trades"] > 0)).round(4)
+    table["still_holding"] = (slot_code >= 0).sum(axis=1)
+    table["utilization"] = (occupied_days / max(len(sim_dates), 1)).round(4)
+    table["total_return"] = (curve.iloc[-1].to_numpy() - 1).round(4) if len(curve) else 0.0
+    table["max_drawdown"] = [round(max_drawdown(curve[c]), 4) for c in curve.columns]
+    return table, curve
+
+
+def run_portfolio(
+    candidates: pd.DataFrame,
+    grid: Dict[str, list],
+    exit_at: str = "close",
+    cost: float = DEFAULT_COST,
+    matrices: Optional[dict] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    展开参数网格并模拟全部组合
+
+    Returns:
+        (按累计收益降序的汇总表, 资金曲线表)
+    """
+    configs = expand_grid(grid, PORTFOLIO_DEFAULTS)
+    if candidates.empty:
+        raise ValueError("没有候选信号")
+    if matrices is None:
+        matrices = load_matrices(candidates, max(int(c["hold"]) for c in configs))
+    prepared = prepare_candidates(candidates, matrices)
+
+    started = time.perf_counter()
+    table, curve = simulate_portfolios(configs, prepared, matrices, exit_at, cost)
+    logger.info(
+        f"✅ {len(configs)} 组参数 × {len(curve)} 个交易日组合模拟完成（候选 {len(prepared['t'])} 条），"
+        f"耗时 {time.perf_counter() - started:.2f}s"
+    )
+    return table.sort_values("total_return", ascending=False, kind="stable"), curve
+
+
+if __name__ == "__main__":
+    from batch_screen import BATCH_EVALUATORS
+
+    parser = argparse.ArgumentParser(description="带仓位上限的组合回测")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--strategies", nargs="+", help="用批量选股的命中作为候选，all 表示全部策略")
+    source.add_argument("--confirmed", action="store_true", help="用 confirmed_stocks 文件里的实盘候选")
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--grid", nargs="*", default=[], help="参数网格，如 slots=3,5 priority=score,strategy_count")
+    parser.add_argument("--exit-at", default="close", choices=["open", "close"])
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument("--output", default=None, help="结果 CSV 路径，默认 portfolio_results/portfolio_<起>_<止>.csv")
+    args = parser.parse_args()
+
+    if args.confirmed:
+        candidates = confirmed_candidates(args.start, args.end)
+    else:
+        names = list(BATCH_EVALUATORS) if args.strategies == ["all"] else args.strategies
+        candidates = strategy_candidates(names, args.start, args.end)
+
+    table, curve = run_portfolio(candidates, parse_grid(args.grid), args.exit_at, args.cost)
+    output = args.output or os.path.join(RESULT_DIR, f"portfolio_{args.start}_{args.end}.csv")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    table.to_csv(output, index=False, encoding="utf-8-sig")
+    curve.to_csv(output.replace(".csv", "_equity.csv"), encoding="utf-8-sig")
+    logger.info(f"✅ 前10组参数:\n{table.head(10).to_string(index=False)}")
+    logger.info(f"✅ 结果已保存: {output}")
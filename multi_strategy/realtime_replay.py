@@ -0,0 +1,123 @@
+"""
+盘中实时确认的离线回放
+
+把 realtime_ticks 里录制好的一个交易日，按录制时的轮次（每轮 record_realtime_ticks 写入的同一个 timestamp）
+逐轮推进时钟，每一轮对候选股票调用未经修改的 confirm_buy_with_realtime，记录每一次确认买入的时刻和价格。
+时钟、tick 查询、实时行情都由 tick_source.use_replay 切换到内存中的 TickReplay，不访问实时接口；
+日线相关的查询（昨收、平台突破价）只在回放期间按 (股票, 交易日) 缓存（cached_daily_lookups），每只股票只查一次。
+
+默认尽快回放（一整天只需几秒），--speed N 则按录制时间间隔的 1/N 等待，用于观察盘中过程。
+
+用法：
+    python realtime_replay.py --trade-date 20250715
+    python realtime_replay.py --trade-date 20250715 --speed 60
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import filter_with_realtime
+import pandas as pd
+from filter_with_realtime import confirm_buy_with_realtime
+from tick_source import TickReplay, use_replay
+
+from utils.logger import logger
+
+RESULT_DIR = "replay_results"
+
+# 回放期间按参数缓存的日线查询（一天内结果不变）；实盘不缓存，T-1 数据入库前返回的 None 不会被留住
+CACHED_LOOKUPS = ["get_yesterday_close", "get_platform_breakout_price"]
+
+
+@contextmanager
+def cached_daily_lookups():
+    """在 with 块内把 filter_with_realtime 的日线查询换成带缓存的版本，退出时还原"""
+    originals = {name: getattr(filter_with_realtime, name) for name in CACHED_LOOKUPS}
+    try:
+        for name, func in originals.items():
+            setattr(filter_with_realtime, name, lru_cache(maxsize=None)(func))
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(filter_with_realtime, name, func)
+
+
+def replay_day(
+    trade_date: str,
+    ts_codes: Optional[List[str]] = None,
+    speed: Optional[float] = None,
+    replay: Optional[TickReplay] = None,
+) -> pd.DataFrame:
+    """
+    回放一个交易日的实时确认
+
+    Args:
+        ts_codes: 候选股票，默认取当天 confirmed_stocks 文件里的股票
+        speed: 回放倍速，None 表示不等待
+        replay: 已加载的回放数据，默认从 realtime_ticks 读取
+
+    Returns:
+        每次确认买入一行：timestamp、ts_code、price、first（是否该股票当天第一次确认）
+    """
+    if ts_codes is None:
+        df = pd.read_csv(f"confirmed_stocks/confirmed_stocks_{trade_date}.csv", dtype={"股票代码": str})
+        ts_codes = df["股票代码"].tolist()
+    if replay is None:
+        replay = TickReplay.load(trade_date, ts_codes)
+    if not len(replay.times):
+        logger.warning(f"{trade_date} 没有录制的 tick")
+        return pd.DataFrame(columns=["timestamp", "ts_code", "price", "first"])
+
+    start = time.perf_counter()
+    decisions = []
+    bought = set()
+    # confirm_buy_with_realtime 每只股票每轮都会写 INFO 日志，回放期间只保留警告以上，避免灌满线上日志文件
+    level = logger.level
+    logger.setLevel(max(level, logging.WARNING))
+    try:
+        with use_replay(replay), cached_daily_lookups():
+            for i, moment in enumerate(replay.times):
+                round_start = time.perf_counter()
+                replay.advance_to(moment)
+                for ts_code in ts_codes:
+                    if confirm_buy_with_realtime(ts_code, trade_date):
+                        price = replay.quote(ts_code)["当前"]
+                        first = ts_code not in bought
+                        decisions.append(
+                            {"timestamp": replay.clock, "ts_code": ts_code, "price": price, "first": first}
+                        )
+                        bought.add(ts_code)
+
+                if speed and i + 1 < len(replay.times):
+                    gap = (replay.times[i + 1] - moment) / pd.Timedelta(seconds=1) / speed
+                    time.sleep(max(0.0, gap - (time.perf_counter() - round_start)))
+    finally:
+        logger.setLevel(level)
+
+    logger.info(
+        f"✅ {trade_date} 回放完成: {len(replay.times)} 轮 × {len(ts_codes)} 只，"
+        f"确认买入 {len(decisions)} 次（{len(bought)} 只），耗时 {time.perf_counter() - start:.2f}s"
+    )
+    return pd.DataFrame(decisions, columns=["timestamp", "ts_code", "price", "first"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="盘中实时确认的离线回放")
+    parser.add_argument("--trade-date", required=True, help="交易日 YYYYMMDD")
+    parser.add_argument("--codes", nargs="*", default=None, help="候选股票，默认取当天 confirmed_stocks 文件")
+    parser.add_argument("--speed", type=float, default=None, help="回放倍速，默认不等待")
+    parser.add_argument("--output", default=None, help="结果 CSV 路径，默认 replay_results/replay_<交易日>.csv")
+    args = parser.parse_args()
+
+    decisions = replay_day(args.trade_date, args.codes, args.speed)
+    output = args.output or os.path.join(RESULT_DIR, f"replay_{args.trade_date}.csv")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    decisions.to_csv(output, index=False, encoding="utf-8-sig")
+    logger.info(f"✅ 回放结果已保存: {output}")
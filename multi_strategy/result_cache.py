@@ -0,0 +1,116 @@
+"""
+策略结果缓存
+
+run_by_time 可能在同一天被多次触发，而 stock_daily 在两次运行之间往往没有变化。
+这里把策略结果按 (策略名, 参数, trade_date, 数据指纹) 存成 pickle 文件：
+    • 数据指纹 = 相关表在回看窗口内的行数和 MAX(update_time)，下载新数据后自动变化，旧结果随之失效
+    • 参数变化（例如调整规格或股票池）同样得到新的键
+同一策略同一交易日只保留最新的一份结果。
+"""
+import glob
+import hashlib
+import json
+import os
+import pickle
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+from clients import get_engine
+
+from utils.logger import logger
+
+CACHE_DIR = "cache/strategy_results"
+
+# 指纹只统计 trade_date 之前这么多自然日内的数据（与并行快照的默认窗口一致），更早的修订不影响策略结果
+FINGERPRINT_LOOKBACK_DAYS = 400
+
+
+def data_fingerprint(trade_date: str, lookback_days: int = FINGERPRINT_LOOKBACK_DAYS) -> str:
+    """
+    策略输入数据的版本号：stock_daily 窗口内的行数、最新交易日、MAX(update_time)，以及 stock_st 的行数和更新时间
+    """
+    trade_date_obj = datetime.strptime(trade_date.replace("-", ""), "%Y%m%d")
+    since = (trade_date_obj - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    sql = """
+    SELECT COUNT(*) AS row_count, MAX(trade_date) AS last_date, MAX(update_time) AS last_update
+    FROM stock_daily
+    WHERE trade_date >= %(since)s AND trade_date <= %(trade_date)s
+    """
+    daily = pd.read_sql(sql, get_engine(), params={"since": since, "trade_date": trade_date_obj.strftime("%Y-%m-%d")})
+    parts = [str(v) for v in daily.iloc[0].tolist()]
+
+    try:
+        st = pd.read_sql("SELECT COUNT(*) AS row_count, MAX(update_time) AS last_update FROM stock_st", get_engine())
+        parts += [str(v) for v in st.iloc[0].tolist()]
+    except Exception as e:
+        logger.warning(f"读取 stock_st 指纹失败，忽略: {e}")
+
+    return "|".join(parts)
+
+
+def cache_key(strategy_name: str, trade_date: str, fingerprint: str, params: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {"strategy": strategy_name, "trade_date": trade_date, "fingerprint": fingerprint, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_path(strategy_name: str, trade_date: str, key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{strategy_name}_{trade_date}_{key}.pkl")
+
+
+def load_result(
+    strategy_name: str, trade_date: str, key: str, cache_dir: str = CACHE_DIR
+) -> Optional[pd.DataFrame]:
+    """读取缓存结果，不存在或损坏时返回 None"""
+    path = _cache_path(strategy_name, trade_date, key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.warning(f"缓存文件损坏，忽略: {path}: {e}")
+        return None
+
+
+def save_result(strategy_name: str, trade_date: str, key: str, df: pd.DataFrame, cache_dir: str = CACHE_DIR):
+    """保存结果，并删除同一策略同一交易日的旧版本"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(strategy_name, trade_date, key, cache_dir)
+    for stale in glob.glob(_cache_path(strategy_name, trade_date, "*", cache_dir)):
+        if stale != path:
+            os.remove(stale)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def run_cached(
+    strategy_func: Callable[[str], pd.DataFrame],
+    trade_date: str,
+    fingerprint: str,
+    params: Optional[dict] = None,
+    cache_dir: str = CACHE_DIR,
+) -> Tuple[pd.DataFrame, bool]:
+    """
+    命中缓存时直接返回，否则执行策略并写入缓存；策略抛出异常时原样抛出，不写缓存
+
+    Returns:
+        (结果, 是否命中缓存)
+    """
+    name = strategy_func.__name__
+    key = cache_key(name, trade_date, fingerprint, params)
+    cached = load_result(name, trade_date, key, cache_dir)
+    if cached is not None:
+        logger.info(f"【{name}】使用缓存结果（{trade_date}，数据未变化）")
+        return cached, True
+
+    df = strategy_func(trade_date)
+    save_result(name, trade_date, key, df, cache_dir)
+    return df, False
@@ -0,0 +1,132 @@
+"""
+向量化打分
+
+每条规则是一张分档表：对某个取值（列名或 DataFrame.eval 表达式）按阈值分档给分，
+例如量比 >2 给35分、>1.5 给25分、>1.2 给15分、>1.0 给8分。
+所有候选股一次性用 np.searchsorted 定档，返回每条规则命中的档位，
+总分、分项得分和“得分明细”文字都由档位查表得到，文字只对最终入选的股票生成。
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def rule(name: str, value: str, brackets: Sequence[Tuple[float, float, str]], op: str = ">") -> dict:
+    """
+    定义一条分档规则
+
+    Args:
+        name: 规则名
+        value: 取值的列名或表达式
+        brackets: [(阈值, 分数, 明细文字), ...]，顺序不限
+        op: ">" / ">=" 取满足条件的最高阈值档，"<" / "<=" 取满足条件的最低阈值档
+    """
+    if op not in (">", ">=", "<", "<="):
+        raise ValueError(f"不支持的比较方式: {op}")
+    brackets = sorted(brackets, key=lambda b: b[0])
+    return {
+        "name": name,
+        "value": value,
+        "op": op,
+        "thresholds": np.array([b[0] for b in brackets], dtype=np.float64),
+        "points": np.array([b[1] for b in brackets], dtype=np.float64),
+        "labels": [b[2] for b in brackets],
+    }
+
+
+def bracket_level(values: np.ndarray, thresholds: np.ndarray, op: str) -> np.ndarray:
+    """
+    每个取值命中的档位下标（对应升序阈值），不满足任何一档为 -1，NaN 不得分
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if op == ">":
+        level = np.searchsorted(thresholds, values, side="left") - 1
+    elif op == ">=":
+        level = np.searchsorted(thresholds, values, side="right") - 1
+    elif op == "<":
+        level = np.searchsorted(thresholds, values, side="right")
+    else:
+        level = np.searchsorted(thresholds, values, side="left")
+    level[level >= len(thresholds)] = -1
+    level[np.isnan(values)] = -1
+    return level
+
+
+def _rule_values(df: pd.DataFrame, value: str) -> np.ndarray:
+    if value in df.columns:
+        return df[value].to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.asarray(df.eval(value), dtype=np.float64)
+
+
+def evaluate_rules(df: pd.DataFrame, rules: List[dict]) -> pd.DataFrame:
+    """对 df 的每一行求每条规则的档位，返回以规则名为列的整数表（-1 表示未得分）"""
+    levels = {r["name"]: bracket_level(_rule_values(df, r["value"]), r["thresholds"], r["op"]) for r in rules}
+    return pd.DataFrame(levels, index=df.index)
+
+
+def points_table(levels: pd.DataFrame, rules: List[dict]) -> pd.DataFrame:
+    """档位换算成分数"""
+    points = {}
+    for r in rules:
+        level = levels[r["name"]].to_numpy()
+        points[r["name"]] = np.where(level >= 0, r["points"][np.maximum(level, 0)], 0.0)
+    return pd.DataFrame(points, index=levels.index)
+
+
+def score(df: pd.DataFrame, rules: List[dict]) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    按规则表给 df 的每一行打分
+
+    Returns:
+        (total, levels)：总分数组，以及各规则档位表（可再传给 points_table / format_details）
+    """
+    levels = evaluate_rules(df, rules)
+    return points_table(levels, rules).sum(axis=1).to_numpy(), levels
+
+
+def details(levels: pd.DataFrame, rules: List[dict]) -> List[Dict[str, float]]:
+    """每一行的得分明细 {明细文字: 分数}，按规则顺序排列"""
+    rows = [{} for _ in range(len(levels))]
+    for r in rules:
+        level = levels[r["name"]].to_numpy()
+        for i in np.flatnonzero(level >= 0):
+            points = r["points"][level[i]]
+            rows[i][r["labels"][level[i]]] = int(points) if float(points).is_integer() else float(points)
+    return rows
+
+
+def format_details(levels: pd.DataFrame, rules: List[dict], as_list: bool = False) -> List[str]:
+    """得分明细转成字符串；as_list=True 时只保留明细文字，格式同 str(list)"""
+    return [str(list(d)) if as_list else str(d) for d in details(levels, rules)]
+
+
+# ---------------------------------------------------------------------------
+# 涨停连板预测的评分与风险规则
+# ---------------------------------------------------------------------------
+
+LIMIT_UP_SCORE_RULES = [
+    # 涨停强度（35分）
+    rule(
+        "vol_ratio",
+        "vol_ratio",
+        [(2.0, 35, "放量2倍以上"), (1.5, 25, "放量1.5倍以上"), (1.2, 15, "放量1.2倍以上"), (1.0, 8, "放量正常")],
+    ),
+    # 技术面（30分）
+    rule("above_ma5", "close - ma5", [(0, 10, "突破MA5")]),
+    rule("above_ma10", "close - ma10", [(0, 10, "突破MA10")]),
+    rule("above_ma20", "close - ma20", [(0, 10, "突破MA20")]),
+    # 连续涨停天数（20分）
+    rule("streak", "limit_up_streak", [(3, 20, "连续3板以上"), (2, 15, "连续2板"), (1, 10, "首板")], op=">="),
+    # 市场环境（15分）
+    rule("recent_change", "pct_chg_mean_5", [(1.0, 15, "市场强势"), (0.5, 10, "市场偏强"), (0, 5, "市场平稳")]),
+]
+
+LIMIT_UP_RISK_RULES = [
+    rule("one_word", "open - up_limit * 0.98", [(0, 20, "一字板风险")], op=">="),
+    rule("high_open", "open_pct_chg", [(7, 15, "高开幅度过大"), (5, 10, "高开幅度较大")]),
+    rule("amplitude", "amplitude", [(6, 10, "振幅过大")]),
+    rule("low_volume", "vol_ratio", [(0.8, 15, "成交量过小")], op="<"),
+    rule("high_volume", "vol_ratio", [(4, 10, "成交量过大")]),
+]
@@ -0,0 +1,287 @@
+"""
+压缩位图存储的信号矩阵缓存
+
+每次回测、参数扫描都要重新选股，再把命中长表转成 (交易日 × 股票) 的布尔矩阵。
+这里把每个 (策略, 参数) 的信号矩阵按行用 np.packbits 压成位图，存在 signal_cache/<策略>_<哈希>.npz：
+    dates  有命中的交易日（策略的 trade_date，与 screen_range、confirmed_stocks 的含义相同）
+    codes  有过命中的股票
+    bits   uint8 位图，形状 (len(dates), ceil(len(codes) / 8))
+    meta   策略、参数、代码版本和已覆盖的日期区间
+请求的区间已被覆盖时直接切片返回；区间向后延伸时只对新的交易日选股再拼接（已覆盖的区间只记到最后一个已入库的交易日）；
+代码版本（backtest_store.code_version）变化时重建。
+params 为 None 时用 batch_screen 的线上逻辑，否则用 param_sweep.SWEEP_TARGETS 按参数选股。
+
+多个策略的位图对齐到同一组 (日期, 股票) 后，交集、并集都是逐字节的位运算，
+“被至少 k 个策略同时选中”（confirmed_stocks 里 策略数量 >= k）按位解包后逐策略累加计数即可。
+
+用法：
+    python signal_cache.py --strategies strategy_limit_up_continuation_prediction strategy_ma_convergence \\
+        --start 20230101 --end 20250630 --min-count 2
+    python signal_cache.py --strategies all --start 20230101 --end 20250630 --min-count 2 --hold 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from backtest import DEFAULT_COST, backtest
+from backtest_store import CODE_MODULES, code_version, last_trade_date, params_key
+from batch_screen import BATCH_EVALUATORS, load_window, screen_range
+from limit_price import load_st_periods
+
+from utils.logger import logger
+
+CACHE_DIR = "signal_cache"
+
+
+# ---------------------------------------------------------------------------
+# 位图
+# ---------------------------------------------------------------------------
+
+
+def pack_signals(hits: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """命中长表（trade_date、ts_code）压成位图"""
+    if hits.empty:
+        return empty_signals()
+    trade_dates = pd.to_datetime(hits["trade_date"]).to_numpy().astype("datetime64[D]")
+    ts_codes = hits["ts_code"].to_numpy().astype(str)
+    dates, t = np.unique(trade_dates, return_inverse=True)
+    codes, j = np.unique(ts_codes, return_inverse=True)
+    mask = np.zeros((len(dates), len(codes)), dtype=bool)
+    mask[t, j] = True
+    return {"dates": dates, "codes": codes, "bits": np.packbits(mask, axis=1)}
+
+
+def empty_signals() -> Dict[str, np.ndarray]:
+    return {
+        "dates": np.array([], dtype="datetime64[D]"),
+        "codes": np.array([], dtype="<U1"),
+        "bits": np.zeros((0, 0), dtype=np.uint8),
+    }
+
+
+def unpack_signals(signals: Dict[str, np.ndarray]) -> np.ndarray:
+    """位图还原成布尔矩阵 (len(dates), len(codes))"""
+    return np.unpackbits(signals["bits"], axis=1, count=len(signals["codes"])).astype(bool)
+
+
+def to_frame(signals: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """位图转回命中长表（trade_date、ts_code），可直接交给 backtest.backtest"""
+    t, j = np.nonzero(unpack_signals(signals))
+    return pd.DataFrame({"trade_date": pd.to_datetime(signals["dates"][t]), "ts_code": signals["codes"][j]})
+
+
+def slice_dates(signals: Dict[str, np.ndarray], start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+    """截取 [start_date, end_date] 内的交易日，股票列不变"""
+    dates = signals["dates"]
+    first = np.searchsorted(dates, np.datetime64(pd.to_datetime(start_date), "D"))
+    last = np.searchsorted(dates, np.datetime64(pd.to_datetime(end_date), "D"), side="right")
+    return {"dates": dates[first:last], "codes": signals["codes"], "bits": signals["bits"][first:last]}
+
+
+def _reindex(signals: Dict[str, np.ndarray], dates: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """把位图放到更大的 (dates, codes) 网格上（dates、codes 须包含原有的日期和股票），返回新的位图"""
+    if np.array_equal(signals["dates"], dates) and np.array_equal(signals["codes"], codes):
+        return signals["bits"]
+    mask = np.zeros((len(dates), len(codes)), dtype=bool)
+    t = np.searchsorted(dates, signals["dates"])
+    j = np.searchsorted(codes, signals["codes"])
+    mask[np.ix_(t, j)] = unpack_signals(signals)
+    return np.packbits(mask, axis=1)
+
+
+def align(signal_list: List[Dict[str, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """
+    把多个位图对齐到日期、股票的并集上
+
+    Returns:
+        (dates, codes, 各自对齐后的位图)
+    """
+    dates = reduce(np.union1d, [s["dates"] for s in signal_list]).astype("datetime64[D]")
+    codes = reduce(np.union1d, [s["codes"] for s in signal_list]).astype(str)
+    return dates, codes, [_reindex(s, dates, codes) for s in signal_list]
+
+
+def combine(signal_list: List[Dict[str, np.ndarray]], how: str = "and") -> Dict[str, np.ndarray]:
+    """多个位图逐位求交集（and）或并集（or）"""
+    ops = {"and": np.bitwise_and, "or": np.bitwise_or}
+    if how not in ops:
+        raise ValueError(f"how 只能是 {list(ops)}")
+    dates, codes, bits = align(signal_list)
+    return {"dates": dates, "codes": codes, "bits": reduce(ops[how], bits)}
+
+
+def hit_counts(signal_list: List[Dict[str, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    每个 (交易日, 股票) 被多少个策略选中，即 confirmed_stocks 里的 策略数量
+
+    Returns:
+        (dates, codes, uint8 计数矩阵)
+    """
+    dates, codes, bits = align(signal_list)
+    counts = np.zeros((len(dates), len(codes)), dtype=np.uint8)
+    for b in bits:
+        counts += np.unpackbits(b, axis=1, count=len(codes))
+    return dates, codes, counts
+
+
+def at_least(signal_list: List[Dict[str, np.ndarray]], k: int) -> Dict[str, np.ndarray]:
+    """被至少 k 个策略同时选中的位图"""
+    dates, codes, counts = hit_counts(signal_list)
+    return {"dates": dates, "codes": codes, "bits": np.packbits(counts >= k, axis=1)}
+
+
+# ---------------------------------------------------------------------------
+# 缓存
+# ---------------------------------------------------------------------------
+
+
+def _screen_params(strategy_name: str, params: dict, start_date: str, end_date: str) -> pd.DataFrame:
+    """按参数选股，与 screen_range 一样返回 trade_date 为策略选股日的命中长表"""
+    from param_sweep import SWEEP_TARGETS
+
+    target = SWEEP_TARGETS[strategy_name]
+    evaluator = BATCH_EVALUATORS[strategy_name]
+    panel = load_window(evaluator, start_date, end_date)
+    if panel.empty:
+        return pd.DataFrame(columns=["trade_date", "ts_code"])
+    candidates = target["prepare"](panel, load_st_periods())
+    selected = target["select"](candidates, {**target["defaults"], **params})
+
+    # 数据日期往后挪 lag 个交易日，得到选股日
+    dates = np.sort(panel["trade_date"].unique())
+    t = np.searchsorted(dates, candidates["trade_date"][selected]) + evaluator["lag"]
+    valid = t < len(dates)
+    hits = pd.DataFrame({"trade_date": dates[t[valid]], "ts_code": candidates["ts_code"][selected][valid]})
+    in_range = (hits["trade_date"] >= pd.to_datetime(start_date)) & (hits["trade_date"] <= pd.to_datetime(end_date))
+    return hits[in_range]
+
+
+def _screen(strategy_name: str, params: Optional[dict], start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+    if params is None:
+        hits = screen_range(strategy_name, start_date, end_date)
+    else:
+        hits = _screen_params(strategy_name, params, start_date, end_date)
+    return pack_signals(hits)
+
+
+def load_cached(path: str) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+    """读取一份缓存，不存在或损坏时返回 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            signals = {"dates": f["dates"], "codes": f["codes"], "bits": f["bits"]}
+            meta = json.loads(str(f["meta"]))
+        return signals, meta
+    except Exception as e:
+        logger.warning(f"信号缓存损坏，忽略: {path}: {e}")
+        return None
+
+
+def save_cached(path: str, signals: Dict[str, np.ndarray], meta: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez_compressed(tmp_path, meta=np.array(json.dumps(meta, ensure_ascii=False)), **signals)
+    os.replace(tmp_path, path)
+
+
+def get_signals(
+    strategy_name: str,
+    start_date: str,
+    end_date: str,
+    params: Optional[dict] = None,
+    cache_dir: str = CACHE_DIR,
+    rebuild: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    取策略在 [start_date, end_date] 上的信号位图，优先用缓存
+
+    Args:
+        params: None 表示线上参数（batch_screen），否则为 param_sweep 的参数（未给出的取默认值）
+        rebuild: 忽略已有缓存重新选股
+    """
+    if strategy_name not in BATCH_EVALUATORS:
+        raise ValueError(f"策略 {strategy_name} 没有批量求值器，可选: {list(BATCH_EVALUATORS)}")
+    modules = CODE_MODULES if params is None else CODE_MODULES + ["param_sweep"]
+    version = code_version(modules)
+    path = os.path.join(cache_dir, f"{strategy_name}_{params_key(strategy_name, params or {})}.npz")
+
+    cached = None if rebuild else load_cached(path)
+    if cached is not None and cached[1]["code_version"] != version:
+        logger.info(f"【{strategy_name}】策略代码已变化，重建信号缓存")
+        cached = None
+
+    # 已覆盖的区间只记到最后一个已入库的交易日，之后入库的交易日下次还会补上
+    covered = last_trade_date(end_date)
+    if covered is None:
+        raise ValueError(f"{end_date} 之前没有已入库的交易日")
+
+    started = time.perf_counter()
+    if cached is None or start_date < cached[1]["start_date"]:
+        cover_start, cover_end = start_date, covered if cached is None else max(covered, cached[1]["end_date"])
+        signals = _screen(strategy_name, params, cover_start, cover_end)
+    elif covered > cached[1]["end_date"]:
+        # 只对缓存之后的交易日选股再拼接
+        cover_start, cover_end = cached[1]["start_date"], covered
+        next_day = (datetime.strptime(cached[1]["end_date"], "%Y%m%d") + timedelta(days=1)).strftime("%Y%m%d")
+        fresh = _screen(strategy_name, params, next_day, covered)
+        dates, codes, (old_bits, new_bits) = align([cached[0], fresh])
+        signals = {"dates": dates, "codes": codes, "bits": old_bits | new_bits}
+    else:
+        return slice_dates(cached[0], start_date, end_date)
+
+    meta = {
+        "strategy": strategy_name,
+        "params": params,
+        "code_version": version,
+        "start_date": cover_start,
+        "end_date": cover_end,
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    save_cached(path, signals, meta)
+    logger.info(
+        f"【{strategy_name}】信号缓存更新到 {cover_start} ~ {cover_end}：{len(signals['dates'])} 个交易日 × "
+        f"{len(signals['codes'])} 只，{signals['bits'].nbytes / 1024:.1f} KB，耗时 {time.perf_counter() - started:.2f}s"
+    )
+    return slice_dates(signals, start_date, end_date)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="压缩位图存储的信号矩阵缓存")
+    parser.add_argument("--strategies", nargs="+", required=True, help="策略名，all 表示全部有批量求值器的策略")
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--min-count", type=int, default=1, help="至少被多少个策略同时选中")
+    parser.add_argument("--hold", type=int, default=None, help="给出时对组合信号回测，持有交易日数")
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有缓存重新选股")
+    args = parser.parse_args()
+
+    names = list(BATCH_EVALUATORS) if args.strategies == ["all"] else args.strategies
+    signal_list = [
+        get_signals(name, args.start, args.end, cache_dir=args.cache_dir, rebuild=args.rebuild) for name in names
+    ]
+
+    started = time.perf_counter()
+    dates, codes, counts = hit_counts(signal_list)
+    per_day = pd.DataFrame({f">={k}": (counts >= k).sum(axis=1) for k in range(1, len(names) + 1)})
+    per_day.insert(0, "trade_date", pd.to_datetime(dates))
+    logger.info(f"✅ {len(names)} 个策略对齐计数耗时 {time.perf_counter() - started:.3f}s")
+    print(per_day.sum(numeric_only=True).to_string())
+
+    if args.hold:
+        combined = at_least(signal_list, args.min_count)
+        # 组合里有用当日数据选股的策略时，统一在选股日的下一个交易日开盘买入，避免用到未来数据
+        lag = min(BATCH_EVALUATORS[name]["lag"] for name in names)
+        _, summary = backtest(to_frame(combined), entry_offset=1 - lag, hold=args.hold, cost=args.cost)
+        logger.info(f"📈 被至少 {args.min_count} 个策略选中: {json.dumps(summary, ensure_ascii=False)}")
@@ -0,0 +1,186 @@
+"""
+行情快照：把一段日线窗口一次性读入内存（紧凑格式），供多个策略共享查询
+
+快照可以放进共享内存（to_shared），子进程用 attach 按名字映射同一块内存，不复制数据。
+策略不直接访问快照，而是通过 data_source 的查询函数；data_source.use_snapshot 生效期间，
+这些查询从快照里取数而不是查 MySQL。
+"""
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from compact_panel import compact_daily, decode_symbols, encode_symbols, load_compact_daily, restore_daily
+from universe import board_mask, day_mask, has_day_filters, predicate_columns
+
+
+def _to_date_int(date) -> int:
+    return int(pd.to_datetime(date).strftime("%Y%m%d"))
+
+
+def share_arrays(arrays: Dict[str, np.ndarray]):
+    """
+    把一组数组复制进共享内存（不支持 object 类型）
+
+    Returns:
+        (handle, shared, shms)：可 pickle 的句柄、指向共享内存的同名数组、需要由创建方 close/unlink 的共享内存
+    """
+    handle = {}
+    shared_arrays = {}
+    shms = []
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        shared = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        shared[:] = arr
+        shared_arrays[name] = shared
+        shms.append(shm)
+        handle[name] = (shm.name, arr.dtype.str, arr.shape)
+    return handle, shared_arrays, shms
+
+
+def attach_arrays(handle: dict):
+    """按 share_arrays 的句柄映射共享内存，返回 (只读数组, 共享内存列表)"""
+    arrays = {}
+    shms = []
+    for name, (shm_name, dtype, shape) in handle.items():
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        except TypeError:
+            # Python 3.13 以前没有 track 参数；进程池子进程与创建方共用 resource_tracker，重复登记无副作用
+            shm = shared_memory.SharedMemory(name=shm_name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        arrays[name] = arr
+        shms.append(shm)
+    return arrays, shms
+
+
+def release_shared(shms: List[shared_memory.SharedMemory], unlink: bool = False):
+    """释放共享内存映射，创建方传 unlink=True 删除共享内存"""
+    for shm in shms:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+class DailySnapshot:
+    """
+    紧凑日线快照，列数组按 ts_code、trade_date 升序排列
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], shms: Optional[List[shared_memory.SharedMemory]] = None):
+        self.columns = columns
+        self.dates = np.unique(columns["trade_date"])
+        self._shms = shms or []
+
+    @classmethod
+    def load(cls, start_date: str, end_date: str, ts_codes: Optional[List[str]] = None) -> "DailySnapshot":
+        """从 MySQL 读取区间数据建立快照"""
+        df = load_compact_daily(start_date, end_date, ts_codes=ts_codes)
+        return cls({col: df[col].to_numpy() for col in df.columns})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DailySnapshot":
+        """从常规日线长表建立快照（研究/回测时复用已加载的数据）"""
+        df = compact_daily(df).sort_values(["ts_code", "trade_date"], kind="stable")
+        return cls({col: df[col].to_numpy() for col in df.columns})
+
+    def __len__(self):
+        return len(self.columns["trade_date"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.columns.values())
+
+    def _select(self, rows: np.ndarray, columns: Optional[List[str]]) -> pd.DataFrame:
+        names = ["ts_code", "trade_date"] + [c for c in (columns or self.columns) if c not in ("ts_code", "trade_date")]
+        return restore_daily(pd.DataFrame({name: self.columns[name][rows] for name in names}))
+
+    def _board_rows(self, universe: dict) -> np.ndarray:
+        """板块排除后保留的行（先对去重后的代码判断）"""
+        ids, inverse = np.unique(self.columns["ts_code"], return_inverse=True)
+        return board_mask(decode_symbols(ids), universe)[inverse]
+
+    def _universe_rows(self, rows: np.ndarray, universe: dict) -> np.ndarray:
+        """对某个截面日的行下标应用股票池条件，只还原判断所需的几列"""
+        if universe["exclude_boards"]:
+            rows = rows[board_mask(decode_symbols(self.columns["ts_code"][rows]), universe)]
+        if has_day_filters(universe) and len(rows):
+            predicate = self._select(rows, predicate_columns(universe))
+            rows = rows[day_mask(predicate, universe)]
+        return rows
+
+    def cross_section(
+        self, trade_date, columns: Optional[List[str]] = None, universe: Optional[dict] = None
+    ) -> pd.DataFrame:
+        """某一交易日的全市场截面，universe 为股票池条件（见 universe.make_universe）"""
+        rows = np.flatnonzero(self.columns["trade_date"] == _to_date_int(trade_date))
+        if universe is not None:
+            rows = self._universe_rows(rows, universe)
+        return self._select(rows, columns)
+
+    def history(
+        self,
+        ts_codes: Optional[List[str]] = None,
+        end_date=None,
+        start_date=None,
+        columns: Optional[List[str]] = None,
+        universe: Optional[dict] = None,
+    ) -> pd.DataFrame:
+        """
+        指定股票在区间内的历史（含首尾），ts_codes 为 None 表示全部股票
+        universe 的截面日条件以 end_date 之前（含）最近的交易日判断，通过的股票保留全部历史
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if ts_codes is not None:
+            mask &= np.isin(self.columns["ts_code"], encode_symbols(ts_codes))
+        if end_date is not None:
+            mask &= self.columns["trade_date"] <= _to_date_int(end_date)
+        if start_date is not None:
+            mask &= self.columns["trade_date"] >= _to_date_int(start_date)
+        if universe is not None:
+            if universe["exclude_boards"]:
+                mask &= self._board_rows(universe)
+            if has_day_filters(universe):
+                dates = self.dates if end_date is None else self.dates[self.dates <= _to_date_int(end_date)]
+                day_rows = np.flatnonzero(mask & (self.columns["trade_date"] == (dates[-1] if len(dates) else -1)))
+                passed = self.columns["ts_code"][self._universe_rows(day_rows, universe)]
+                mask &= np.isin(self.columns["ts_code"], passed)
+        return self._select(np.flatnonzero(mask), columns)
+
+    def trade_dates(self, start_date=None, end_date=None) -> pd.DatetimeIndex:
+        """快照内区间（含首尾）的全部交易日"""
+        dates = self.dates
+        if start_date is not None:
+            dates = dates[dates >= _to_date_int(start_date)]
+        if end_date is not None:
+            dates = dates[dates <= _to_date_int(end_date)]
+        return pd.DatetimeIndex(pd.to_datetime(dates.astype(str), format="%Y%m%d"))
+
+    def previous_trade_date(self, trade_date) -> Optional[str]:
+        """快照内早于 trade_date 的最近交易日，格式 YYYY-MM-DD"""
+        earlier = self.dates[self.dates < _to_date_int(trade_date)]
+        if len(earlier) == 0:
+            return None
+        return pd.to_datetime(str(earlier[-1]), format="%Y%m%d").strftime("%Y-%m-%d")
+
+    def to_shared(self) -> dict:
+        """
+        把各列复制进共享内存，返回可 pickle 的句柄，子进程用 attach(handle) 映射
+        返回后本对象的列也改为指向共享内存
+        """
+        handle, self.columns, shms = share_arrays(self.columns)
+        self._shms.extend(shms)
+        return handle
+
+    @classmethod
+    def attach(cls, handle: dict) -> "DailySnapshot":
+        """在子进程中按句柄映射共享内存（零拷贝、只读使用）"""
+        columns, shms = attach_arrays(handle)
+        return cls(columns, shms)
+
+    def close(self, unlink: bool = False):
+        """释放共享内存映射，创建方传 unlink=True 删除共享内存"""
+        self.columns = {}
+        release_shared(self._shms, unlink)
+        self._shms = []
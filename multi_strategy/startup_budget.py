@@ -0,0 +1,123 @@
+"""
+入口模块的启动耗时预算
+
+每个入口在全新的子进程里导入若干次，取中位数与预算比较，同时检查：
+    • 导入期间不应往 stdout 打印任何内容（导入无副作用）
+    • 不应加载该入口用不到的重依赖（例如盘后选股不应导入 requests、schedule、tushare，
+      没用到 EWM 时不应导入 numba）
+数据库引擎、Tushare 客户端、HTTP 会话统一由 clients.get_* 在第一次使用时创建，这里只测导入本身。
+结果追加到 benchmarks/startup_budget.jsonl，超出预算或检查不通过时以非零状态退出，可直接用于 CI。
+
+用法：
+    python startup_budget.py --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import logger
+
+RESULT_FILE = "benchmarks/startup_budget.jsonl"
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各入口的导入耗时预算（秒，含解释器启动后导入 numpy/pandas 的固定开销）和不允许加载的模块
+STARTUP_BUDGETS = {
+    "main": {"seconds": 1.5, "forbidden": ["requests", "schedule", "tushare", "numba"]},
+    "batch_screen": {"seconds": 1.5, "forbidden": ["requests", "schedule", "tushare", "numba"]},
+    "benchmark_indicators": {"seconds": 1.5, "forbidden": ["requests", "schedule", "tushare", "sqlalchemy", "numba"]},
+    "filter_with_realtime": {"seconds": 2.0, "forbidden": ["requests", "schedule", "tushare", "numba"]},
+    "download_by_date": {"seconds": 1.5, "forbidden": ["requests", "tushare", "numba"]},
+    "download_st": {"seconds": 1.5, "forbidden": ["requests", "tushare", "numba"]},
+}
+
+# 子进程里执行的探针：导入目标模块，把耗时和已加载的受限模块写在最后一行
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print("\\n__startup__" + json.dumps({{"seconds": seconds, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once(module: str, forbidden: List[str]) -> dict:
+    """在全新子进程中导入一次 module，返回耗时、被加载的受限模块和导入期间的 stdout 输出"""
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, forbidden=forbidden)],
+        cwd=MODULE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {"error": error[-1] if error else f"exit {completed.returncode}"}
+    output, _, probe = completed.stdout.rpartition("\n__startup__")
+    return {**json.loads(probe), "stdout": output.strip()}
+
+
+def check_entry(module: str, budget: dict, repeat: int) -> dict:
+    """导入 repeat 次，取中位数耗时与预算比较"""
+    runs = [measure_once(module, budget["forbidden"]) for _ in range(repeat)]
+    errors = [r["error"] for r in runs if "error" in r]
+    if errors:
+        return {"module": module, "budget_seconds": budget["seconds"], "error": errors[0], "passed": False}
+
+    seconds = sorted(r["seconds"] for r in runs)[len(runs) // 2]
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+    stdout = runs[0]["stdout"]
+    return {
+        "module": module,
+        "budget_seconds": budget["seconds"],
+        "median_seconds": round(seconds, 3),
+        "forbidden_loaded": loaded,
+        "stdout": stdout[:200],
+        "passed": seconds <= budget["seconds"] and not loaded and not stdout,
+    }
+
+
+def run_budget(modules: List[str], repeat: int) -> dict:
+    record = {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0], "entries": []}
+    for module in modules:
+        result = check_entry(module, STARTUP_BUDGETS[module], repeat)
+        record["entries"].append(result)
+        if "error" in result:
+            logger.error(f"❌ {module} 导入失败: {result['error']}")
+            continue
+        problems = []
+        if result["median_seconds"] > result["budget_seconds"]:
+            problems.append(f"超出预算 {result['budget_seconds']}s")
+        if result["forbidden_loaded"]:
+            problems.append(f"加载了 {result['forbidden_loaded']}")
+        if result["stdout"]:
+            problems.append(f"导入时有输出: {result['stdout'][:60]!r}")
+        logger.info(
+            f"{'✅' if result['passed'] else '❌'} {module}: 导入 {result['median_seconds']}s"
+            f"{'，' + '，'.join(problems) if problems else ''}"
+        )
+    record["passed"] = all(entry["passed"] for entry in record["entries"])
+    return record
+
+
+def save_record(record: dict, path: str = RESULT_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="入口模块的启动耗时预算")
+    parser.add_argument("--modules", nargs="*", default=list(STARTUP_BUDGETS), choices=list(STARTUP_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=RESULT_FILE)
+    args = parser.parse_args()
+
+    record = run_budget(args.modules, args.repeat)
+    save_record(record, args.output)
+    logger.info(f"{'✅' if record['passed'] else '❌'} 启动预算结果已保存: {args.output}")
+    sys.exit(0 if record["passed"] else 1)
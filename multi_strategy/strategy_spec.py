@@ -0,0 +1,545 @@
+"""
+声明式策略规格
+
+每个策略写成一份规格（普通 dict），由三部分组成：
+    • features：在指标列之上派生的新列（滚动窗口、平移、EWM、表达式、截面排名、连续N天成立）
+    • conditions：若干布尔表达式（DataFrame.eval 语法），全部成立即命中
+    • output：命中结果里保留的列
+规格被编译成对全市场长表（按 ts_code、trade_date 排序）一次性求值的布尔掩码，
+滚动类特征通过 GroupLayout 按股票独立计算，和逐股 groupby 的结果一致，不需要再写逐股循环。
+
+规格可以带 "universe"（universe.make_universe），读取行情时下推过滤，默认只读主板股票。
+
+STRATEGY_SPECS 收录了 README 中的10个策略（原 strategies copy.py 的逐股实现），
+build_strategy(name) 生成签名为 strategy(trade_date) 的函数，可以直接放进 ALL_STRATEGIES。
+"""
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from data_source import query_history
+from indicators import _rolling, _shift, add_indicators
+from instrumentation import record_funnel
+from kernels import GroupLayout, ewm_mean
+from limit_price import add_limit_columns, load_st_periods
+from universe import MAIN_BOARD_UNIVERSE, board_mask
+
+from utils.logger import logger
+
+# 规格可以依赖的基础字段集
+BASE_INDICATORS = "indicators"  # indicators.add_indicators 的全部列
+BASE_LIMIT = "limit"  # limit_price.add_limit_columns 的涨跌停列（需要读取 ST 区间）
+
+# 读取行情时按自然日换算交易日的系数，另加一段余量，让停牌过的股票也能取满 lookback 个交易日
+CALENDAR_DAYS_PER_SESSION = 1.5
+CALENDAR_PADDING_DAYS = 40
+
+# indicators.add_indicators 中由 EWM 递推得到的列，结果依赖计算起点
+RECURSIVE_COLUMNS = {"ema12", "ema26", "diff", "dea", "macd", "k", "d", "j"}
+
+# 按窗口截断求值时每批展开的最大行数
+TRUNCATED_CHUNK_ROWS = 2_000_000
+
+
+# ---------------------------------------------------------------------------
+# 特征构造函数：返回描述特征的 dict，供规格里书写
+# ---------------------------------------------------------------------------
+
+
+def rolling(src: str, window: int, how: str = "mean", min_periods: Optional[int] = None, lag: int = 0) -> dict:
+    """按股票滚动统计；lag=1 表示只看前几天（不含当天）"""
+    return {"op": "rolling", "src": src, "window": window, "how": how, "min_periods": min_periods, "lag": lag}
+
+
+def shift(src: str, periods: int = 1) -> dict:
+    """按股票取 periods 个交易日之前的值"""
+    return {"op": "shift", "src": src, "periods": periods}
+
+
+def ewm(src: str, span: int, adjust: bool = True) -> dict:
+    """按股票计算指数加权均值"""
+    return {"op": "ewm", "src": src, "span": span, "adjust": adjust}
+
+
+def expr(expression: str) -> dict:
+    """逐行表达式（DataFrame.eval 语法），可以引用已有列和前面定义的特征"""
+    return {"op": "expr", "expr": expression}
+
+
+def rank(src: str, ascending: bool = False, pct: bool = True, where: Optional[str] = None) -> dict:
+    """
+    同一交易日内的截面排名，默认降序百分位（最大值为 1/n）
+    where 为表达式时只在满足条件的股票中排名，其余为 NaN
+    """
+    return {"op": "rank", "src": src, "ascending": ascending, "pct": pct, "where": where}
+
+
+def all_true(expression: str, window: int, lag: int = 0) -> dict:
+    """最近 window 个交易日（lag=1 时不含当天）表达式都成立"""
+    return {"op": "all", "expr": expression, "window": window, "lag": lag}
+
+
+def none_true(expression: str, window: int, lag: int = 0, min_periods: int = 1) -> dict:
+    """最近 window 个交易日（lag=1 时不含当天）表达式都不成立，窗口内至少需要 min_periods 天"""
+    return {"op": "none", "expr": expression, "window": window, "lag": lag, "min_periods": min_periods}
+
+
+# ---------------------------------------------------------------------------
+# 策略规格
+# ---------------------------------------------------------------------------
+
+STRATEGY_SPECS = {
+    "strategy_check_breakout_batch": {
+        "description": "突破+放量+涨幅≥5%，近4日均线多头且开盘高于前收",
+        "base": [BASE_INDICATORS],
+        "lookback": 30,
+        "min_history": 30,
+        "features": {
+            "max_close_20": rolling("close", 20, "max"),
+            "ma_bullish_4d": all_true("ma5 > ma10 and ma10 > ma20", 4),
+            "open_strength_4d": all_true("open > prev_close", 4),
+        },
+        "conditions": [
+            "pct_chg >= 5",
+            "vol >= 1.5 * avg_vol_5",
+            "close >= max_close_20",
+            "close > open",
+            "ma_bullish_4d",
+            "open_strength_4d",
+        ],
+        "output": ["close", "pct_chg", "vol_ratio"],
+    },
+    "strategy_top_gainers": {
+        "description": "成交额≥1e4千元、成交量≥前一日1.5倍的股票中涨幅前5%",
+        "base": [BASE_INDICATORS],
+        "lookback": 2,
+        "min_history": 2,
+        "features": {
+            "vol_increase_ratio": expr("vol / prev_vol"),
+            "gain_rank": rank("pct_chg", where="amount >= 1e4 and vol_increase_ratio >= 1.5"),
+        },
+        "conditions": ["amount >= 1e4", "vol_increase_ratio >= 1.5", "gain_rank <= 0.05"],
+        "output": ["close", "pct_chg", "amount", "vol_increase_ratio"],
+    },
+    "strategy_plate_breakout_post_close": {
+        "description": "平台突破：收盘突破前期平台高点、涨幅>4%、成交量>5日均量1.5倍",
+        # 原实现取最近20个交易日中除当天外的最高价，至少10天
+        "base": [BASE_INDICATORS],
+        "lookback": 20,
+        "min_history": 11,
+        "features": {
+            "platform_high": rolling("high", 19, "max", min_periods=10, lag=1),
+            "close_chg": expr("(close - prev_close) / prev_close * 100"),
+        },
+        "conditions": ["close > platform_high", "vol > 1.5 * avg_vol_5", "close_chg > 4"],
+        "output": ["close", "platform_high", "close_chg"],
+    },
+    "strategy_macd_golden_cross": {
+        "description": "MACD 金叉（MACD 柱由负转正）+ 均线多头排列",
+        "base": [BASE_INDICATORS],
+        "lookback": 35,
+        "min_history": 26,
+        "features": {"prev_macd": shift("macd")},
+        "conditions": ["prev_macd < 0", "macd > 0", "ma5 > ma10", "ma10 > ma20"],
+        "output": ["close", "macd", "ma5", "ma10", "ma20"],
+    },
+    "strategy_first_limit_up_low_position": {
+        "description": "低位涨停首板：当日涨停、此前未涨停、收盘低于前期最高收盘的80%",
+        "base": [BASE_INDICATORS, BASE_LIMIT],
+        "lookback": 40,
+        "min_history": 20,
+        "features": {
+            "no_prior_limit_up": none_true("is_limit_up_close", 39, lag=1),
+            "prior_max_close": rolling("close", 39, "max", min_periods=1, lag=1),
+        },
+        "conditions": ["is_limit_up_close", "no_prior_limit_up", "close < prior_max_close * 0.8"],
+        "output": ["close", "pct_chg", "up_limit", "prior_max_close"],
+    },
+    "strategy_consolidation_breakout_preparation": {
+        "description": "缩量整理后放量突破：前10日振幅小、量能收缩，当日放量突破整理区间高点",
+        "base": [BASE_INDICATORS],
+        "lookback": 15,
+        "min_history": 11,
+        "features": {
+            "amplitude": expr("(high - low) / low * 100"),
+            "amplitude_max": rolling("amplitude", 10, "max", lag=1),
+            "amplitude_mean": rolling("amplitude", 10, "mean", lag=1),
+            "consolidation_vol_mean": rolling("vol", 10, "mean", lag=1),
+            "consolidation_vol_max": rolling("vol", 10, "max", lag=1),
+            "breakout_level": rolling("high", 10, "max", lag=1),
+            "volume_ratio": expr("vol / consolidation_vol_mean"),
+            "breakout_pct": expr("(close - breakout_level) / breakout_level * 100"),
+        },
+        "conditions": [
+            "amplitude_max < 5",
+            "amplitude_mean < 3.5",
+            "prev_vol < consolidation_vol_max",
+            "volume_ratio > 1.5",
+            "close > breakout_level",
+        ],
+        "output": ["close", "volume_ratio", "breakout_pct", "amplitude_mean"],
+    },
+    "strategy_box_bottom_rebound": {
+        "description": "箱体底部反弹：近21日收盘振幅<15%，收盘位于箱体下沿20%以内",
+        "base": [],
+        "lookback": 21,
+        "min_history": 20,
+        "features": {
+            "box_low": rolling("close", 21, "min", min_periods=20),
+            "box_high": rolling("close", 21, "max", min_periods=20),
+            "box_width_pct": expr("(box_high - box_low) / box_low * 100"),
+            "close_position_pct": expr("(close - box_low) / (box_high - box_low) * 100"),
+        },
+        "conditions": ["box_width_pct < 15", "box_high > box_low", "close_position_pct <= 20"],
+        "output": ["close", "box_width_pct", "close_position_pct"],
+    },
+    "strategy_ma_convergence_start": {
+        "description": "均线粘合预启动：MA5/MA10/MA20 相互偏离<1.5% 且 MA5 上拐",
+        "base": [BASE_INDICATORS],
+        "lookback": 25,
+        "min_history": 20,
+        "features": {
+            "ma5_10_diff_pct": expr("abs(ma5 - ma10) / close * 100"),
+            "ma10_20_diff_pct": expr("abs(ma10 - ma20) / close * 100"),
+            # ma5 - prev_ma5 恰好等于 (close - 5日前close) / 5；两个滚动均值相减在收盘价持平时会因累加起点不同
+            # 得到 ±1e-15 的噪声，"> 0" 随之翻转，直接用收盘价计算才是精确的
+            "close_5": shift("close", 5),
+            "ma5_slope": expr("(close - close_5) / 5"),
+        },
+        "conditions": ["ma5_10_diff_pct < 1.5", "ma10_20_diff_pct < 1.5", "ma5_slope > 0"],
+        "output": ["close", "ma5_10_diff_pct", "ma10_20_diff_pct", "ma5_slope"],
+    },
+    "strategy_macd_divergent_gold_cross": {
+        "description": "MACD 低位金叉且价格不创新低（EWM 不做 adjust，与原实现一致）",
+        "base": [],
+        "lookback": 50,
+        "min_history": 35,
+        "features": {
+            "ema12_na": ewm("close", 12, adjust=False),
+            "ema26_na": ewm("close", 26, adjust=False),
+            "diff_na": expr("ema12_na - ema26_na"),
+            "dea_na": ewm("diff_na", 9, adjust=False),
+            "macd_na": expr("2 * (diff_na - dea_na)"),
+            "prev_macd_na": shift("macd_na"),
+            "min_recent_low": rolling("close", 19, "min", lag=1),
+        },
+        "conditions": [
+            "prev_macd_na < 0",
+            "macd_na > 0",
+            "close > min_recent_low * 1.02",
+            "macd_na < 0.1",
+            "macd_na > -0.3",
+        ],
+        "output": ["close", "macd_na", "diff_na", "dea_na", "min_recent_low"],
+    },
+    "strategy_annual_line_breakout": {
+        "description": "低位放量突破年线：收盘上穿 MA250，之前20日都在年线下方，成交量>5日均量1.5倍",
+        # 原实现在最近260天上重算 MA250，前249天恒为空值导致“首次上穿”永远不成立，
+        # 这里把“首次”定义为突破前连续20个交易日收盘低于年线
+        "base": [BASE_INDICATORS],
+        "lookback": 280,
+        "min_history": 260,
+        "features": {
+            "ma250": rolling("close", 250, "mean"),
+            "below_ma250_20d": all_true("close < ma250", 20, lag=1),
+        },
+        "conditions": ["close > ma250", "below_ma250_20d", "vol > 1.5 * avg_vol_5"],
+        "output": ["close", "ma250", "vol", "avg_vol_5"],
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# 编译与求值
+# ---------------------------------------------------------------------------
+
+
+def _eval_bool(df: pd.DataFrame, expression: str) -> np.ndarray:
+    """表达式求值为布尔数组，NaN 参与的比较视为不成立"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = df.eval(expression)
+    if isinstance(result, pd.Series):
+        result = result.to_numpy()
+    result = np.asarray(result)
+    if result.dtype != bool:
+        result = np.nan_to_num(result.astype(np.float64), nan=0.0) != 0
+    return np.broadcast_to(result, (len(df),)).copy()
+
+
+def _lagged_window(layout: GroupLayout, values: np.ndarray, window: int, how: str, lag: int, min_periods=None):
+    padded = layout.to_padded(values)
+    if lag:
+        padded = _shift(padded, lag)
+    if min_periods is None:
+        result = _rolling(padded, window, how)
+    else:
+        result = getattr(pd.DataFrame(padded).rolling(window, min_periods=min_periods), how)().to_numpy()
+    return layout.to_long(result)
+
+
+def _compute_feature(df: pd.DataFrame, layout: GroupLayout, feature: dict) -> np.ndarray:
+    op = feature["op"]
+    if op == "rolling":
+        return _lagged_window(
+            layout, df[feature["src"]], feature["window"], feature["how"], feature["lag"], feature["min_periods"]
+        )
+    if op == "shift":
+        return layout.to_long(_shift(layout.to_padded(df[feature["src"]]), feature["periods"]))
+    if op == "ewm":
+        padded = ewm_mean(layout.to_padded(df[feature["src"]]), span=feature["span"], adjust=feature["adjust"])
+        return layout.to_long(padded)
+    if op == "expr":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.asarray(df.eval(feature["expr"]), dtype=np.float64)
+    if op == "rank":
+        values = df[feature["src"]].astype(np.float64)
+        if feature["where"]:
+            values = values.where(_eval_bool(df, feature["where"]))
+        ranked = values.groupby(df["trade_date"].to_numpy()).rank(
+            ascending=feature["ascending"], pct=feature["pct"], method="first"
+        )
+        return ranked.to_numpy()
+    if op == "all":
+        hits = _eval_bool(df, feature["expr"]).astype(np.float64)
+        window = feature["window"]
+        counts = _lagged_window(layout, hits, window, "sum", feature["lag"])
+        return counts == window
+    if op == "none":
+        hits = _eval_bool(df, feature["expr"]).astype(np.float64)
+        counts = _lagged_window(layout, hits, feature["window"], "sum", feature["lag"], feature["min_periods"])
+        return counts == 0
+    raise ValueError(f"不支持的特征类型: {op}")
+
+
+def prepare_panel(
+    df: pd.DataFrame,
+    base: List[str],
+    layout: Optional[GroupLayout] = None,
+    st_periods: Optional[pd.DataFrame] = None,
+) -> GroupLayout:
+    """
+    为长表补齐规格依赖的基础字段（就地写入），返回对应的 GroupLayout
+    另外总会补上 n_days（该股在窗口内的第几个交易日）和 prev_close、prev_vol、prev_ma5 等常用的前一日值
+    """
+    layout = layout or GroupLayout(df["ts_code"].to_numpy())
+    if BASE_INDICATORS in base and "ma5" not in df.columns:
+        add_indicators(df, layout)
+    if BASE_LIMIT in base and "is_limit_up_close" not in df.columns:
+        add_limit_columns(df, st_periods)
+    df["n_days"] = layout.positions + 1
+    for col in ("close", "vol", "ma5"):
+        if col in df.columns and f"prev_{col}" not in df.columns:
+            df[f"prev_{col}"] = layout.to_long(_shift(layout.to_padded(df[col])))
+    return layout
+
+
+def compile_spec(spec: dict) -> Callable[[pd.DataFrame, Optional[GroupLayout]], "OrderedDict[str, np.ndarray]"]:
+    """
+    把规格编译成求值函数 evaluate(df, layout=None)
+
+    evaluate 在 df 上就地追加特征列，返回 {条件: 布尔数组} 的有序字典，
+    第一项是最少历史天数，所有条件逐项与起来就是命中掩码（见 combine_masks）。
+    df 需已经过 prepare_panel。
+    """
+    for name, feature in spec.get("features", {}).items():
+        if not isinstance(feature, dict) or "op" not in feature:
+            raise ValueError(f"特征 {name} 的定义无效: {feature}")
+    conditions = [f"n_days >= {spec.get('min_history', 1)}"] + list(spec["conditions"])
+
+    def evaluate(df: pd.DataFrame, layout: Optional[GroupLayout] = None) -> "OrderedDict[str, np.ndarray]":
+        layout = layout or GroupLayout(df["ts_code"].to_numpy())
+        for name, feature in spec.get("features", {}).items():
+            df[name] = _compute_feature(df, layout, feature)
+        return OrderedDict((cond, _eval_bool(df, cond)) for cond in conditions)
+
+    return evaluate
+
+
+def combine_masks(masks: Dict[str, np.ndarray]) -> np.ndarray:
+    """所有条件同时成立"""
+    return np.logical_and.reduce(list(masks.values()))
+
+
+def evaluate_spec(
+    spec: dict,
+    df: pd.DataFrame,
+    st_periods: Optional[pd.DataFrame] = None,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    在整个长表上求值规格，返回（带特征列的长表, 命中掩码），每个交易日的每只股票都有结果
+    """
+    layout = prepare_panel(df, spec.get("base", []), st_periods=st_periods)
+    masks = compile_spec(spec)(df, layout)
+    return df, combine_masks(masks)
+
+
+def is_path_dependent(spec: dict) -> bool:
+    """
+    规格是否用到 EWM 这类递推指标：递推的结果取决于从哪一行开始算，
+    run_spec 每只股票只用最近 lookback 个交易日，批量求值时也必须按同样的截断逐日计算
+    """
+    if any(feature["op"] == "ewm" for feature in spec.get("features", {}).values()):
+        return True
+    if BASE_INDICATORS not in spec.get("base", []):
+        return False
+    texts = list(spec["conditions"]) + spec.get("output", [])
+    for feature in spec.get("features", {}).values():
+        texts += [feature.get("src") or "", feature.get("expr") or "", feature.get("where") or ""]
+    names = set(re.findall(r"[A-Za-z_]\w*", " ".join(texts)))
+    return bool(names & RECURSIVE_COLUMNS)
+
+
+def window_days(spec: dict) -> int:
+    """load_panel 读取的自然日数"""
+    return int(spec.get("lookback", 1) * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS
+
+
+def single_date_lengths(spec: dict, df: pd.DataFrame) -> np.ndarray:
+    """
+    run_spec 在 df（按 ts_code、trade_date 排序）每一行的日期上单独运行时，该股实际用到的行数：
+    load_panel 读取的自然日窗口内的行数，再截断到 lookback；停牌较久的股票可能读不满 lookback
+    """
+    layout = GroupLayout(df["ts_code"].to_numpy())
+    days = pd.to_datetime(df["trade_date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    key = layout.group_ids.astype(np.int64) * 10**6 + days
+    first = np.searchsorted(key, key - window_days(spec))
+    counts = np.arange(len(df)) - first + 1
+    lookback = spec.get("lookback")
+    return np.minimum(counts, lookback) if lookback else counts
+
+
+def has_rank(spec: dict) -> bool:
+    """规格是否有截面排名特征（排名范围是同一交易日的全部股票）"""
+    return any(feature["op"] == "rank" for feature in spec.get("features", {}).values())
+
+
+def evaluate_truncated(
+    spec: dict,
+    df: pd.DataFrame,
+    targets: np.ndarray,
+    lengths: np.ndarray,
+    st_periods: Optional[pd.DataFrame] = None,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    对 df（按 ts_code、trade_date 排序，只含原始行情列）中 targets 为 True 的每一行，
+    只用该股截至当天的最近 lengths 行求值（lengths 通常来自 single_date_lengths），与 run_spec 在该日单独运行一致
+
+    每个目标行展开成一个窗口，各窗口作为独立的组一起求值，按 TRUNCATED_CHUNK_ROWS 分批控制内存。
+    带截面排名（rank）的规格按日期分批，每批是同一天的全部目标行，排名范围与单日模式相同，
+    此时 targets 应包含这些日期股票池内的全部行。
+
+    Returns:
+        (目标行带特征列的表，索引为在 df 中的行号, 命中掩码)
+    """
+    rows = np.flatnonzero(targets)
+    if has_rank(spec):
+        dates = df["trade_date"].to_numpy()[rows]
+        order = np.argsort(dates, kind="stable")
+        bounds = np.flatnonzero(np.r_[True, dates[order][1:] != dates[order][:-1], True]) if len(rows) else []
+        chunks = [rows[order[lo:hi]] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    else:
+        per_chunk = max(1, TRUNCATED_CHUNK_ROWS // spec.get("lookback", 1))
+        chunks = [rows[start : start + per_chunk] for start in range(0, len(rows), per_chunk)]
+    compiled = compile_spec(spec)
+
+    frames, masks = [], []
+    for ends in chunks:
+        window_lengths = lengths[ends]
+        window_ids = np.repeat(np.arange(len(ends)), window_lengths)
+        starts = np.cumsum(window_lengths) - window_lengths
+        offsets = np.arange(window_lengths.sum()) - np.repeat(starts, window_lengths)
+        windows = df.iloc[np.repeat(ends - window_lengths + 1, window_lengths) + offsets].reset_index(drop=True)
+        # 同一只股票相邻的窗口不能连成一组，按窗口编号分组
+        layout = prepare_panel(windows, spec.get("base", []), GroupLayout(window_ids), st_periods)
+        last_rows = np.cumsum(window_lengths) - 1
+        masks.append(combine_masks(compiled(windows, layout))[last_rows])
+        frames.append(windows.iloc[last_rows].set_axis(ends))
+
+    if not frames:
+        return df.iloc[:0].copy(), np.zeros(0, dtype=bool)
+    return pd.concat(frames), np.concatenate(masks)
+
+
+def load_universe(spec: dict) -> dict:
+    """
+    读取行情时下推的股票池
+
+    板块排除只对逐行判断的条件是安全的。截面排名（rank）的排名范围是全市场（原实现也是全市场排名、
+    main 汇总时才剔除创业板和科创板），先排除板块会拉低前 N% 的门槛、改变命中，
+    所以带 rank 特征的规格读取全部板块，板块排除在求值后对命中再做（board_mask）
+    """
+    universe = spec.get("universe", MAIN_BOARD_UNIVERSE)
+    if has_rank(spec):
+        return {**universe, "exclude_boards": ()}
+    return universe
+
+
+def load_panel(spec: dict, trade_date: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """按规格的 lookback 和股票池（load_universe）读取截至 trade_date 的长表"""
+    trade_date_obj = datetime.strptime(trade_date.replace("-", ""), "%Y%m%d")
+    start_date = (trade_date_obj - timedelta(days=window_days(spec))).strftime("%Y%m%d")
+    return query_history(None, trade_date, start_date=start_date, columns=columns, universe=load_universe(spec))
+
+
+def run_spec(name: str, trade_date: str, spec: Optional[dict] = None) -> pd.DataFrame:
+    """
+    在 trade_date（或之前最近一个交易日）上运行规格，返回命中股票
+
+    每只股票只使用窗口内最近 lookback 个交易日，与原逐股实现的 tail(n) 对齐
+    """
+    spec = spec or STRATEGY_SPECS[name]
+    df = load_panel(spec, trade_date)
+    if df.empty:
+        logger.info(f"【{name}】在 {trade_date} 之前没有行情数据")
+        return pd.DataFrame()
+
+    lookback = spec.get("lookback")
+    if lookback:
+        recent = df.groupby("ts_code", sort=False).cumcount(ascending=False) < lookback
+        df = df[recent.to_numpy()].reset_index(drop=True)
+
+    st_periods = load_st_periods() if BASE_LIMIT in spec.get("base", []) else None
+    layout = prepare_panel(df, spec.get("base", []), st_periods=st_periods)
+    masks = compile_spec(spec)(df, layout)
+    last_date = df["trade_date"].max()
+    survivors = (df["trade_date"] == last_date).to_numpy()
+    record_funnel("universe", survivors.sum())
+    for cond, cond_mask in masks.items():
+        survivors = survivors & cond_mask
+        record_funnel(cond, survivors.sum())
+    if has_rank(spec):
+        survivors = survivors & board_mask(df["ts_code"].to_numpy(), spec.get("universe", MAIN_BOARD_UNIVERSE))
+        record_funnel("board", survivors.sum())
+    hits = df[survivors]
+
+    result = hits[["ts_code", "trade_date"] + spec.get("output", [])].copy()
+    result["strategy"] = name
+    logger.info(f"【{name}】{last_date:%Y-%m-%d} 命中 {len(result)} 只")
+    return result.reset_index(drop=True)
+
+
+class SpecStrategy:
+    """
+    按规格名调用 run_spec 的策略，用法与普通策略函数相同（strategy(trade_date)、__name__）
+
+    写成模块级的类而不是闭包，实例可以 pickle，parallel_runner 才能把它交给子进程执行
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.__name__ = name
+        self.__doc__ = STRATEGY_SPECS[name]["description"]
+
+    def __call__(self, trade_date: str) -> pd.DataFrame:
+        return run_spec(self.name, trade_date)
+
+    def __repr__(self) -> str:
+        return f"SpecStrategy({self.name!r})"
+
+
+def build_strategy(name: str) -> Callable[[str], pd.DataFrame]:
+    """生成可以放进 ALL_STRATEGIES 的策略，名称与规格名相同"""
+    return SpecStrategy(name)
@@ -1,8 +1,9 @@
-import pandas as pd
-from sqlalchemy import create_engine
-from config import MYSQL_URL
+import os
+import sys
 
-engine = create_engine(MYSQL_URL)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from v_shape_research import research, signal_stats
 
 
 # def analyze_002801_v_shape():
@@ -213,125 +214,29 @@ engine = create_engine(MYSQL_URL)
 
 
 def optimized_v_shape_strategy(ts_code, start_date, end_date):
-    """优化的V字反弹策略"""
-    sql = f"""
-    SELECT trade_date, open, close, pre_close, vol, high, low
-    FROM stock_daily
-    WHERE ts_code = '{ts_code}' AND trade_date >= '{start_date}' AND trade_date <= '{end_date}'
-    ORDER BY trade_date
-    """
-    df = pd.read_sql(sql, engine)
-
-    # 计算技术指标
-    df["ma5"] = df["close"].rolling(5).mean()
-    df["ma10"] = df["close"].rolling(10).mean()
-    df["ma20"] = df["close"].rolling(20).mean()
-    df["pct_chg"] = (df["close"] - df["pre_close"]) / df["pre_close"] * 100
-    df["avg_vol_5"] = df["vol"].rolling(5).mean()
-    df["vol_ratio"] = df["vol"] / df["avg_vol_5"]
-    df["max_close_10"] = df["close"].rolling(10).max()
-    df["min_close_10"] = df["close"].rolling(10).min()
-    df["price_position"] = (df["close"] - df["min_close_10"]) / (df["max_close_10"] - df["min_close_10"])
+    """优化的V字反弹策略（计算见 v_shape_research，这里只按原格式打印强度>=4的交易日）"""
+    df = research([ts_code], start_date.replace("-", ""), end_date.replace("-", ""), lookback=0)
 
     print(f"=== {ts_code} 优化V字反弹策略回测 ===")
-    print("日期 | 收盘价 | MA5 | MA10 | 涨幅% | 量比 | 价格位置% | 反弹强度 | 信号 | 命中")
+    print("日期 | 收盘价 | MA5 | MA10 | 涨幅% | 量比 | 价格位置% | 反弹强度 | 命中")
     print("-" * 100)
-
-    signals = []
-    hits = 0
-    total_signals = 0
-
-    for i in range(10, len(df)):  # 至少10天数据
-        row = df.iloc[i]
-
-        # 计算反弹强度指标
-        strength = 0
-        conditions = []
-
-        # 1. 均线系统 (权重: 2)
-        ma5_up = df["ma5"].iloc[i] > df["ma5"].iloc[i - 1]
-        ma10_up = df["ma10"].iloc[i] > df["ma10"].iloc[i - 1]
-        ma5_gt_ma10 = df["ma5"].iloc[i] > df["ma10"].iloc[i]
-
-        if ma5_up and ma10_up:
-            strength += 2
-            conditions.append("均线双升")
-        elif ma5_up:
-            strength += 1
-            conditions.append("MA5升")
-
-        if ma5_gt_ma10:
-            strength += 1
-            conditions.append("MA5>MA10")
-
-        # 2. 价格突破 (权重: 2)
-        close_up = df["close"].iloc[i] > df["close"].iloc[i - 1]
-        close_above_open = df["close"].iloc[i] > df["open"].iloc[i]
-
-        if close_up and close_above_open:
-            strength += 2
-            conditions.append("价量齐升")
-        elif close_up:
-            strength += 1
-            conditions.append("价格上涨")
-
-        # 3. 成交量确认 (权重: 2)
-        vol_breakout = row["vol_ratio"] > 1.2
-        if vol_breakout:
-            strength += 2
-            conditions.append("放量突破")
-        elif row["vol_ratio"] > 0.8:
-            strength += 1
-            conditions.append("量能正常")
-
-        # 4. 价格位置 (权重: 1)
-        if row["price_position"] > 0.6:
-            strength += 1
-            conditions.append("价格强势")
-
-        # 5. 开盘强势 (权重: 1)
-        open_strong = df["open"].iloc[i] > df["close"].iloc[i - 1]
-        if open_strong:
-            strength += 1
-            conditions.append("开盘强势")
-
-        # 6. 连续上涨趋势 (权重: 1)
-        consecutive_up = 0
-        for j in range(max(0, i - 3), i):
-            if df["close"].iloc[j] > df["close"].iloc[j - 1]:
-                consecutive_up += 1
-        if consecutive_up >= 2:
-            strength += 1
-            conditions.append("连续上涨")
-
-        # 信号生成
-        signal = strength >= 6  # 至少6分才产生信号
-        total_signals += 1 if signal else 0
-
-        # 验证信号效果 (看后续3天是否上涨)
-        future_return = 0
-        if signal and i + 3 < len(df):
-            future_return = (df["close"].iloc[i + 3] / df["close"].iloc[i] - 1) * 100
-            if future_return > 2:  # 3天内上涨超过2%算命中
-                hits += 1
-
-        # 输出结果
-        if signal or strength >= 4:  # 显示所有信号和强度>=4的情况
-            hit_mark = "✅" if signal and future_return > 2 else "❌" if signal else ""
-            print(
-                f"{row['trade_date']} | {row['close']:.2f} | {row['ma5']:.2f} | {row['ma10']:.2f} | {row['pct_chg']:.2f}% | {row['vol_ratio']:.2f} | {row['price_position']*100:.0f}% | {strength}/8 | {'' if signal else ''} | {hit_mark}"
-            )
-
-    # 统计结果
-    if total_signals > 0:
-        hit_rate = hits / total_signals * 100
-        print(f"\n=== 策略统计 ===")
-        print(f"总信号数: {total_signals}")
-        print(f"命中数: {hits}")
-        print(f"命中率: {hit_rate:.2f}%")
+    for row in df[df["strength"] >= 4].itertuples(index=False):
+        hit_mark = "✅" if row.hit else "❌" if row.signal else ""
+        print(
+            f"{row.trade_date:%Y-%m-%d} | {row.close:.2f} | {row.ma5:.2f} | {row.ma10:.2f} | {row.pct_chg:.2f}% | "
+            f"{row.vol_ratio:.2f} | {row.price_position * 100:.0f}% | {row.strength} | {hit_mark}"
+        )
+
+    stats = signal_stats(df)
+    if not stats.empty and stats["signals"].iloc[0] > 0:
+        print("\n=== 策略统计 ===")
+        print(f"总信号数: {stats['signals'].iloc[0]}")
+        print(f"命中数: {stats['hits'].iloc[0]}")
+        print(f"命中率: {stats['hit_rate'].iloc[0] * 100:.2f}%")
 
     return df
 
 
-# 运行优化策略
-optimized_v_shape_strategy("600166", "2025-06-05", "2025-07-07")
+if __name__ == "__main__":
+    # 运行优化策略；其他股票、区间或全市场请用 python v_shape_research.py
+    optimized_v_shape_strategy("600166", "2025-06-05", "2025-07-07")
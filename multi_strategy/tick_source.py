@@ -0,0 +1,155 @@
+"""
+盘中实时数据的来源：时钟、realtime_ticks 查询和实时行情
+
+filter_with_realtime 的实时确认逻辑通过这里获取当前时间、最近 N 分钟的 tick 和当前行情。
+默认是实盘：datetime.now()、查 MySQL 的 realtime_ticks、请求东方财富接口。
+use_replay 生效期间改为从 TickReplay 取数：时钟停在回放到的时刻，只能看到该时刻及以前的 tick，
+当前行情取该时刻最新的一条 tick。这样同一套确认逻辑可以离线、确定性地重放录制好的交易日。
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from clients import get_engine
+
+# realtime_ticks 的字段与 get_realtime_info 返回字段的对应关系
+QUOTE_FIELDS = {
+    "price": "当前",
+    "open": "今开",
+    "high": "最高",
+    "low": "最低",
+    "volume": "成交量",
+    "amount": "成交额",
+    "close": "昨收",
+}
+TICK_COLUMNS = ["timestamp", "price", "volume", "amount", "high", "low", "open", "close"]
+
+# 当前生效的回放（TickReplay），为 None 时为实盘
+_replay = None
+
+
+def set_replay(replay):
+    """设置（或传 None 清除）当前进程使用的回放"""
+    global _replay
+    _replay = replay
+
+
+def get_replay():
+    return _replay
+
+
+@contextmanager
+def use_replay(replay):
+    """在 with 块内让时钟、tick 查询和实时行情都来自回放"""
+    previous = _replay
+    set_replay(replay)
+    try:
+        yield replay
+    finally:
+        set_replay(previous)
+
+
+def now() -> datetime:
+    """当前时间，回放时为回放到的时刻"""
+    if _replay is not None:
+        return _replay.clock
+    return datetime.now()
+
+
+def query_ticks(
+    ts_code: str, since: datetime, until: Optional[datetime] = None, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    某只股票 timestamp 在 [since, until) 内的 tick，按时间升序
+
+    Args:
+        until: None 表示不限（回放时为截至回放时刻，含）
+        columns: 需要的字段，timestamp 总会带上
+    """
+    columns = ["timestamp"] + [c for c in (columns or ["price"]) if c != "timestamp"]
+    if _replay is not None:
+        return _replay.ticks(ts_code, since, until, columns)
+
+    sql = f"SELECT {', '.join(columns)} FROM realtime_ticks WHERE ts_code = %(ts_code)s AND timestamp >= %(since)s"
+    params = {"ts_code": ts_code, "since": since}
+    if until is not None:
+        sql += " AND timestamp < %(until)s"
+        params["until"] = until
+    sql += " ORDER BY timestamp ASC"
+    return pd.read_sql(sql, get_engine(), params=params)
+
+
+def get_quote(ts_code: str, trade_date: str) -> dict:
+    """当前行情（今开、当前、最高、最低、成交量、成交额、昨收），回放时取回放时刻最新的一条 tick"""
+    if _replay is not None:
+        return _replay.quote(ts_code)
+
+    from get_realtime import get_realtime_info
+
+    return get_realtime_info(ts_code, trade_date)
+
+
+class TickReplay:
+    """
+    录制好的一个交易日的 tick，按股票分组存成 numpy 数组；clock 为当前回放时刻
+    """
+
+    def __init__(self, ticks: pd.DataFrame):
+        ticks = ticks.sort_values(["ts_code", "timestamp"], kind="stable").reset_index(drop=True)
+        ticks["timestamp"] = pd.to_datetime(ticks["timestamp"])
+        self.columns = [c for c in TICK_COLUMNS if c in ticks.columns]
+        self.times = np.sort(ticks["timestamp"].unique())
+        self.clock = pd.Timestamp(self.times[0]).to_pydatetime() if len(self.times) else None
+
+        codes = ticks["ts_code"].to_numpy()
+        bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+        values = {col: ticks[col].to_numpy() for col in self.columns}
+        self._by_code = {
+            codes[start]: {col: arr[start:end] for col, arr in values.items()}
+            for start, end in zip(bounds[:-1], bounds[1:])
+        }
+
+    @classmethod
+    def load(cls, trade_date: str, ts_codes: Optional[List[str]] = None) -> "TickReplay":
+        """从 realtime_ticks 读取某个交易日的全部 tick"""
+        sql = f"SELECT ts_code, {', '.join(TICK_COLUMNS)} FROM realtime_ticks WHERE trade_date = %(trade_date)s"
+        params = {"trade_date": trade_date}
+        if ts_codes is not None:
+            placeholders = ",".join([f"%(ts_code_{i})s" for i in range(len(ts_codes))])
+            sql += f" AND ts_code IN ({placeholders})"
+            params.update({f"ts_code_{i}": code for i, code in enumerate(ts_codes)})
+        return cls(pd.read_sql(sql, get_engine(), params=params))
+
+    @property
+    def ts_codes(self) -> List[str]:
+        return list(self._by_code)
+
+    def advance_to(self, moment):
+        self.clock = pd.Timestamp(moment).to_pydatetime()
+
+    def _visible(self, ts_code: str, since: Optional[datetime], until: Optional[datetime]) -> tuple:
+        """返回 (该股票的数组, 起始下标, 结束下标)，结束不超过回放时刻"""
+        arrays = self._by_code.get(ts_code)
+        if arrays is None:
+            return None, 0, 0
+        times = arrays["timestamp"]
+        end = np.searchsorted(times, np.datetime64(self.clock), side="right")
+        if until is not None:
+            end = min(end, np.searchsorted(times, np.datetime64(until), side="left"))
+        start = np.searchsorted(times, np.datetime64(since), side="left") if since is not None else 0
+        return arrays, start, max(start, end)
+
+    def ticks(self, ts_code: str, since: datetime, until: Optional[datetime], columns: List[str]) -> pd.DataFrame:
+        arrays, start, end = self._visible(ts_code, since, until)
+        if arrays is None:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame({col: arrays[col][start:end] for col in columns})
+
+    def quote(self, ts_code: str) -> dict:
+        arrays, _, end = self._visible(ts_code, None, None)
+        if arrays is None or end == 0:
+            raise ValueError(f"{ts_code} 在 {self.clock} 之前没有 tick")
+        values = {name: arrays[col][end - 1] for col, name in QUOTE_FIELDS.items() if col in arrays}
+        return {name: None if pd.isna(v) else float(v) for name, v in values.items()}
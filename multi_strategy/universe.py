@@ -0,0 +1,182 @@
+"""
+股票池预过滤
+
+策略真正关心的只是一部分股票（例如只做主板、股价低于13元、非ST、当天有成交），
+这些条件在读取行情时就下推：查 MySQL 时拼进 WHERE，走内存快照时先用列数组算掩码，
+被排除的行根本不会被构造成 DataFrame。
+
+股票池是一个普通 dict（make_universe 生成），分两类条件：
+    • 板块排除：对所有行生效
+    • 价格区间、ST、停牌、最低成交额：只在截面日判断（历史查询时以截止日为截面日），
+      截面日通过的股票保留其全部历史，保证滚动指标不被截断
+"""
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from limit_price import BOARD_CHINEXT, BOARD_PREFIXES, BOARD_STAR, classify_board, load_st_periods, mark_st
+
+
+def make_universe(
+    exclude_boards: Iterable[str] = (),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    exclude_st: bool = False,
+    exclude_suspended: bool = False,
+    min_amount: Optional[float] = None,
+) -> dict:
+    """
+    定义股票池
+
+    Args:
+        exclude_boards: 排除的板块（limit_price.BOARD_*）
+        min_price: 截面日收盘价下限（含）
+        max_price: 截面日收盘价上限（不含）
+        exclude_st: 排除截面日处于ST的股票
+        exclude_suspended: 排除截面日停牌（无成交）的股票
+        min_amount: 截面日成交额下限（千元，含）
+    """
+    return {
+        "exclude_boards": tuple(exclude_boards),
+        "min_price": min_price,
+        "max_price": max_price,
+        "exclude_st": exclude_st,
+        "exclude_suspended": exclude_suspended,
+        "min_amount": min_amount,
+    }
+
+
+# main 汇总结果时原先才剔除的创业板、科创板，现在由各策略在读取时排除
+MAIN_BOARD_UNIVERSE = make_universe(exclude_boards=(BOARD_CHINEXT, BOARD_STAR), exclude_suspended=True)
+
+
+def has_day_filters(universe: dict) -> bool:
+    """是否包含需要按截面日判断的条件"""
+    return bool(
+        universe["min_price"] is not None
+        or universe["max_price"] is not None
+        or universe["exclude_st"]
+        or universe["exclude_suspended"]
+        or universe["min_amount"] is not None
+    )
+
+
+def predicate_columns(universe: dict) -> List[str]:
+    """截面日条件需要用到的行情字段"""
+    columns = []
+    if universe["min_price"] is not None or universe["max_price"] is not None:
+        columns.append("close")
+    if universe["exclude_suspended"]:
+        columns.append("vol")
+    if universe["min_amount"] is not None:
+        columns.append("amount")
+    return columns
+
+
+def excluded_prefixes(universe: dict) -> Tuple[str, ...]:
+    return tuple(p for board in universe["exclude_boards"] for p in BOARD_PREFIXES.get(board, ()))
+
+
+# ---------------------------------------------------------------------------
+# SQL 下推
+# ---------------------------------------------------------------------------
+
+
+def board_conditions(universe: dict, column: str = "ts_code") -> Tuple[List[str], dict]:
+    """板块排除条件，返回 (条件列表, 参数)"""
+    conditions = []
+    params = {}
+    for i, prefix in enumerate(excluded_prefixes(universe)):
+        conditions.append(f"{column} NOT LIKE %(universe_prefix_{i})s")
+        params[f"universe_prefix_{i}"] = f"{prefix}%"
+    return conditions, params
+
+
+def day_conditions(universe: dict, alias: str = "stock_daily") -> Tuple[List[str], dict]:
+    """截面日条件，alias 为 stock_daily 在查询中的表名或别名"""
+    conditions = []
+    params = {}
+    if universe["min_price"] is not None:
+        conditions.append(f"{alias}.close >= %(universe_min_price)s")
+        params["universe_min_price"] = universe["min_price"]
+    if universe["max_price"] is not None:
+        conditions.append(f"{alias}.close < %(universe_max_price)s")
+        params["universe_max_price"] = universe["max_price"]
+    if universe["exclude_suspended"]:
+        conditions.append(f"{alias}.vol > 0")
+    if universe["min_amount"] is not None:
+        conditions.append(f"{alias}.amount >= %(universe_min_amount)s")
+        params["universe_min_amount"] = universe["min_amount"]
+    if universe["exclude_st"]:
+        conditions.append(
+            f"NOT EXISTS (SELECT 1 FROM stock_st st WHERE st.ts_code = {alias}.ts_code "
+            f"AND st.start_date <= {alias}.trade_date "
+            f"AND (st.end_date IS NULL OR st.end_date >= {alias}.trade_date))"
+        )
+    return conditions, params
+
+
+def sql_conditions(universe: dict, cross_section: bool, end_date: Optional[str] = None) -> Tuple[List[str], dict]:
+    """
+    stock_daily 查询的 WHERE 条件
+
+    Args:
+        cross_section: 查询的是单日截面时直接按行过滤；否则以 end_date（或之前最近的交易日）为截面日，
+                       用子查询选出通过的股票，保留它们的全部历史
+        end_date: 历史查询的截止日期
+    """
+    conditions, params = board_conditions(universe)
+    if not has_day_filters(universe):
+        return conditions, params
+
+    if cross_section:
+        day, day_params = day_conditions(universe)
+        return conditions + day, {**params, **day_params}
+
+    day, day_params = day_conditions(universe, alias="u")
+    latest = "SELECT MAX(trade_date) FROM stock_daily"
+    if end_date:
+        latest += " WHERE trade_date <= %(universe_end_date)s"
+        day_params["universe_end_date"] = end_date
+    day_sql = " AND ".join([f"u.trade_date = ({latest})"] + day)
+    conditions.append(f"ts_code IN (SELECT u.ts_code FROM stock_daily u WHERE {day_sql})")
+    return conditions, {**params, **day_params}
+
+
+# ---------------------------------------------------------------------------
+# 列数组（内存快照）过滤
+# ---------------------------------------------------------------------------
+
+
+def board_mask(ts_codes, universe: dict) -> np.ndarray:
+    """板块排除后保留的行；ts_codes 为 6 位代码（先对去重后的代码判断再映射回来）"""
+    if not universe["exclude_boards"]:
+        return np.ones(len(ts_codes), dtype=bool)
+    codes, inverse = np.unique(np.asarray(ts_codes), return_inverse=True)
+    allowed = ~np.isin(classify_board(codes), universe["exclude_boards"])
+    return allowed[inverse]
+
+
+def day_mask(df: pd.DataFrame, universe: dict, st_periods: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """
+    截面日条件，df 需含 ts_code、trade_date 及 predicate_columns 中的字段
+    排除 ST 时未传 st_periods 会从 stock_st 读取
+    """
+    mask = np.ones(len(df), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if universe["min_price"] is not None:
+            mask &= df["close"].to_numpy(dtype=np.float64) >= universe["min_price"]
+        if universe["max_price"] is not None:
+            mask &= df["close"].to_numpy(dtype=np.float64) < universe["max_price"]
+        if universe["exclude_suspended"]:
+            mask &= df["vol"].to_numpy(dtype=np.float64) > 0
+        if universe["min_amount"] is not None:
+            mask &= df["amount"].to_numpy(dtype=np.float64) >= universe["min_amount"]
+    if universe["exclude_st"] and mask.any():
+        mask &= ~mark_st(df, load_st_periods() if st_periods is None else st_periods)
+    return mask
+
+
+def frame_mask(df: pd.DataFrame, universe: dict, st_periods: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """单日截面上的完整过滤（板块 + 截面日条件）"""
+    return board_mask(df["ts_code"].to_numpy(), universe) & day_mask(df, universe, st_periods)
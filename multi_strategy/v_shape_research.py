@@ -0,0 +1,158 @@
+"""
+V字反弹强度研究工具
+
+test_002801.py 里的 V 字反弹强度表是对单只股票逐行 iloc 打印的，换一只股票就要改代码。
+这里对任意股票列表（或全市场）和日期区间，在长表上一次性算出反弹强度的各个分项：
+    ma_points        均线双升 2 分，仅 MA5 上升 1 分
+    ma_cross_points  MA5 > MA10 1 分
+    price_points     收涨且收盘高于开盘 2 分，仅收涨 1 分
+    vol_points       量比 > 1.2 为 2 分，> 0.8 为 1 分
+    position_points  10 日价格位置 > 60% 1 分
+    open_points      开盘高于昨收 1 分
+    trend_points     前 3 个交易日中至少 2 天收涨 1 分
+strength 为各分项之和，strength >= 6 产生信号，信号后 3 个交易日收盘涨幅 > 2% 记为命中。
+与原逐行实现一样，每只股票至少要有 10 个交易日的历史才打分；区间前默认多读 lookback 个交易日让均线在区间首日就有值，
+区间后多读几个交易日用于计算 3 日后涨幅。
+
+用法：
+    python v_shape_research.py --codes 600166 002801 --start 20250605 --end 20250707
+    python v_shape_research.py --start 20250601 --end 20250707 --min-strength 6 --output v_shape.csv
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from data_source import query_history
+from indicators import _rolling, _shift
+from kernels import GroupLayout
+from strategy_spec import CALENDAR_DAYS_PER_SESSION, CALENDAR_PADDING_DAYS
+
+from utils.logger import logger
+
+COLUMNS = ["open", "close", "pre_close", "vol", "high", "low"]
+SIGNAL_STRENGTH = 6
+FORWARD_SESSIONS = 3
+HIT_RETURN_PCT = 2
+MIN_HISTORY = 10
+
+OUTPUT_COLUMNS = [
+    "ts_code", "trade_date", "close", "ma5", "ma10", "ma20", "pct_chg", "vol_ratio", "price_position",
+    "ma_points", "ma_cross_points", "price_points", "vol_points", "position_points", "open_points", "trend_points",
+    "strength", "signal", f"future_return_{FORWARD_SESSIONS}", "hit",
+]  # fmt: skip
+
+
+def v_shape_strength(panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    在日线长表（按 ts_code、trade_date 升序）上计算 V 字反弹强度分项，返回与 panel 逐行对应的表
+    """
+    layout = GroupLayout(panel["ts_code"].to_numpy())
+    close = layout.to_padded(panel["close"])
+    open_ = layout.to_padded(panel["open"])
+    vol = layout.to_padded(panel["vol"])
+    prev_close = _shift(close, 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ma5, ma10, ma20 = (_rolling(close, n, "mean") for n in (5, 10, 20))
+        ma5_up = ma5 > _shift(ma5, 1)
+        ma10_up = ma10 > _shift(ma10, 1)
+        vol_ratio = vol / _rolling(vol, 5, "mean")
+        max_close_10, min_close_10 = _rolling(close, 10, "max"), _rolling(close, 10, "min")
+        price_position = (close - min_close_10) / (max_close_10 - min_close_10)
+        close_up = close > prev_close
+        # 前 3 个交易日（各自与前一日比较）收涨的天数
+        up = close_up.astype(np.float64)
+        consecutive_up = _shift(up, 1) + _shift(up, 2) + _shift(up, 3)
+        future_return = (_shift(close, -FORWARD_SESSIONS) / close - 1) * 100
+
+        components = {
+            "ma_points": np.where(ma5_up & ma10_up, 2, np.where(ma5_up, 1, 0)),
+            "ma_cross_points": (ma5 > ma10).astype(np.int64),
+            "price_points": np.where(close_up & (close > open_), 2, np.where(close_up, 1, 0)),
+            "vol_points": np.where(vol_ratio > 1.2, 2, np.where(vol_ratio > 0.8, 1, 0)),
+            "position_points": (price_position > 0.6).astype(np.int64),
+            "open_points": (open_ > prev_close).astype(np.int64),
+            "trend_points": (consecutive_up >= 2).astype(np.int64),
+        }
+
+    result = pd.DataFrame({"ts_code": panel["ts_code"].to_numpy(), "trade_date": panel["trade_date"].to_numpy()})
+    result["close"] = panel["close"].to_numpy()
+    for name, values in (("ma5", ma5), ("ma10", ma10), ("ma20", ma20), ("vol_ratio", vol_ratio)):
+        result[name] = layout.to_long(values)
+    result["pct_chg"] = ((panel["close"] - panel["pre_close"]) / panel["pre_close"] * 100).to_numpy()
+    result["price_position"] = layout.to_long(price_position)
+
+    eligible = layout.positions >= MIN_HISTORY
+    for name, values in components.items():
+        result[name] = np.where(eligible, layout.to_long(values), 0)
+    result["strength"] = result[list(components)].sum(axis=1)
+    result["signal"] = eligible & (result["strength"] >= SIGNAL_STRENGTH)
+    forward = layout.to_long(future_return)
+    result[f"future_return_{FORWARD_SESSIONS}"] = np.where(result["signal"], forward, np.nan)
+    result["hit"] = result["signal"] & (forward > HIT_RETURN_PCT)
+    result["eligible"] = eligible
+    return result[OUTPUT_COLUMNS + ["eligible"]]
+
+
+def research(ts_codes: Optional[List[str]], start_date: str, end_date: str, lookback: int = 20) -> pd.DataFrame:
+    """
+    读取行情并计算区间内每个交易日的强度分项
+
+    Args:
+        ts_codes: 股票列表，None 表示全市场
+        lookback: 区间前多读的交易日数，0 表示与原逐行实现一样只用区间内的数据
+    """
+    start_obj = datetime.strptime(start_date, "%Y%m%d")
+    end_obj = datetime.strptime(end_date, "%Y%m%d")
+    padding = CALENDAR_PADDING_DAYS if lookback else 0
+    load_start = start_obj - timedelta(days=int(lookback * CALENDAR_DAYS_PER_SESSION) + padding)
+    load_end = end_obj + timedelta(days=int(FORWARD_SESSIONS * CALENDAR_DAYS_PER_SESSION) + CALENDAR_PADDING_DAYS)
+
+    panel = query_history(ts_codes, load_end.strftime("%Y%m%d"), load_start.strftime("%Y%m%d"), COLUMNS)
+    if panel.empty:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    if not lookback:
+        # 与原实现一致：指标只用区间内的数据，区间后的行情只用于 3 日后涨幅
+        before = panel["trade_date"] < pd.Timestamp(start_obj)
+        panel = panel[~before].reset_index(drop=True)
+
+    result = v_shape_strength(panel)
+    in_range = (result["trade_date"] >= pd.Timestamp(start_obj)) & (result["trade_date"] <= pd.Timestamp(end_obj))
+    return result[in_range & result["eligible"]].drop(columns="eligible").reset_index(drop=True)
+
+
+def signal_stats(result: pd.DataFrame) -> pd.DataFrame:
+    """每只股票的信号数、命中数和命中率"""
+    stats = result.groupby("ts_code").agg(signals=("signal", "sum"), hits=("hit", "sum"))
+    stats["hit_rate"] = (stats["hits"] / stats["signals"].where(stats["signals"] > 0)).round(4)
+    return stats.reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="V字反弹强度研究工具")
+    parser.add_argument("--codes", nargs="*", default=None, help="股票代码，不填为全市场")
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--lookback", type=int, default=20, help="区间前多读的交易日数，0 与原逐行实现一致")
+    parser.add_argument("--min-strength", type=int, default=0, help="只输出强度不低于该值的行")
+    parser.add_argument("--output", default=None, help="CSV 路径，不填则打印表格")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = research(args.codes, args.start, args.end, args.lookback)
+    table = table[table["strength"] >= args.min_strength]
+    logger.info(f"✅ {table['ts_code'].nunique()} 只股票 {len(table)} 行，耗时 {time.perf_counter() - started:.3f}s")
+    if args.output:
+        table.to_csv(args.output, index=False, encoding="utf-8-sig")
+        logger.info(f"✅ 结果已保存: {args.output}")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(table.round(2).to_string(index=False))
+    print(signal_stats(table).to_string(index=False))
@@ -0,0 +1,212 @@
+"""
+滚动窗口的前推（walk-forward）评估
+
+在全部历史上调参再在同一段历史上看结果会过拟合。这里把历史切成滚动的训练/测试窗口：
+每个训练窗口上按 param_sweep 的网格重新选出最优参数，再在紧随其后的测试窗口上评估这组参数，
+最后把各测试窗口的交易拼起来，得到样本外的整体表现（并与线上默认参数在同样窗口上的表现对比）。
+
+窗口之间大量重叠，所以不按窗口重复计算：
+    • 行情、指标、候选数组和价格矩阵只用 param_sweep.build_sweep_data 构建一次
+    • 每组参数只回测一次（信号之间互不影响，逐笔交易与窗口无关），得到全区间的交易明细
+    • 每个窗口只是按信号日截取各组参数的交易明细再汇总
+训练窗口内卖出日晚于训练窗口末尾的交易在调参时还看不到结果，按未完成（pending）处理。
+
+用法：
+    python walk_forward.py --start 20220101 --end 20250630 --train-sessions 250 --test-sessions 21 \\
+        --grid max_price=10,13,15 min_score=50,60,70 hold=1,2
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from backtest import DEFAULT_COST, STATUS_FILLED, STATUS_PENDING, summarize
+from param_sweep import SWEEP_TARGETS, build_sweep_data, expand_grid, parse_grid, rank_results, simulate_params
+
+from utils.logger import logger
+
+RESULT_DIR = "walk_forward_results"
+
+
+def rolling_windows(dates: np.ndarray, train_sessions: int, test_sessions: int) -> List[dict]:
+    """
+    按交易日切出滚动窗口，测试窗口首尾相接、互不重叠，训练窗口为测试窗口之前的 train_sessions 个交易日
+
+    Returns:
+        [{train_start, train_end, test_start, test_end}]，均为闭区间的日期
+    """
+    windows = []
+    for test_first in range(train_sessions, len(dates), test_sessions):
+        test_last = min(test_first + test_sessions, len(dates)) - 1
+        windows.append(
+            {
+                "train_start": dates[test_first - train_sessions],
+                "train_end": dates[test_first - 1],
+                "test_start": dates[test_first],
+                "test_end": dates[test_last],
+            }
+        )
+    return windows
+
+
+def window_trades(trades: pd.DataFrame, start, end, known_by=None) -> pd.DataFrame:
+    """
+    截取信号日在 [start, end] 内的交易
+
+    Args:
+        known_by: 在这一天之后才卖出的交易改记为 pending（调参时还不知道结果）
+    """
+    signal_dates = trades["signal_date"].to_numpy()
+    window = trades[(signal_dates >= start) & (signal_dates <= end)]
+    if known_by is None:
+        return window
+    unknown = (window["status"] == STATUS_FILLED) & (window["exit_date"] > known_by)
+    if not unknown.any():
+        return window
+    window = window.copy()
+    window.loc[unknown, "status"] = STATUS_PENDING
+    window.loc[unknown, "return"] = np.nan
+    return window
+
+
+def walk_forward(
+    strategy_name: str,
+    start_date: str,
+    end_date: str,
+    grid: Dict[str, List],
+    train_sessions: int = 250,
+    test_sessions: int = 21,
+    metric: str = "avg_return",
+    min_trades: int = 30,
+    cost: float = DEFAULT_COST,
+):
+    """
+    在 [start_date, end_date] 上做前推评估，前 train_sessions 个交易日只用于第一个训练窗口
+
+    Returns:
+        (windows, summary)：每个窗口一行（选中的参数、训练指标、测试指标、默认参数的测试指标）；
+        样本外整体汇总，含调参后与默认参数两组
+    """
+    if strategy_name not in SWEEP_TARGETS:
+        raise ValueError(f"策略 {strategy_name} 不支持参数扫描，可选: {list(SWEEP_TARGETS)}")
+    defaults = SWEEP_TARGETS[strategy_name]["defaults"]
+    combos = expand_grid(grid, defaults, SWEEP_TARGETS[strategy_name].get("validate"))
+    if defaults not in combos:
+        combos.append(dict(defaults))
+    max_hold = max(int(c["hold"]) for c in combos)
+
+    build_start = time.perf_counter()
+    data = build_sweep_data(strategy_name, start_date, end_date, max_hold)
+    dates = data["m_dates"]
+    first, last = np.datetime64(pd.to_datetime(start_date)), np.datetime64(pd.to_datetime(end_date))
+    in_range = dates[(dates >= first) & (dates <= last)]
+    windows = rolling_windows(in_range, train_sessions, test_sessions)
+    if not windows:
+        raise ValueError(f"{start_date} ~ {end_date} 只有 {len(in_range)} 个交易日，不足一个训练窗口")
+
+    # 每组参数只回测一次，各窗口按信号日截取
+    all_trades = [simulate_params(strategy_name, params, data, cost) for params in combos]
+    default_index = combos.index(defaults)
+    logger.info(
+        f"【{strategy_name}】{len(combos)} 组参数全区间回测完成，耗时 {time.perf_counter() - build_start:.2f}s，"
+        f"共 {len(windows)} 个窗口"
+    )
+
+    rows = []
+    tuned_test, default_test = [], []
+    for n, window in enumerate(windows, 1):
+        train = [
+            {
+                "combo": i,
+                **summarize(
+                    window_trades(trades, window["train_start"], window["train_end"], known_by=window["train_end"]),
+                    int(combos[i]["hold"]),
+                ),
+            }
+            for i, trades in enumerate(all_trades)
+        ]
+        best = rank_results(train, metric, min_trades).iloc[0]
+        params = combos[int(best["combo"])]
+
+        test = window_trades(all_trades[int(best["combo"])], window["test_start"], window["test_end"])
+        baseline = window_trades(all_trades[default_index], window["test_start"], window["test_end"])
+        tuned_test.append(test.assign(hold=int(params["hold"])))
+        default_test.append(baseline)
+
+        test_summary = summarize(test, int(params["hold"]))
+        baseline_summary = summarize(baseline, int(defaults["hold"]))
+        rows.append(
+            {
+                "window": n,
+                **{k: pd.Timestamp(v).strftime("%Y%m%d") for k, v in window.items()},
+                **params,
+                f"train_{metric}": best[metric],
+                "train_filled": int(best["filled"]),
+                f"test_{metric}": test_summary[metric],
+                "test_filled": test_summary["filled"],
+                "test_total_return": test_summary["total_return"],
+                f"default_test_{metric}": baseline_summary[metric],
+                "default_test_total_return": baseline_summary["total_return"],
+            }
+        )
+        logger.info(
+            f"窗口 {n}/{len(windows)} 测试 {rows[-1]['test_start']}~{rows[-1]['test_end']}: "
+            f"参数 {params}，训练 {metric}={best[metric]}，测试 {metric}={test_summary[metric]}"
+        )
+
+    # 样本外整体：各测试窗口的交易拼接后汇总
+    tuned = pd.concat(tuned_test, ignore_index=True)
+    summary = {
+        "windows": len(windows),
+        "tuned": _summarize_mixed_hold(tuned),
+        "default": summarize(pd.concat(default_test, ignore_index=True), int(defaults["hold"])),
+    }
+    return pd.DataFrame(rows), summary
+
+
+def _summarize_mixed_hold(trades: pd.DataFrame) -> dict:
+    """持有天数不同的交易合并汇总：逐笔指标直接合并，净值按交易数最多的 hold 计"""
+    if trades.empty:
+        return summarize(trades.drop(columns="hold"))
+    hold = int(trades["hold"].mode().iloc[0])
+    return summarize(trades.drop(columns="hold"), hold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滚动窗口的前推评估")
+    parser.add_argument("--strategy", default="strategy_limit_up_continuation_prediction", choices=list(SWEEP_TARGETS))
+    parser.add_argument("--start", required=True, help="起始日期 YYYYMMDD（含第一个训练窗口）")
+    parser.add_argument("--end", required=True, help="截止日期 YYYYMMDD")
+    parser.add_argument("--grid", nargs="+", required=True, help="参数网格，如 max_price=10,13,15 hold=1,2")
+    parser.add_argument("--train-sessions", type=int, default=250, help="训练窗口交易日数")
+    parser.add_argument("--test-sessions", type=int, default=21, help="测试窗口交易日数（也是滚动步长）")
+    parser.add_argument("--metric", default="avg_return")
+    parser.add_argument("--min-trades", type=int, default=30)
+    parser.add_argument("--cost", type=float, default=DEFAULT_COST)
+    parser.add_argument(
+        "--output", default=None, help="窗口明细 CSV 路径，默认 walk_forward_results/<策略>_<起>_<止>.csv"
+    )
+    args = parser.parse_args()
+
+    table, summary = walk_forward(
+        args.strategy,
+        args.start,
+        args.end,
+        parse_grid(args.grid),
+        args.train_sessions,
+        args.test_sessions,
+        args.metric,
+        args.min_trades,
+        args.cost,
+    )
+    output = args.output or os.path.join(RESULT_DIR, f"{args.strategy}_{args.start}_{args.end}.csv")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    table.to_csv(output, index=False, encoding="utf-8-sig")
+    logger.info(f"✅ 样本外（调参后）: {summary['tuned']}")
+    logger.info(f"✅ 样本外（默认参数）: {summary['default']}")
+    logger.info(f"✅ 窗口明细已保存: {output}")